@@ -19,6 +19,9 @@ from utils.process_cleanup import setup_signal_handlers, SafeThreadPoolExecutor
 from utils.doc_reader import DocReader
 from utils.data_masking import DataMasker, DataMaskerAPI
 from utils.evaluator import AnswerEvaluator
+from utils.priority import interactive
+from utils.response_cache import response_cache
+from utils.answer_index import answer_index
 from config import RESULTS_DIR, MAX_CONCURRENT_WORKERS
 from werkzeug.utils import secure_filename
 import tempfile
@@ -26,6 +29,10 @@ import tempfile
 # 设置信号处理器，确保中断时正确清理
 setup_signal_handlers()
 
+# 网页端再次点击生成/分析/评估时应重新调用模型，LLM响应缓存和回答索引只用于process_cases.py等批量运行
+response_cache.enabled = False
+answer_index.enabled = False
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 
@@ -112,6 +119,7 @@ def delete_case(case_id):
 
 
 @app.route('/api/generate_questions', methods=['POST'])
+@interactive
 def generate_questions():
     """生成测试问题（单个案例）"""
     try:
@@ -203,6 +211,7 @@ def generate_questions_batch():
 
 
 @app.route('/api/analyze', methods=['POST'])
+@interactive
 def analyze():
     """AI分析案例"""
     try:
@@ -763,6 +772,7 @@ def upload_v2():
 
 
 @app.route('/api/v2/mask', methods=['POST'])
+@interactive
 def mask_v2():
     """隐私脱敏"""
     try:
@@ -813,6 +823,7 @@ def mask_v2():
 
 
 @app.route('/api/v2/generate_questions', methods=['POST'])
+@interactive
 def generate_questions_v2():
     """生成问题（固定5个）"""
     try:
@@ -874,6 +885,7 @@ def update_questions_v2():
 
 
 @app.route('/api/v2/generate_answer', methods=['POST'])
+@interactive
 def generate_answer_v2():
     """生成单个问题的AI答案"""
     try:
@@ -945,6 +957,7 @@ def generate_answer_v2():
 
 
 @app.route('/api/v2/evaluate', methods=['POST'])
+@interactive
 def evaluate_v2():
     """评分单个答案（5维度+错误分类）"""
     try:
@@ -11,19 +11,21 @@ load_dotenv()
 
 # DeepSeek API配置
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')
-DEEPSEEK_API_URL = 'https://api.deepseek.com/v1/chat/completions'
+DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', 'https://api.deepseek.com/v1/chat/completions')
 
 # OpenAI/ChatGPT API配置
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 OPENAI_API_URL = os.getenv('OPENAI_API_URL', 'https://api3.xhub.chat/v1/chat/completions')
 OPENAI_MAX_RPM = int(os.getenv('OPENAI_MAX_RPM', '5000'))  # OpenAI API每分钟最大请求数
 OPENAI_MAX_RPS = int(os.getenv('OPENAI_MAX_RPS', '50'))  # OpenAI API每秒最大请求数
+OPENAI_MAX_TPM = int(os.getenv('OPENAI_MAX_TPM', '0'))  # OpenAI API每分钟最大token数（0表示不限制）
 
 # Qwen（通义千问）API配置
 QWEN_API_KEY = os.getenv('QWEN_API_KEY', '')
 QWEN_API_URL = os.getenv('QWEN_API_URL', 'https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions')  # 阿里云DashScope API端点
 QWEN_MAX_RPM = int(os.getenv('QWEN_MAX_RPM', '3000'))  # Qwen API每分钟最大请求数
 QWEN_MAX_RPS = int(os.getenv('QWEN_MAX_RPS', '50'))  # Qwen API每秒最大请求数
+QWEN_MAX_TPM = int(os.getenv('QWEN_MAX_TPM', '0'))  # Qwen API每分钟最大token数（0表示不限制）
 
 # Anthropic/Claude API配置
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY', '')
@@ -43,11 +45,92 @@ DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 CASES_DIR = os.path.join(DATA_DIR, 'cases')
 RESULTS_DIR = os.path.join(DATA_DIR, 'results')
 
-# 确保数据目录存在
-os.makedirs(CASES_DIR, exist_ok=True)
-os.makedirs(RESULTS_DIR, exist_ok=True)
+# 数据目录由使用方（CaseManager、ExcelExporter等）在首次写入时创建，导入配置不产生文件系统操作
 
 # 并发处理配置
 MAX_CONCURRENT_WORKERS = int(os.getenv('MAX_CONCURRENT_WORKERS', '50'))  # 批量分析时的最大并发数
 DEEPSEEK_MAX_RPM = int(os.getenv('DEEPSEEK_MAX_RPM', '3000'))  # DeepSeek API每分钟最大请求数
 DEEPSEEK_MAX_RPS = int(os.getenv('DEEPSEEK_MAX_RPS', '50'))  # DeepSeek API每秒最大请求数
+DEEPSEEK_MAX_TPM = int(os.getenv('DEEPSEEK_MAX_TPM', '0'))  # DeepSeek API每分钟最大token数（0表示不限制）
+
+# 速率限制共享配置（同一主机上的多个进程通过状态文件共享配额）
+RATE_LIMIT_SHARED = os.getenv('RATE_LIMIT_SHARED', 'True').lower() == 'true'
+RATE_LIMIT_DIR = os.getenv('RATE_LIMIT_DIR', os.path.join(DATA_DIR, '.ratelimit'))
+
+# 分阶段流水线配置（process_cases.py同步模式：脱敏 → 生成问题 → 生成回答 → 评估，每个阶段独立的工作线程数和有界队列）
+PIPELINE_MASK_WORKERS = int(os.getenv('PIPELINE_MASK_WORKERS', '8'))  # 脱敏阶段工作线程数
+PIPELINE_QUESTION_WORKERS = int(os.getenv('PIPELINE_QUESTION_WORKERS', '8'))  # 问题生成阶段工作线程数
+PIPELINE_ANSWER_WORKERS = int(os.getenv('PIPELINE_ANSWER_WORKERS', str(MAX_CONCURRENT_WORKERS)))  # 回答生成阶段每个提供商的工作线程数（--models中同一提供商的模型平分）
+PIPELINE_EVALUATE_WORKERS = int(os.getenv('PIPELINE_EVALUATE_WORKERS', str(MAX_CONCURRENT_WORKERS)))  # 评估阶段工作线程数
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '0'))  # 每个阶段输入队列的容量（0表示工作线程数的2倍）
+
+# HTTP连接池配置（所有LLM客户端共享keep-alive连接）
+# 连接数默认按同步流水线各阶段同时访问同一提供商的最大请求数计算（脱敏阶段每个案例3个字段并发），超出连接池的连接用后即被丢弃
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))  # 每个Session缓存的主机连接池数量
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', str(max(
+    MAX_CONCURRENT_WORKERS,
+    PIPELINE_MASK_WORKERS * 3 + PIPELINE_QUESTION_WORKERS + PIPELINE_ANSWER_WORKERS + PIPELINE_EVALUATE_WORKERS))))  # 每个主机的最大保持连接数
+ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', '1000'))  # 异步模式（--async）下的最大在途请求数
+
+# 截断补救配置（finish_reason为length时的处理方式）
+TRUNCATION_STRATEGY = os.getenv('TRUNCATION_STRATEGY', 'continue').lower()  # 'continue'：续写已生成内容；'regenerate'：加倍max_tokens重新生成
+CONTINUATION_MAX_ROUNDS = int(os.getenv('CONTINUATION_MAX_ROUNDS', '2'))  # 最多续写次数
+
+# 流式响应配置（STREAM_ENABLED或process_cases.py --stream时，回答和评估调用以流式发送；请求对冲总是以流式发送）
+STREAM_ENABLED = os.getenv('STREAM_ENABLED', 'False').lower() == 'true'
+STREAM_IDLE_TIMEOUT = float(os.getenv('STREAM_IDLE_TIMEOUT', '60'))  # 连接上连续多少秒没有任何数据视为超时
+STREAM_STALL_TIMEOUT = float(os.getenv('STREAM_STALL_TIMEOUT', '90'))  # 连续多少秒没有新内容（忽略keep-alive）视为卡住
+
+# 自适应并发控制配置（按提供商AIMD调整在途请求数，429/5xx时减半并共同退避）
+ADAPTIVE_CONCURRENCY_ENABLED = os.getenv('ADAPTIVE_CONCURRENCY_ENABLED', 'True').lower() == 'true'
+ADAPTIVE_CONCURRENCY_INITIAL = int(os.getenv('ADAPTIVE_CONCURRENCY_INITIAL', '16'))  # 初始在途请求数
+ADAPTIVE_CONCURRENCY_MIN = int(os.getenv('ADAPTIVE_CONCURRENCY_MIN', '1'))  # 最小在途请求数
+ADAPTIVE_CONCURRENCY_MAX = int(os.getenv('ADAPTIVE_CONCURRENCY_MAX', str(max(MAX_CONCURRENT_WORKERS, ASYNC_MAX_IN_FLIGHT))))  # 最大在途请求数
+ADAPTIVE_BACKOFF_MAX = float(os.getenv('ADAPTIVE_BACKOFF_MAX', '30'))  # 单次共享退避的最长等待秒数
+THROTTLE_MAX_RETRIES = int(os.getenv('THROTTLE_MAX_RETRIES', '10'))  # 单次请求遇到429时的最大重试次数（不占用普通失败重试次数）
+
+# 熔断器配置（按提供商+模型，连续失败后在冷却期内直接失败）
+CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'True').lower() == 'true'
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # 连续失败多少次后熔断
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))  # 熔断多少秒后发送探测请求
+CIRCUIT_MAX_RESET_TIMEOUT = float(os.getenv('CIRCUIT_MAX_RESET_TIMEOUT', '300'))  # 探测连续失败时熔断时间的上限
+
+# 请求对冲配置（analyze_case/evaluate_answer的调用超过近期p95延迟时发出重复请求，取先完成者）
+HEDGING_ENABLED = os.getenv('HEDGING_ENABLED', 'False').lower() == 'true'
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '0.95'))  # 触发对冲的延迟百分位
+HEDGE_MAX_RATE = float(os.getenv('HEDGE_MAX_RATE', '0.05'))  # 对冲请求占全部请求的最大比例
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))  # 开始对冲前至少需要的延迟样本数
+
+# LLM响应缓存配置（相同请求直接复用已缓存的响应，避免重复付费；只用于process_cases.py等批量运行，Web应用不使用）
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true'
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', os.path.join(DATA_DIR, 'response_cache.sqlite3'))
+RESPONSE_CACHE_TTL_DAYS = float(os.getenv('RESPONSE_CACHE_TTL_DAYS', '30'))  # 缓存有效天数（0表示永不过期）
+RESPONSE_CACHE_MAX_MB = float(os.getenv('RESPONSE_CACHE_MAX_MB', '500'))  # 缓存总大小上限（0表示不限制）
+
+# 批处理评估配置（--batch-eval：评估请求写入批处理JSONL文件，提交到 /v1/batches 兼容接口后轮询合并结果）
+BATCH_API_BASE_URL = os.getenv('BATCH_API_BASE_URL', '')  # 批处理服务基础地址（不含/v1），为空时从评估客户端的接口地址推导
+BATCH_POLL_INTERVAL = float(os.getenv('BATCH_POLL_INTERVAL', '30'))  # 轮询任务状态的间隔秒数
+BATCH_MAX_WAIT = float(os.getenv('BATCH_MAX_WAIT', str(24 * 3600)))  # 最长等待秒数（0表示不限制）
+BATCH_COMPLETION_WINDOW = os.getenv('BATCH_COMPLETION_WINDOW', '24h')  # 提交任务时的completion_window
+BATCH_DIR = os.getenv('BATCH_DIR', os.path.join(DATA_DIR, 'batches'))  # 批处理输入文件保存目录
+
+# 本地token估算配置（发送前按模型上下文窗口调整max_tokens；提供商未返回usage时估算token使用情况）
+TOKEN_ESTIMATE_MARGIN = float(os.getenv('TOKEN_ESTIMATE_MARGIN', '1.1'))  # 输入token估算的安全系数（检查上下文窗口时放大估算值）
+
+# 调用遥测配置（每次LLM调用写入一条结构化事件：阶段、模型、延迟、token数等，汇总见scripts/telemetry_summary.py）
+TELEMETRY_ENABLED = os.getenv('TELEMETRY_ENABLED', 'True').lower() == 'true'
+TELEMETRY_PATH = os.getenv('TELEMETRY_PATH', os.path.join(DATA_DIR, 'telemetry', 'calls.jsonl'))
+
+# 结果日志配置（process_cases.py每完成一个问题即追加一行，中断后可用--resume续跑）
+RESULT_JOURNAL_DIR = os.getenv('RESULT_JOURNAL_DIR', os.path.join(DATA_DIR, 'journal'))
+
+# 结果存储配置（评估结果保存在SQLite中，Excel从存储导出，见scripts/export_results.py）
+RESULTS_STORE_PATH = os.getenv('RESULTS_STORE_PATH', os.path.join(DATA_DIR, 'results_store.sqlite3'))
+
+# 回答索引配置（与运行无关的已完成回答和评估，按内容哈希复用，任何新运行或案例子集都不再重复生成；Web应用不使用）
+ANSWER_INDEX_ENABLED = os.getenv('ANSWER_INDEX_ENABLED', 'True').lower() == 'true'
+ANSWER_INDEX_PATH = os.getenv('ANSWER_INDEX_PATH', os.path.join(DATA_DIR, 'answer_index.sqlite3'))
+
+# Excel读取缓存配置（--use_ds_questions 等输入工作簿首次解析后缓存为pickle，文件未变化时直接加载）
+EXCEL_CACHE_ENABLED = os.getenv('EXCEL_CACHE_ENABLED', 'True').lower() == 'true'
+EXCEL_CACHE_DIR = os.getenv('EXCEL_CACHE_DIR', os.path.join(DATA_DIR, '.excel_cache'))
@@ -17,6 +17,32 @@
     
     # 使用DeepSeek模型处理所有案例（默认）
     python process_cases.py --model deepseek --all
+    
+    # 异步模式：单个事件循环驱动所有请求（需要aiohttp）
+    python process_cases.py --model gpt4o --all --async
+    
+    # 重复运行时默认复用已缓存的API响应和回答索引（data/answer_index.sqlite3）中已完成的回答与评估，使用--no-cache强制重新调用
+    python process_cases.py --model deepseek --all --no-cache
+    
+    # 多问题合并回答：每个案例的问题在一次调用中回答，案例文本只发送一次
+    python process_cases.py --model gpt4o --all --multi-question
+    
+    # 批处理评估：步骤4的评估请求在所有回答生成后一次性提交到 /v1/batches 兼容接口
+    python process_cases.py --model gpt4o --all --batch-eval
+    
+    # 多模型：案例和统一数据只加载一次、脱敏和问题生成只做一次，问题分发给所有模型回答，结果按模型分tab保存
+    python process_cases.py --models deepseek,gpt4o,claude,gemini,qwen --use_ds_questions data/108个案例_新标准评估_完整版_最终版.xlsx --standalone
+    
+    # 续跑：每个问题完成后即写入结果日志（data/journal/），中断后跳过已完成的问题并用日志重建Excel
+    python process_cases.py --model gpt4o --all --resume
+    
+    # 结果行保存在结果存储（data/results_store.sqlite3）中，--no-excel 时不导出Excel，之后按需导出
+    python process_cases.py --models deepseek,gpt4o --all --no-excel
+    python scripts/export_results.py --list
+    
+    # 重新评分：只对已保存的AI回答重新评估（修改评分量表或更换评估模型后），新分数写入 总分@<评分量表版本> 等列
+    python process_cases.py --rescore data/results_20260112_unified_e8fd22b9/20个案例_统一评估结果_20260112.xlsx --use_unified_data data/unified.json
+    python process_cases.py --rescore "results_20260112_unified_e8fd22b9/20个案例_统一评估结果_20260112" --judge-provider qwen --judge-model qwen-max
 """
 import pandas as pd
 import os
@@ -24,345 +50,832 @@ import time
 import sys
 import argparse
 from datetime import datetime
-import concurrent.futures
+import asyncio
+import threading
 from utils.ai_api import UnifiedAIAPI
-from utils.evaluator import AnswerEvaluator
+from utils.evaluator import AnswerEvaluator, RUBRIC_VERSION
 from utils.data_masking import DataMaskerAPI
 from utils.unified_model_api import UnifiedModelAPI
-from config import MAX_CONCURRENT_WORKERS
+from utils.deepseek_api import DeepSeekAPI
+from utils.async_api import AsyncAPIClient
+from utils.multi_question import analyze_questions, analyze_questions_async, MAX_TOKENS_PER_QUESTION, MAX_TOKENS_TOTAL
+from utils.prompts import ANALYZE_CASE_TEMPERATURE, ANALYZE_CASE_MAX_TOKENS
+from utils.http_client import close_async_session
+from utils.response_cache import response_cache
+from utils.token_tracker import token_tracker
+from utils.telemetry import telemetry_context, STAGE_ANSWER
+from utils.concurrency import print_concurrency_summary
+from utils.hedging import set_hedging_enabled, print_hedge_summary
+from utils.streaming import set_streaming_enabled
+from utils.circuit_breaker import CircuitOpenError, format_circuit_status
+from utils.result_journal import ResultJournal
+from utils.results_store import results_store
+from utils.excel_cache import read_excel_cached
+from utils.answer_index import answer_index
+from utils.pipeline import Stage, StagePipeline, Routed
+from config import (MAX_CONCURRENT_WORKERS, ASYNC_MAX_IN_FLIGHT, PIPELINE_MASK_WORKERS, PIPELINE_QUESTION_WORKERS,
+                    PIPELINE_ANSWER_WORKERS, PIPELINE_EVALUATE_WORKERS, PIPELINE_QUEUE_SIZE)
 from utils.process_cleanup import setup_signal_handlers, SafeThreadPoolExecutor
 import json
 import glob
 
-# 文件锁支持（用于并发写入Excel文件）
-try:
-    import fcntl
-    HAS_FCNTL = True
-except ImportError:
-    HAS_FCNTL = False  # Windows系统不支持fcntl
+# 步骤3可选的模型
+MODEL_CHOICES = ['deepseek', 'gpt4o', 'gemini', 'claude', 'qwen']
 
 
-def process_single_case(case_id, case, case_index, total_cases, model='deepseek', existing_questions_data=None, unified_data=None, gpt_model='gpt-4o', qwen_model='qwen-max', use_thinking=True):
-    """处理单个案例"""
+def get_model_display_name(model, qwen_model='qwen-max', use_thinking=True):
+    """确定模型显示名称（用于结果列和tab名称）"""
+    if model == 'qwen':
+        return f'Qwen-{qwen_model.split("-")[-1].title()}'
+    elif model == 'deepseek':
+        # DeepSeek根据是否使用thinking模式显示不同名称
+        if use_thinking:
+            return 'DeepSeek'
+        else:
+            return 'DeepSeek-NoThinking'
+    else:
+        return {
+            'gpt4o': 'GPT-4o',
+            'gemini': 'Gemini 2.5 Flash',
+            'claude': 'Claude Opus 4'
+        }.get(model, model.upper())
+
+
+def build_question_result(case_id, case_title, masked_title, q_num, question, model_display_name):
+    """构建单个问题的结果行（基础字段）"""
+    return {
+        '案例ID': case_id,
+        '案例标题': case_title,
+        '案例标题（脱敏）': masked_title,
+        '问题编号': q_num,
+        '问题': question,
+        '使用的模型': model_display_name,  # 步骤3使用的模型
+        '脱敏API': 'DeepSeek',  # 步骤1使用的API
+        '问题生成API': 'DeepSeek',  # 步骤2使用的API
+        '评估API': 'DeepSeek'  # 步骤4使用的API
+    }
+
+
+def fill_evaluation_result(result, evaluation):
+    """将评估结果写入结果行"""
+    result['总分'] = evaluation['总分']
+    result['百分制'] = evaluation['百分制']
+    result['分档'] = evaluation['分档']
+    
+    # 各维度得分（从'各维度得分'字典中获取）
+    dimension_scores = evaluation.get('各维度得分', {})
+    result['规范依据相关性_得分'] = dimension_scores.get('规范依据相关性', 0)
+    result['涵摄链条对齐度_得分'] = dimension_scores.get('涵摄链条对齐度', 0)
+    result['价值衡量与同理心对齐度_得分'] = dimension_scores.get('价值衡量与同理心对齐度', 0)
+    result['关键事实与争点覆盖度_得分'] = dimension_scores.get('关键事实与争点覆盖度', 0)
+    result['裁判结论与救济配置一致性_得分'] = dimension_scores.get('裁判结论与救济配置一致性', 0)
+    
+    # 错误标记
+    result['错误标记'] = evaluation.get('错误标记', '')
+    # 从错误详情中提取各类型错误
+    error_details = evaluation.get('错误详情', {})
+    result['微小错误'] = '; '.join(error_details.get('微小错误', [])) if error_details.get('微小错误') else ''
+    result['明显错误'] = '; '.join(error_details.get('明显错误', [])) if error_details.get('明显错误') else ''
+    result['重大错误'] = '; '.join(error_details.get('重大错误', [])) if error_details.get('重大错误') else ''
+    
+    # 详细评价
+    result['详细评价'] = evaluation.get('详细评价', '')
+    result['评价Thinking'] = evaluation.get('评价Thinking', '')
+    
+    result['处理错误'] = ''
+    return result
+
+
+def make_answer_index_key(answer_api, masked_content, question, use_thinking=True, multi_question=False):
+    """
+    回答索引中的回答键（脱敏案例文本、问题、实际调用的模型和生成参数），与运行和结果目录无关
+    
+    多问题合并回答（一次JSON调用、共用推理、合并的输出预算）与逐题analyze_case的回答使用不同的键，互不复用
+    """
+    client = answer_api
+    while hasattr(client, 'api'):
+        client = client.api  # UnifiedAIAPI/AsyncAPIClient包装的底层客户端
+    model_id = f"{client.provider}:{getattr(client, 'model', '') or 'default'}"
+    if multi_question:
+        params = {'multi_question': True, 'temperature': ANALYZE_CASE_TEMPERATURE,
+                  'max_tokens_per_question': MAX_TOKENS_PER_QUESTION, 'max_tokens_total': MAX_TOKENS_TOTAL}
+    else:
+        params = {'multi_question': False, 'temperature': ANALYZE_CASE_TEMPERATURE, 'max_tokens': ANALYZE_CASE_MAX_TOKENS}
+    # 只有DeepSeek的回答受thinking模式影响，其他模型忽略该参数
+    if client.provider == 'deepseek':
+        params['thinking'] = bool(use_thinking)
+    return answer_index.make_answer_key(masked_content, question, model_id, params)
+
+
+def get_indexed_answers(answer_api, masked_content, pending_questions, use_thinking=True, multi_question=False):
+    """
+    查找回答索引中已有的回答（其他运行、结果目录或案例子集以相同生成方式生成过的相同工作单元）
+    
+    Returns:
+        ({问题编号: 回答键}, {问题编号: {'answer', 'thinking'}})
+    """
+    index_keys = {q_num: make_answer_index_key(answer_api, masked_content, question, use_thinking, multi_question)
+                  for q_num, question in pending_questions}
+    indexed_answers = {}
+    for q_num, index_key in index_keys.items():
+        indexed = answer_index.get_answer(index_key)
+        if indexed is not None:
+            indexed_answers[q_num] = indexed
+    return index_keys, indexed_answers
+
+
+def defer_evaluation(result, ai_answer, masked_judge, question, masked_content):
+    """批处理评估模式下暂不评估，记录评估输入（由run_batch_evaluation统一提交后取出）"""
+    result['_评估输入'] = {
+        'ai_answer': ai_answer,
+        'judge_decision': masked_judge,
+        'question': question,
+        'case_text': masked_content
+    }
+    result['处理错误'] = ''
+    return result
+
+
+def run_batch_evaluation(all_results):
+    """
+    对所有等待评估的结果行进行批处理评估（--batch-eval模式），按custom_id合并回结果行
+    
+    批处理未返回有效结果的条目回退到同步评估；同步评估仍失败时写入失败信息
+    """
+    # custom_id在批内必须唯一：多模型运行时同一案例和问题有多个模型的回答，需要带上模型
+    rows = {}
+    for result in all_results:
+        if '_评估输入' not in result:
+            continue
+        custom_id = f"{result['使用的模型']}|{result['案例ID']}-q{result['问题编号']}"
+        if custom_id in rows:
+            raise ValueError(f"批处理评估的custom_id重复: {custom_id}")
+        rows[custom_id] = result
+    items = {custom_id: result.pop('_评估输入') for custom_id, result in rows.items()}
+    
+    if not items:
+        return
+    
     print('=' * 80, flush=True)
-    print(f'[{case_index}/{total_cases}] 处理案例: {case_id}', flush=True)
-    print(f'案例标题: {case["title"]}', flush=True)
+    print(f'步骤4/4: 批处理评估（共{len(items)}个回答）', flush=True)
     print('=' * 80, flush=True)
-    print(flush=True)
     
-    case_title = case['title']
-    case_text = case.get('content', case.get('case_text', ''))
-    judge_decision = case.get('judge_decision', '')
+    evaluator = AnswerEvaluator()  # 使用默认的DeepSeek API进行评估
+    evaluations = evaluator.evaluate_answers_batch(items)
+    for custom_id, evaluation in evaluations.items():
+        fill_evaluation_result(rows[custom_id], evaluation)
     
-    if not case_text:
-        print(f'⚠️ 案例 {case_id} 没有案例内容，跳过', flush=True)
-        return None
+    fallback_ids = [custom_id for custom_id in items if custom_id not in evaluations]
+    if not fallback_ids:
+        return
+    
+    print(f"[批处理评估] 同步评估剩余 {len(fallback_ids)} 个回答...", flush=True)
+    
+    def evaluate_one(custom_id):
+        try:
+            with telemetry_context(case_id=rows[custom_id]['案例ID'], question=rows[custom_id]['问题编号']):
+                fill_evaluation_result(rows[custom_id], evaluator.evaluate_answer(**items[custom_id]))
+        except Exception as e:
+            import traceback
+            print(f"  [{custom_id}] ✗ 评估失败: {str(e)}", flush=True)
+            fill_failure_result(rows[custom_id], f"评估失败: {str(e)}", traceback.format_exc())
+    
+    with SafeThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_WORKERS, len(fallback_ids))) as executor:
+        list(executor.map(evaluate_one, fallback_ids))
+
+
+def fill_failure_result(result, error_msg, error_detail):
+    """将处理失败信息写入结果行（确保AI回答和评分字段有值）"""
+    result['处理错误'] = f"{error_msg}\n详细堆栈:\n{error_detail}"
+    
+    # 确保AI回答字段有值（即使是错误标记）
+    if 'AI回答' not in result or not result.get('AI回答'):
+        result['AI回答'] = f"[错误：{error_msg}]"
+        result['AI回答Thinking'] = ''
+    
+    # 如果评估未完成，设置默认值
+    if '总分' not in result:
+        result['总分'] = 0
+        result['百分制'] = 0
+        result['分档'] = '处理失败'
+        result['详细评价'] = f'处理失败：{error_msg}'
+    return result
+
+
+def split_journaled_questions(questions, journaled_rows=None):
+    """
+    续跑时拆分案例的问题：日志中已完成且问题文本一致的直接复用结果行，其余需要处理
+    
+    Returns:
+        (复用的结果行列表, [(问题编号, 问题)] 待处理列表)
+    """
+    reused = []
+    pending = []
+    for q_num, question in enumerate(questions, 1):
+        row = (journaled_rows or {}).get(q_num)
+        if row is not None and row.get('问题') == question:
+            reused.append(dict(row))
+        else:
+            pending.append((q_num, question))
+    return reused, pending
+
+
+def journaled_case_complete(case_id, journaled_rows, unified_data=None, default_num_questions=5):
+    """续跑时判断案例是否已全部完成（完成的案例跳过脱敏和问题生成，直接使用日志中的结果行）"""
+    if not journaled_rows:
+        return False
+    unified_questions = (unified_data or {}).get(case_id, {}).get('questions')
+    if unified_questions:
+        _, pending = split_journaled_questions(unified_questions, journaled_rows)
+        return not pending
+    return all(q_num in journaled_rows for q_num in range(1, default_num_questions + 1))
+
+
+def run_cases_pipeline(selected_cases, models=('deepseek',), existing_questions_data=None, unified_data=None, gpt_model='gpt-4o', qwen_model='qwen-max',
+                       use_thinking=True, batch_eval=False, multi_question=False, journals=None, journaled=None):
+    """
+    以分阶段流水线处理所有案例（同步模式），返回所有模型的结果行
+    
+    脱敏 → 生成问题 → 生成AI回答 → 评估 各阶段有独立的工作线程数和有界队列（见config中的PIPELINE_*），
+    早完成的回答立即进入评估，与后面案例的回答生成重叠进行。
+    指定多个模型时脱敏和问题生成只做一次，问题分发到每个模型各自的回答阶段（线程预算按提供商分配，见get_answer_workers）。
+    journals为 {模型: 结果日志}，每个问题完成后立即写入对应模型的日志；journaled为续跑时 {模型: {案例ID: {问题编号: 结果行}}}。
+    """
+    max_retries = 3
+    retry_delay = 2  # 秒
+    total_cases = len(selected_cases)
+    model_display_names = {model: get_model_display_name(model, qwen_model, use_thinking) for model in models}
+    
+    masker = DataMaskerAPI()
+    question_api = UnifiedAIAPI(provider='deepseek')  # 步骤2使用DeepSeek
+    evaluator = AnswerEvaluator()  # 使用默认的DeepSeek API进行评估
+    thread_local = threading.local()
+    answer_workers = get_answer_workers(models, gpt_model, qwen_model)
     
     all_results = []
+    results_lock = threading.Lock()
+    progress = {'completed_cases': 0}
+    batch_start_time = time.time()
     
-    try:
-        # 优先使用统一数据（如果提供）
-        if unified_data and case_id in unified_data:
+    def finish_case(ctx, failed=False):
+        """案例的所有问题都已完成（或案例在脱敏/问题生成阶段失败）时打印总体进度（调用方持有results_lock）"""
+        progress['completed_cases'] += 1
+        completed_count = progress['completed_cases']
+        elapsed = time.time() - batch_start_time
+        remaining = (total_cases - completed_count) * elapsed / completed_count
+        if failed:
+            print(f"[{ctx['case_index']}/{total_cases}] ✗ 案例 {ctx['case_id']} 处理失败", flush=True)
+        else:
+            print(f"[{ctx['case_index']}/{total_cases}] ✓ 案例 {ctx['case_id']} 所有问题处理完成", flush=True)
+        print(f"[总体进度] {completed_count}/{total_cases} 个案例已完成 ({completed_count / total_cases * 100:.1f}%)", flush=True)
+        print(f"[总体进度] 已用时间: {elapsed:.1f}秒，预计剩余: {remaining:.1f}秒", flush=True)
+        circuit_status = format_circuit_status()
+        if circuit_status:
+            print(f"[总体进度] 熔断状态: {circuit_status}", flush=True)
+    
+    def finish_question(ctx, model, result):
+        """问题处理结束（评估完成、等待批处理评估或最终失败）：写入结果日志并收集结果行"""
+        journal = (journals or {}).get(model)
+        if journal is not None:
+            journal.append(result)
+        with results_lock:
+            all_results.append(result)
+            ctx['remaining'] -= 1
+            if ctx['remaining'] == 0:
+                finish_case(ctx)
+    
+    def fail_question(ctx, model, result, q_num, error_msg, error_detail):
+        """问题最终失败：记录错误信息后结束"""
+        print(f"  [{ctx['case_id']} 问题{q_num}/5] ✗ 处理失败（已重试{max_retries}次）: {error_msg}", flush=True)
+        print(f"  {error_detail}", flush=True)
+        print(f"  [{ctx['case_id']} 问题{q_num}/5] 上下文信息：案例ID={ctx['case_id']}, 问题编号={q_num}, 模型={model_display_names[model]}", flush=True)
+        fill_failure_result(result, f"{error_msg}（已重试{max_retries}次）", error_detail)
+        finish_question(ctx, model, result)
+    
+    def mask_stage(ctx):
+        """步骤1/4: 脱敏（统一数据中已有脱敏内容时跳过）"""
+        case_id = ctx['case_id']
+        prefix = f"[{ctx['case_index']}/{total_cases}]"
+        case = ctx['case']
+        case_text = case.get('content', case.get('case_text', ''))
+        if not case_text:
+            print(f'⚠️ 案例 {case_id} 没有案例内容，跳过', flush=True)
+            with results_lock:
+                finish_case(ctx, failed=True)
+            return None
+        
+        print(f'{prefix} 处理案例: {case_id} - {case["title"]}', flush=True)
+        unified_case_data = unified_data.get(case_id) if unified_data else None
+        if unified_case_data and unified_case_data.get('questions'):
             # 使用统一问题数据（从DeepSeek结果文件提取）
-            unified_case_data = unified_data[case_id]
-            questions = unified_case_data.get('questions', [])
-            
-            if questions:
-                # 检查是否已有脱敏内容（从DeepSeek文件提取）
-                masked_content = unified_case_data.get('masked_content')
-                masked_judge = unified_case_data.get('masked_judge')
-                masked_title = unified_case_data.get('masked_title', '')
-                
-                if masked_content and masked_judge:
-                    # 直接使用DeepSeek文件中的脱敏内容，不重新脱敏
-                    print(f"[{case_index}/{total_cases}] → 步骤1/4: 使用DeepSeek文件中的脱敏数据（跳过脱敏处理）...", flush=True)
-                    print(f"[{case_index}/{total_cases}] ✓ 使用DeepSeek的脱敏数据", flush=True)
+            ctx['questions'] = unified_case_data['questions']
+            ctx['masked_title'] = unified_case_data.get('masked_title', '')
+            ctx['masked_content'] = unified_case_data.get('masked_content')
+            ctx['masked_judge'] = unified_case_data.get('masked_judge')
+            if ctx['masked_content'] and ctx['masked_judge']:
+                print(f"{prefix} → 步骤1/4: 使用DeepSeek文件中的脱敏数据（跳过脱敏处理）", flush=True)
+                return [ctx]
+            print(f"{prefix} → 步骤1/4: 脱敏处理（使用DeepSeek API）...", flush=True)
+        else:
+            print(f"{prefix} → 步骤1/4: 脱敏处理...", flush=True)
+        
+        case_dict = {
+            'title': case['title'],
+            'case_text': case_text,
+            'judge_decision': case.get('judge_decision', '')
+        }
+        try:
+            with telemetry_context(case_id=case_id):
+                masked_case = masker.mask_case_with_api(case_dict)
+        except Exception as e:
+            print(f"✗ 案例 {case_id} 脱敏失败: {str(e)}", flush=True)
+            import traceback
+            traceback.print_exc()
+            with results_lock:
+                finish_case(ctx, failed=True)
+            return None
+        
+        ctx['masked_title'] = masked_case.get('title_masked', '') or ctx.get('masked_title', '')
+        ctx['masked_content'] = masked_case.get('case_text_masked', '')
+        ctx['masked_judge'] = masked_case.get('judge_decision_masked', '')
+        print(f"{prefix} ✓ 脱敏完成", flush=True)
+        return [ctx]
+    
+    def questions_stage(ctx):
+        """步骤2/4: 生成问题（或复用现有问题），拆分为回答阶段的任务"""
+        case_id = ctx['case_id']
+        prefix = f"[{ctx['case_index']}/{total_cases}]"
+        if 'questions' in ctx:
+            print(f"{prefix} → 步骤2/4: 使用DeepSeek的问题（共{len(ctx['questions'])}个）", flush=True)
+        elif existing_questions_data and case_id in existing_questions_data:
+            ctx['questions'] = existing_questions_data[case_id]['questions']
+            print(f"{prefix} → 步骤2/4: 使用现有问题（共{len(ctx['questions'])}个，来自DeepSeek结果）", flush=True)
+        else:
+            print(f"{prefix} → 步骤2/4: 生成5个问题...", flush=True)
+            try:
+                with telemetry_context(case_id=case_id):
+                    ctx['questions'] = question_api.generate_questions(ctx['masked_content'], num_questions=5)
+            except Exception as e:
+                print(f"✗ 案例 {case_id} 问题生成失败: {str(e)}", flush=True)
+                import traceback
+                traceback.print_exc()
+                with results_lock:
+                    finish_case(ctx, failed=True)
+                return None
+            print(f"{prefix} ✓ 问题生成完成（共{len(ctx['questions'])}个）", flush=True)
+        
+        for i, question in enumerate(ctx['questions'], 1):
+            print(f"  问题{i}: {question[:80]}...", flush=True)
+        
+        # 续跑：复用结果日志中已完成的问题；其余问题分发到每个模型的回答阶段
+        tasks = []
+        ctx['remaining'] = 0
+        with results_lock:
+            for model in models:
+                reused_results, pending_questions = split_journaled_questions(
+                    ctx['questions'], (journaled or {}).get(model, {}).get(case_id))
+                all_results.extend(reused_results)
+                if reused_results:
+                    print(f"{prefix} ✓ {model_display_names[model]}: 复用结果日志中已完成的 {len(reused_results)} 个问题", flush=True)
+                ctx['remaining'] += len(pending_questions)
+                if not pending_questions:
+                    continue
+                # 多问题合并回答时整个案例作为一个回答任务，否则每个问题一个任务
+                if multi_question:
+                    tasks.append(Routed(f'answer:{model}', (ctx, model, pending_questions)))
                 else:
-                    # 如果没有脱敏内容，说明DeepSeek文件中没有存储脱敏数据
-                    # 使用DeepSeek API重新脱敏，但使用DeepSeek文件中的问题（确保一致性）
-                    print(f"[{case_index}/{total_cases}] → 步骤1/4: 脱敏处理（使用DeepSeek API）...", flush=True)
-                    masker = DataMaskerAPI()
+                    tasks.extend(Routed(f'answer:{model}', (ctx, model, [pending])) for pending in pending_questions)
+            if not tasks:
+                finish_case(ctx)
+        return tasks
+    
+    def answer_stage(task):
+        """步骤3/4: 生成AI回答（带失败重试），成功的回答交给评估阶段（每个模型一个回答阶段，工作线程只服务该模型）"""
+        ctx, model, pending_questions = task
+        case_id = ctx['case_id']
+        if not hasattr(thread_local, 'answer_api'):
+            thread_local.answer_api = create_answer_api(model, gpt_model, qwen_model)
+        
+        # 回答索引中已有的回答直接复用，不再调用模型
+        index_keys, indexed_answers = get_indexed_answers(thread_local.answer_api, ctx['masked_content'], pending_questions, use_thinking, multi_question)
+        if indexed_answers:
+            print(f"[{ctx['case_index']}/{total_cases}] ✓ {model_display_names[model]}: 复用回答索引中的 {len(indexed_answers)} 个回答", flush=True)
+        prefetched_answers = dict(indexed_answers)
+        
+        # 多问题合并回答：案例文本只发送一次，一次调用回答所有剩余问题（续跑或复用后只剩一个问题时也一样；未解析出的问题在下面单独回答）
+        to_answer = [(q_num, question) for q_num, question in pending_questions if q_num not in indexed_answers]
+        if multi_question and to_answer:
+            try:
+                with telemetry_context(stage=STAGE_ANSWER, case_id=case_id):
+                    answers = analyze_questions(thread_local.answer_api, ctx['masked_content'],
+                                                [question for _, question in to_answer], use_thinking=use_thinking)
+                combined = {q_num: answer for (q_num, _), answer in zip(to_answer, answers) if answer}
+                prefetched_answers.update(combined)
+                print(f"[{ctx['case_index']}/{total_cases}] ✓ 合并回答完成（{len(combined)}/{len(to_answer)}个问题）", flush=True)
+            except Exception as e:
+                print(f"[{ctx['case_index']}/{total_cases}] ⚠️ 合并回答失败，改为逐题回答: {str(e)}", flush=True)
+        
+        for q_num, question in pending_questions:
+            result = build_question_result(case_id, ctx['case']['title'], ctx['masked_title'], q_num, question, model_display_names[model])
+            for attempt in range(1, max_retries + 1):
+                try:
+                    # 合并回答已得到的结果只在第一次尝试时使用，重试时单独生成
+                    ai_response = prefetched_answers.pop(q_num, None)
+                    answered_alone = ai_response is None
+                    if answered_alone:
+                        with telemetry_context(stage=STAGE_ANSWER, case_id=case_id, question=q_num, attempt=attempt):
+                            # DeepSeek支持thinking模式，其他模型不传递该参数
+                            if model == 'deepseek':
+                                ai_response = thread_local.answer_api.analyze_case(ctx['masked_content'], question=question, use_thinking=use_thinking)
+                            else:
+                                ai_response = thread_local.answer_api.analyze_case(ctx['masked_content'], question=question)
+                    
+                    if isinstance(ai_response, dict):
+                        ai_answer = ai_response.get('answer', '')
+                        ai_thinking = ai_response.get('thinking', '')
+                    else:
+                        ai_answer = ai_response
+                        ai_thinking = ''
                     
-                    case_dict = {
-                        'title': case_title,
-                        'case_text': case_text,
-                        'judge_decision': judge_decision
-                    }
+                    if not ai_answer or not ai_answer.strip():
+                        raise Exception(f"AI回答为空（answer长度={len(ai_answer) if ai_answer else 0}字符）")
                     
-                    masked_case = masker.mask_case_with_api(case_dict)
+                    result['AI回答'] = ai_answer
+                    result['AI回答Thinking'] = ai_thinking or ''
+                    if q_num not in indexed_answers:
+                        # 合并回答模式下逐题补答的回答按逐题生成参数记录
+                        index_key = index_keys[q_num]
+                        if multi_question and answered_alone:
+                            index_key = make_answer_index_key(thread_local.answer_api, ctx['masked_content'], question, use_thinking)
+                        answer_index.set_answer(index_key, ai_answer, ai_thinking, model=model_display_names[model])
+                    print(f"  [{case_id} 问题{q_num}/5] ✓ AI回答生成完成（{len(ai_answer)}字符）", flush=True)
                     
-                    masked_title = masked_case.get('title_masked', '') or masked_title
-                    masked_content = masked_case.get('case_text_masked', '')
-                    masked_judge = masked_case.get('judge_decision_masked', '')
+                    if batch_eval:
+                        # 批处理评估：所有回答生成后统一提交
+                        finish_question(ctx, model, defer_evaluation(result, ai_answer, ctx['masked_judge'], question, ctx['masked_content']))
+                    else:
+                        yield (ctx, model, q_num, question, result)
+                    break
                     
-                    print(f"[{case_index}/{total_cases}] ✓ 脱敏完成", flush=True)
-                
-                print(f"[{case_index}/{total_cases}] → 步骤2/4: 使用DeepSeek的问题（共{len(questions)}个）...", flush=True)
-                print(f"[{case_index}/{total_cases}] ✓ 使用DeepSeek的问题", flush=True)
-            else:
-                # 如果没有问题，回退到正常流程
-                print(f"[{case_index}/{total_cases}] ⚠️ 未找到问题，使用正常流程...", flush=True)
-                unified_data = None  # 清除统一数据，使用正常流程
+                except Exception as e:
+                    import traceback
+                    # 熔断中的提供商直接失败，不再重试
+                    if attempt < max_retries and not isinstance(e, CircuitOpenError):
+                        print(f"  [{case_id} 问题{q_num}/5] ✗ 回答生成失败（第{attempt}次尝试）: {str(e)}，{retry_delay}秒后重试", flush=True)
+                        time.sleep(retry_delay)
+                    else:
+                        fail_question(ctx, model, result, q_num, str(e), traceback.format_exc())
+                        break
+    
+    def evaluate_stage(task):
+        """步骤4/4: 评估（带失败重试，只重试评估，不重新生成回答）"""
+        ctx, model, q_num, question, result = task
+        case_id = ctx['case_id']
+        for attempt in range(1, max_retries + 1):
+            try:
+                with telemetry_context(case_id=case_id, question=q_num, attempt=attempt):
+                    evaluation = evaluator.evaluate_answer(
+                        ai_answer=result['AI回答'],
+                        judge_decision=ctx['masked_judge'],
+                        question=question,
+                        case_text=ctx['masked_content']
+                    )
+                fill_evaluation_result(result, evaluation)
+                print(f"  [{case_id} 问题{q_num}/5] ✓ 评估完成（总分: {result['总分']:.2f}/20, 百分制: {result['百分制']:.2f}）", flush=True)
+                finish_question(ctx, model, result)
+                return None
+            except Exception as e:
+                import traceback
+                if attempt < max_retries and not isinstance(e, CircuitOpenError):
+                    print(f"  [{case_id} 问题{q_num}/5] ✗ 评估失败（第{attempt}次尝试）: {str(e)}，{retry_delay}秒后重试", flush=True)
+                    time.sleep(retry_delay)
+                else:
+                    fail_question(ctx, model, result, q_num, f"评估失败: {str(e)}", traceback.format_exc())
+                    return None
+    
+    pipeline = StagePipeline(
+        [Stage('mask', mask_stage, PIPELINE_MASK_WORKERS, PIPELINE_QUEUE_SIZE),
+         Stage('questions', questions_stage, PIPELINE_QUESTION_WORKERS, PIPELINE_QUEUE_SIZE)]
+        + [Stage(f'answer:{model}', answer_stage, answer_workers[model], PIPELINE_QUEUE_SIZE, next_stage='evaluate') for model in models]
+        + [Stage('evaluate', evaluate_stage, PIPELINE_EVALUATE_WORKERS, PIPELINE_QUEUE_SIZE)])
+    pipeline.run({'case_id': case_id, 'case': case, 'case_index': i + 1}
+                 for i, (case_id, case) in enumerate(selected_cases.items()))
+    pipeline.print_summary()
+    return all_results
+
+
+def load_rescore_rows(source):
+    """
+    读取要重新评分的结果：结果存储中的运行标识，或结果Excel文件（首次使用时导入结果存储）
+    
+    Returns:
+        (运行标识, 导出Excel的路径, {tab名称: [结果行]})
+    """
+    if os.path.exists(source):
+        stem = os.path.splitext(os.path.basename(source))[0]
+        run = f"{os.path.basename(os.path.dirname(os.path.abspath(source)))}/{stem}"
+        if not results_store.has_run(run):
+            print(f"导入结果文件到结果存储: {source}", flush=True)
+            print(f"  已导入 {results_store.import_workbook(run, source)} 条记录", flush=True)
+        output_dir = os.path.dirname(source)
+    else:
+        run = source
+        stem = os.path.basename(run)
+        output_dir = os.path.join('data', os.path.dirname(run))
+    output_file = os.path.join(output_dir, f"{stem}_重新评分_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+    return run, output_file, results_store.load_rows(run)
+
+
+def fill_rescore_result(result, evaluation, score_tag):
+    """将重新评分的结果写入带评分量表版本标记的列（如 '总分@v1.0'），保留原有分数列"""
+    for column, value in fill_evaluation_result({}, evaluation).items():
+        result[f'{column}@{score_tag}'] = value
+    return result
+
+
+def run_rescore_pipeline(rows_by_model, selected_cases, unified_data=None, evaluator=None, score_tag=RUBRIC_VERSION):
+    """
+    只重新评估已保存的AI回答（脱敏 → 评估，不重新生成回答），新分数写入带评分量表版本标记的列
+    
+    结果行中不保存脱敏后的案例文本和判决：统一数据中有脱敏内容时直接使用，否则重新脱敏（响应缓存命中时不产生调用）。
+    处理失败或没有AI回答的行、不在selected_cases中的案例保持不变。
+    
+    Returns:
+        {'rescored': 重新评分的行数, 'failed': 失败的行数, 'skipped': 跳过的行数}
+    """
+    max_retries = 3
+    retry_delay = 2  # 秒
+    evaluator = evaluator or AnswerEvaluator()
+    judge_id = evaluator.get_judge_id()
+    masker = DataMaskerAPI()
+    counts = {'rescored': 0, 'failed': 0, 'skipped': 0}
+    counts_lock = threading.Lock()
+    
+    by_case = {}
+    for rows in rows_by_model.values():
+        for row in rows:
+            answer = str(row.get('AI回答') or '')
+            if row.get('处理错误') or not answer.strip() or answer.startswith('[错误') or str(row.get('案例ID')) not in selected_cases:
+                counts['skipped'] += 1
+                continue
+            by_case.setdefault(str(row['案例ID']), []).append(row)
+    total_cases = len(by_case)
+    print(f"重新评分: {total_cases} 个案例，{sum(len(rows) for rows in by_case.values())} 个回答"
+          f"（跳过 {counts['skipped']} 行），评估模型: {judge_id}，分数列标记: @{score_tag}", flush=True)
+    
+    def mask_stage(ctx):
+        """获取评估所需的脱敏案例文本和判决"""
+        case_id = ctx['case_id']
+        unified_case_data = (unified_data or {}).get(case_id) or {}
+        if unified_case_data.get('masked_content') and unified_case_data.get('masked_judge'):
+            ctx['masked_content'] = unified_case_data['masked_content']
+            ctx['masked_judge'] = unified_case_data['masked_judge']
         else:
-            # 1. 脱敏处理（为了保持一致性，即使使用现有问题也重新脱敏，但使用相同的问题）
-            print(f"[{case_index}/{total_cases}] → 步骤1/4: 脱敏处理...", flush=True)
-            masker = DataMaskerAPI()
-            
+            case = selected_cases[case_id]
             case_dict = {
-                'title': case_title,
-                'case_text': case_text,
-                'judge_decision': judge_decision
+                'title': case['title'],
+                'case_text': case.get('content', case.get('case_text', '')),
+                'judge_decision': case.get('judge_decision', '')
             }
+            try:
+                with telemetry_context(case_id=case_id):
+                    masked_case = masker.mask_case_with_api(case_dict)
+            except Exception as e:
+                print(f"✗ 案例 {case_id} 脱敏失败，跳过重新评分: {str(e)}", flush=True)
+                with counts_lock:
+                    counts['failed'] += len(ctx['rows'])
+                return None
+            ctx['masked_content'] = masked_case.get('case_text_masked', '')
+            ctx['masked_judge'] = masked_case.get('judge_decision_masked', '')
+        print(f"[{ctx['case_index']}/{total_cases}] ✓ 案例 {case_id} 脱敏内容就绪，评估 {len(ctx['rows'])} 个回答", flush=True)
+        return [(ctx, row) for row in ctx['rows']]
+    
+    def evaluate_stage(task):
+        """重新评估一个回答（带失败重试）"""
+        ctx, row = task
+        case_id = ctx['case_id']
+        q_num = row.get('问题编号')
+        for attempt in range(1, max_retries + 1):
+            try:
+                with telemetry_context(case_id=case_id, question=q_num, attempt=attempt):
+                    evaluation = evaluator.evaluate_answer(
+                        ai_answer=row['AI回答'],
+                        judge_decision=ctx['masked_judge'],
+                        question=row.get('问题', ''),
+                        case_text=ctx['masked_content']
+                    )
+                fill_rescore_result(row, evaluation, score_tag)
+                row[f'评估API@{score_tag}'] = judge_id
+                print(f"  [{case_id} 问题{q_num} {row.get('使用的模型', '')}] ✓ 重新评分完成（总分: {evaluation['总分']:.2f}/20）", flush=True)
+                with counts_lock:
+                    counts['rescored'] += 1
+                return None
+            except Exception as e:
+                if attempt < max_retries and not isinstance(e, CircuitOpenError):
+                    print(f"  [{case_id} 问题{q_num}] ✗ 评估失败（第{attempt}次尝试）: {str(e)}，{retry_delay}秒后重试", flush=True)
+                    time.sleep(retry_delay)
+                else:
+                    print(f"  [{case_id} 问题{q_num}] ✗ 评估失败（已重试{max_retries}次）: {str(e)}", flush=True)
+                    row[f'处理错误@{score_tag}'] = f"评估失败: {str(e)}"
+                    with counts_lock:
+                        counts['failed'] += 1
+                    return None
+    
+    pipeline = StagePipeline([
+        Stage('mask', mask_stage, PIPELINE_MASK_WORKERS, PIPELINE_QUEUE_SIZE),
+        Stage('evaluate', evaluate_stage, PIPELINE_EVALUATE_WORKERS, PIPELINE_QUEUE_SIZE),
+    ])
+    pipeline.run({'case_id': case_id, 'rows': rows, 'case_index': i + 1} for i, (case_id, rows) in enumerate(by_case.items()))
+    pipeline.print_summary()
+    return counts
+
+
+def create_answer_api(model='deepseek', gpt_model='gpt-4o', qwen_model='qwen-max'):
+    """创建步骤3（生成AI回答）使用的同步API客户端"""
+    if model == 'gemini':
+        api = UnifiedModelAPI(model='gemini-2.5-flash')
+    elif model == 'gpt4o':
+        api = UnifiedModelAPI(model=gpt_model)
+    elif model == 'claude':
+        api = UnifiedModelAPI(model='claude-opus-4-20250514')
+    elif model == 'qwen':
+        api = UnifiedModelAPI(model=qwen_model)
+    else:
+        # 默认使用DeepSeek（支持thinking模式）
+        api = DeepSeekAPI()
+    return api
+
+
+def create_async_answer_api(model='deepseek', gpt_model='gpt-4o', qwen_model='qwen-max'):
+    """创建步骤3（生成AI回答）使用的异步API客户端"""
+    return AsyncAPIClient(create_answer_api(model, gpt_model, qwen_model))
+
+
+def get_answer_workers(models, gpt_model='gpt-4o', qwen_model='qwen-max'):
+    """
+    按提供商分配回答阶段的工作线程数：同一提供商的模型共用速率限制、并发控制和连接池，平分PIPELINE_ANSWER_WORKERS
+    （gpt4o、claude、gemini、qwen都通过统一模型代理，即同一个openai提供商）
+    
+    Returns:
+        {模型: 工作线程数}
+    """
+    providers = {model: create_answer_api(model, gpt_model, qwen_model).provider for model in models}
+    workers = {}
+    for provider in dict.fromkeys(providers.values()):
+        provider_models = [model for model in models if providers[model] == provider]
+        share, extra = divmod(PIPELINE_ANSWER_WORKERS, len(provider_models))
+        for i, model in enumerate(provider_models):
+            workers[model] = max(1, share + (1 if i < extra else 0))
+    return workers
+
+
+async def process_single_case_async(case_id, case, case_index, total_cases, answer_api, masker, question_api, evaluator,
+                                    model='deepseek', unified_data=None, qwen_model='qwen-max', use_thinking=True, batch_eval=False,
+                                    multi_question=False, journal=None, journaled_rows=None):
+    """处理单个案例（异步版本，用于--async模式，流程与run_cases_pipeline一致）"""
+    print(f'[{case_index}/{total_cases}] 处理案例: {case_id} - {case["title"]}', flush=True)
+    
+    case_title = case['title']
+    case_text = case.get('content', case.get('case_text', ''))
+    judge_decision = case.get('judge_decision', '')
+    
+    if not case_text:
+        print(f'⚠️ 案例 {case_id} 没有案例内容，跳过', flush=True)
+        return None
+    
+    case_dict = {
+        'title': case_title,
+        'case_text': case_text,
+        'judge_decision': judge_decision
+    }
+    
+    try:
+        unified_case_data = unified_data.get(case_id) if unified_data else None
+        if unified_case_data and unified_case_data.get('questions'):
+            # 使用统一问题数据（从DeepSeek结果文件提取）
+            questions = unified_case_data['questions']
+            masked_title = unified_case_data.get('masked_title', '')
+            masked_content = unified_case_data.get('masked_content')
+            masked_judge = unified_case_data.get('masked_judge')
             
-            masked_case = masker.mask_case_with_api(case_dict)
-            
+            if not (masked_content and masked_judge):
+                print(f"[{case_index}/{total_cases}] → 步骤1/4: 脱敏处理（使用DeepSeek API）...", flush=True)
+                with telemetry_context(case_id=case_id):
+                    masked_case = await masker.mask_case_with_api_async(case_dict)
+                masked_title = masked_case.get('title_masked', '') or masked_title
+                masked_content = masked_case.get('case_text_masked', '')
+                masked_judge = masked_case.get('judge_decision_masked', '')
+        else:
+            # 1. 脱敏处理
+            print(f"[{case_index}/{total_cases}] → 步骤1/4: 脱敏处理...", flush=True)
+            with telemetry_context(case_id=case_id):
+                masked_case = await masker.mask_case_with_api_async(case_dict)
             masked_title = masked_case.get('title_masked', '')
             masked_content = masked_case.get('case_text_masked', '')
             masked_judge = masked_case.get('judge_decision_masked', '')
             
-            print(f"[{case_index}/{total_cases}] ✓ 脱敏完成", flush=True)
-            
-            print(flush=True)
-            
-            # 2. 生成问题（使用DeepSeek API）或复用现有问题
-            if existing_questions_data and case_id in existing_questions_data:
-                # 使用现有问题（从DeepSeek结果中提取）
-                print(f"[{case_index}/{total_cases}] → 步骤2/4: 使用现有问题（来自DeepSeek结果）...", flush=True)
-                case_questions_data = existing_questions_data[case_id]
-                questions = case_questions_data['questions']
-                print(f"[{case_index}/{total_cases}] ✓ 使用现有问题（共{len(questions)}个）", flush=True)
-            else:
-                # 生成新问题
-                print(f"[{case_index}/{total_cases}] → 步骤2/4: 生成5个问题...", flush=True)
-                deepseek_api = UnifiedAIAPI(provider='deepseek')  # 步骤2使用DeepSeek
-                questions = deepseek_api.generate_questions(masked_content, num_questions=5)
-                print(f"[{case_index}/{total_cases}] ✓ 问题生成完成（共{len(questions)}个）", flush=True)
+            # 2. 生成问题（使用DeepSeek API）
+            print(f"[{case_index}/{total_cases}] → 步骤2/4: 生成5个问题...", flush=True)
+            with telemetry_context(case_id=case_id):
+                questions = await question_api.generate_questions_async(masked_content, num_questions=5)
         
-        print(flush=True)
+        print(f"[{case_index}/{total_cases}] ✓ 脱敏与问题准备完成（共{len(questions)}个问题）", flush=True)
         
-        # 显示问题
-        for i, question in enumerate(questions, 1):
-            print(f"  问题{i}: {question[:80]}...", flush=True)
-        print(flush=True)
+        model_display_name = get_model_display_name(model, qwen_model, use_thinking)
+        
+        # 续跑：复用结果日志中已完成的问题
+        reused_results, pending_questions = split_journaled_questions(questions, journaled_rows)
+        if reused_results:
+            print(f"[{case_index}/{total_cases}] ✓ 复用结果日志中已完成的 {len(reused_results)} 个问题", flush=True)
         
-        # 3. 处理每个问题（生成AI回答并评估）
-        print(f"[{case_index}/{total_cases}] → 步骤3/4: 生成AI回答...", flush=True)
+        # 回答索引中已有的回答直接复用，不再调用模型
+        index_keys, indexed_answers = get_indexed_answers(answer_api, masked_content, pending_questions, use_thinking, multi_question)
+        if indexed_answers:
+            print(f"[{case_index}/{total_cases}] ✓ 复用回答索引中的 {len(indexed_answers)} 个回答", flush=True)
+        prefetched_answers = dict(indexed_answers)
+        
+        # 多问题合并回答（未解析出的问题在下面单独回答）
+        to_answer = [(q_num, question) for q_num, question in pending_questions if q_num not in indexed_answers]
+        if multi_question and to_answer:
+            try:
+                with telemetry_context(stage=STAGE_ANSWER, case_id=case_id):
+                    answers = await analyze_questions_async(answer_api, masked_content,
+                                                            [question for _, question in to_answer], use_thinking=use_thinking)
+                prefetched_answers.update({q_num: answer for (q_num, _), answer in zip(to_answer, answers) if answer})
+            except Exception as e:
+                print(f"[{case_index}/{total_cases}] ⚠️ 合并回答失败，改为逐题回答: {str(e)}", flush=True)
         
-        def process_single_question(question, q_num):
+        async def process_single_question_async(question, q_num):
             """处理单个问题（带失败重试机制）"""
-            # 重试配置
             max_retries = 3
             retry_delay = 2  # 秒
             
-            # 为每个线程创建独立的API实例，避免锁竞争
-            if model == 'gemini':
-                thread_ai_api = UnifiedModelAPI(model='gemini-2.5-flash')
-            elif model == 'gpt4o':
-                thread_ai_api = UnifiedAIAPI(provider='chatgpt', model=gpt_model)
-                print(f"  [问题{q_num}/5] 使用GPT模型: {gpt_model}", flush=True)
-            elif model == 'claude':
-                thread_ai_api = UnifiedModelAPI(model='claude-opus-4-20250514')
-                print(f"  [问题{q_num}/5] 使用Claude模型: claude-opus-4-20250514", flush=True)
-            elif model == 'qwen':
-                thread_ai_api = UnifiedModelAPI(model=qwen_model)
-                print(f"  [问题{q_num}/5] 使用Qwen模型: {qwen_model}", flush=True)
-            else:
-                # 默认使用DeepSeek（支持thinking模式）
-                thread_ai_api = UnifiedAIAPI(provider='deepseek')
-            
-            # 确定模型显示名称
-            if model == 'qwen':
-                model_display_name = f'Qwen-{qwen_model.split("-")[-1].title()}'
-            elif model == 'deepseek':
-                # DeepSeek根据是否使用thinking模式显示不同名称
-                if use_thinking:
-                    model_display_name = 'DeepSeek'
-                else:
-                    model_display_name = 'DeepSeek-NoThinking'
-            else:
-                model_display_name = {
-                    'gpt4o': 'GPT-4o',
-                    'gemini': 'Gemini 2.5 Flash',
-                    'claude': 'Claude Opus 4'
-                }.get(model, model.upper())
+            result = build_question_result(case_id, case_title, masked_title, q_num, question, model_display_name)
             
-            result = {
-                '案例ID': case_id,
-                '案例标题': case_title,
-                '案例标题（脱敏）': masked_title,
-                '问题编号': q_num,
-                '问题': question,
-                '使用的模型': model_display_name,  # 步骤3使用的模型
-                '脱敏API': 'DeepSeek',  # 步骤1使用的API
-                '问题生成API': 'DeepSeek',  # 步骤2使用的API
-                '评估API': 'DeepSeek'  # 步骤4使用的API
-            }
-            
-            # 重试循环
-            last_error = None
             for attempt in range(1, max_retries + 1):
                 try:
-                    # 生成AI回答（步骤3使用选择的模型）
-                    if attempt == 1:
-                        print(f"  [问题{q_num}/5] 开始生成AI回答...", flush=True)
-                    else:
-                        print(f"  [问题{q_num}/5] 第{attempt}次重试（共{max_retries}次）...", flush=True)
-                    
-                    # DeepSeek支持thinking模式，其他模型不支持
-                    # 对于Gemini、GPT-4o和Claude，不传递use_thinking参数
-                    if model == 'deepseek':
-                        ai_response = thread_ai_api.analyze_case(masked_content, question=question, use_thinking=use_thinking)
-                    else:
-                        # Gemini、GPT-4o和Claude不支持thinking模式，不传递该参数
-                        ai_response = thread_ai_api.analyze_case(masked_content, question=question)
-                    
-                    if isinstance(ai_response, dict):
-                        ai_answer = ai_response.get('answer', '')
-                        ai_thinking = ai_response.get('thinking', '')
-                    else:
-                        ai_answer = ai_response
-                        ai_thinking = ''
+                    # 步骤3/4: 生成AI回答（非DeepSeek模型会忽略use_thinking）
+                    ai_response = prefetched_answers.pop(q_num, None)
+                    answered_alone = ai_response is None
+                    if answered_alone:
+                        with telemetry_context(stage=STAGE_ANSWER, case_id=case_id, question=q_num, attempt=attempt):
+                            ai_response = await answer_api.analyze_case(masked_content, question=question, use_thinking=use_thinking)
+                    ai_answer = ai_response.get('answer', '')
+                    ai_thinking = ai_response.get('thinking', '')
                     
-                    # 检查AI回答是否为空
                     if not ai_answer or not ai_answer.strip():
-                        error_msg = f"AI回答为空（answer长度={len(ai_answer) if ai_answer else 0}字符）"
-                        print(f"  [问题{q_num}/5] ⚠️ {error_msg}", flush=True)
-                        if ai_thinking and ai_thinking.strip():
-                            print(f"  [问题{q_num}/5] 注意：thinking内容存在（{len(ai_thinking)}字符），但answer为空", flush=True)
-                        print(f"  [问题{q_num}/5] 详细信息：案例ID={case_id}, 问题编号={q_num}, 模型={model}", flush=True)
-                        raise Exception(error_msg)
+                        raise Exception(f"AI回答为空（answer长度={len(ai_answer) if ai_answer else 0}字符）")
                     
                     result['AI回答'] = ai_answer
-                    if ai_thinking:
-                        result['AI回答Thinking'] = ai_thinking
-                    else:
-                        result['AI回答Thinking'] = ''
+                    result['AI回答Thinking'] = ai_thinking or ''
+                    if q_num not in indexed_answers:
+                        # 合并回答模式下逐题补答的回答按逐题生成参数记录
+                        index_key = index_keys[q_num]
+                        if multi_question and answered_alone:
+                            index_key = make_answer_index_key(answer_api, masked_content, question, use_thinking)
+                        answer_index.set_answer(index_key, ai_answer, ai_thinking, model=model_display_name)
                     
-                    print(f"  [问题{q_num}/5] ✓ AI回答生成完成（{len(ai_answer)}字符）", flush=True)
+                    if batch_eval:
+                        # 批处理评估：所有回答生成后统一提交
+                        return defer_evaluation(result, ai_answer, masked_judge, question, masked_content)
                     
                     # 步骤4/4: 进行评估（使用DeepSeek API）
-                    print(f"  [问题{q_num}/5] → 步骤4/4: 开始评估...", flush=True)
-                    evaluator = AnswerEvaluator()  # 使用默认的DeepSeek API进行评估
-                    evaluation = evaluator.evaluate_answer(
-                        ai_answer=ai_answer,
-                        judge_decision=masked_judge,
-                        question=question,
-                        case_text=masked_content
-                    )
-                    
-                    result['总分'] = evaluation['总分']
-                    result['百分制'] = evaluation['百分制']
-                    result['分档'] = evaluation['分档']
-                    
-                    # 各维度得分（从'各维度得分'字典中获取）
-                    dimension_scores = evaluation.get('各维度得分', {})
-                    result['规范依据相关性_得分'] = dimension_scores.get('规范依据相关性', 0)
-                    result['涵摄链条对齐度_得分'] = dimension_scores.get('涵摄链条对齐度', 0)
-                    result['价值衡量与同理心对齐度_得分'] = dimension_scores.get('价值衡量与同理心对齐度', 0)
-                    result['关键事实与争点覆盖度_得分'] = dimension_scores.get('关键事实与争点覆盖度', 0)
-                    result['裁判结论与救济配置一致性_得分'] = dimension_scores.get('裁判结论与救济配置一致性', 0)
-                    
-                    # 错误标记
-                    result['错误标记'] = evaluation.get('错误标记', '')
-                    # 从错误详情中提取各类型错误
-                    error_details = evaluation.get('错误详情', {})
-                    result['微小错误'] = '; '.join(error_details.get('微小错误', [])) if error_details.get('微小错误') else ''
-                    result['明显错误'] = '; '.join(error_details.get('明显错误', [])) if error_details.get('明显错误') else ''
-                    result['重大错误'] = '; '.join(error_details.get('重大错误', [])) if error_details.get('重大错误') else ''
-                    
-                    # 详细评价
-                    result['详细评价'] = evaluation.get('详细评价', '')
-                    result['评价Thinking'] = evaluation.get('评价Thinking', '')
-                    
-                    result['处理错误'] = ''
-                    
-                    print(f"  [问题{q_num}/5] ✓ 评估完成（总分: {result['总分']:.2f}/20, 百分制: {result['百分制']:.2f}）", flush=True)
-                    
-                    # 如果重试成功，记录重试信息
-                    if attempt > 1:
-                        print(f"  [问题{q_num}/5] ✓ 重试成功（第{attempt}次尝试）", flush=True)
+                    with telemetry_context(case_id=case_id, question=q_num, attempt=attempt):
+                        evaluation = await evaluator.evaluate_answer_async(
+                            ai_answer=ai_answer,
+                            judge_decision=masked_judge,
+                            question=question,
+                            case_text=masked_content
+                        )
+                    fill_evaluation_result(result, evaluation)
                     
+                    print(f"  [{case_id} 问题{q_num}/5] ✓ 评估完成（总分: {result['总分']:.2f}/20）", flush=True)
                     return result
                     
                 except Exception as e:
                     import traceback
                     error_detail = traceback.format_exc()
                     error_msg = str(e)
-                    last_error = (error_msg, error_detail)
                     
-                    if attempt < max_retries:
-                        print(f"  [问题{q_num}/5] ✗ 处理失败（第{attempt}次尝试）: {error_msg}", flush=True)
-                        print(f"  [问题{q_num}/5] 等待 {retry_delay} 秒后重试...", flush=True)
-                        time.sleep(retry_delay)
+                    # 熔断中的提供商直接失败，不再重试
+                    if attempt < max_retries and not isinstance(e, CircuitOpenError):
+                        print(f"  [{case_id} 问题{q_num}/5] ✗ 处理失败（第{attempt}次尝试）: {error_msg}", flush=True)
+                        await asyncio.sleep(retry_delay)
                     else:
-                        # 最后一次尝试也失败
-                        print(f"  [问题{q_num}/5] ✗ 处理失败（已重试{max_retries}次）: {error_msg}", flush=True)
-                        print(f"  [问题{q_num}/5] 错误详情:", flush=True)
-                        print(f"  {error_detail}", flush=True)
-                        print(f"  [问题{q_num}/5] 上下文信息：案例ID={case_id}, 问题编号={q_num}, 模型={model_display_name}", flush=True)
-                        
-                        # 记录详细错误信息（包含重试信息）
-                        error_msg_with_retry = f"{error_msg}（已重试{max_retries}次）"
-                        result['处理错误'] = f"{error_msg_with_retry}\n详细堆栈:\n{error_detail}"
-                        
-                        # 确保AI回答字段有值（即使是错误标记）
-                        if 'AI回答' not in result or not result.get('AI回答'):
-                            result['AI回答'] = f"[错误：{error_msg_with_retry}]"
-                            result['AI回答Thinking'] = ''
-                        
-                        # 如果评估未完成，设置默认值
-                        if '总分' not in result:
-                            result['总分'] = 0
-                            result['百分制'] = 0
-                            result['分档'] = '处理失败'
-                            result['详细评价'] = f'处理失败：{error_msg_with_retry}'
-                        
+                        print(f"  [{case_id} 问题{q_num}/5] ✗ 处理失败（已重试{max_retries}次）: {error_msg}", flush=True)
+                        fill_failure_result(result, f"{error_msg}（已重试{max_retries}次）", error_detail)
                         return result
-            
-            # 理论上不会到达这里，但为了安全起见
-            if last_error:
-                error_msg, error_detail = last_error
-                result['处理错误'] = f"{error_msg}\n详细堆栈:\n{error_detail}"
-                if 'AI回答' not in result or not result.get('AI回答'):
-                    result['AI回答'] = f"[错误：{error_msg}]"
-                    result['AI回答Thinking'] = ''
-                if '总分' not in result:
-                    result['总分'] = 0
-                    result['百分制'] = 0
-                    result['分档'] = '处理失败'
-                    result['详细评价'] = f'处理失败：{error_msg}'
-            
-            return result
-        
-        # 并行处理所有问题（每个问题独立线程并发处理）
-        max_workers = min(MAX_CONCURRENT_WORKERS, len(questions))
-        print(f"[{case_index}/{total_cases}] 使用 {max_workers} 个并发线程处理 {len(questions)} 个问题", flush=True)
-        
-        with SafeThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_question = {
-                executor.submit(process_single_question, q, i+1): (i+1, q)
-                for i, q in enumerate(questions)
-            }
-            
-            completed_questions = 0
-            for future in concurrent.futures.as_completed(future_to_question):
-                q_num, question = future_to_question[future]
-                try:
-                    result = future.result()
-                    if result:
-                        all_results.append(result)
-                        completed_questions += 1
-                        print(f"[{case_index}/{total_cases}] 问题进度: {completed_questions}/{len(questions)} 已完成", flush=True)
-                except Exception as e:
-                    completed_questions += 1
-                    print(f"[{case_index}/{total_cases}] ✗ 问题{q_num}处理异常: {str(e)}", flush=True)
-                    import traceback
-                    traceback.print_exc()
         
-        print(f"[{case_index}/{total_cases}] ✓ 所有问题处理完成（共{len(all_results)}个）", flush=True)
-        print(flush=True)
+        async def process_and_journal(question, q_num):
+            result = await process_single_question_async(question, q_num)
+            if result and journal is not None:
+                journal.append(result)
+            return result
         
-        return all_results
+        results = await asyncio.gather(*[
+            process_and_journal(q, q_num) for q_num, q in pending_questions
+        ])
+        return reused_results + [r for r in results if r]
         
     except Exception as e:
         print(f"✗ 案例 {case_id} 处理失败: {str(e)}", flush=True)
@@ -371,6 +884,44 @@ def process_single_case(case_id, case, case_index, total_cases, model='deepseek'
         return None
 
 
+async def run_cases_async(selected_cases, model='deepseek', unified_data=None, gpt_model='gpt-4o', qwen_model='qwen-max', use_thinking=True, batch_eval=False,
+                          multi_question=False, journal=None, journaled=None):
+    """在单个事件循环中处理所有案例（--async模式），返回所有结果行"""
+    answer_api = create_async_answer_api(model, gpt_model, qwen_model)
+    masker = DataMaskerAPI()
+    question_api = UnifiedAIAPI(provider='deepseek')  # 步骤2使用DeepSeek
+    evaluator = AnswerEvaluator()  # 使用默认的DeepSeek API进行评估
+    
+    total_cases = len(selected_cases)
+    all_results = []
+    completed_count = 0
+    batch_start_time = time.time()
+    
+    tasks = [
+        asyncio.create_task(process_single_case_async(
+            case_id, case, i + 1, total_cases, answer_api, masker, question_api, evaluator,
+            model=model, unified_data=unified_data, qwen_model=qwen_model, use_thinking=use_thinking, batch_eval=batch_eval,
+            multi_question=multi_question, journal=journal, journaled_rows=(journaled or {}).get(case_id)))
+        for i, (case_id, case) in enumerate(selected_cases.items())
+    ]
+    
+    try:
+        for future in asyncio.as_completed(tasks):
+            results = await future
+            completed_count += 1
+            if results:
+                all_results.extend(results)
+            elapsed = time.time() - batch_start_time
+            print(f"[总体进度] {completed_count}/{total_cases} 个案例已完成 ({completed_count / total_cases * 100:.1f}%)，已用时间: {elapsed:.1f}秒", flush=True)
+            circuit_status = format_circuit_status()
+            if circuit_status:
+                print(f"[总体进度] 熔断状态: {circuit_status}", flush=True)
+    finally:
+        await close_async_session()
+    
+    return all_results
+
+
 def find_latest_existing_file():
     """查找最新的现有结果文件"""
     pattern = 'data/*案例*评估*.xlsx'
@@ -381,262 +932,24 @@ def find_latest_existing_file():
     return latest_file
 
 
-def main():
-    setup_signal_handlers()
+def save_model_results(all_results, model, args, existing_df=None, unified_data=None, selected_cases=None, target_case_ids=None):
+    """
+    保存一个模型的结果行（合并现有结果、按运行模式确定文件和tab）并打印统计
     
-    # 解析命令行参数
-    parser = argparse.ArgumentParser(description='统一案例处理脚本 - 支持选择不同模型')
-    parser.add_argument('--model', type=str, default='deepseek', choices=['deepseek', 'gpt4o', 'gemini', 'claude', 'qwen'],
-                        help='选择模型: deepseek (默认), gpt4o, gemini, claude, 或 qwen')
-    parser.add_argument('--num_cases', type=int, default=None,
-                        help='处理的案例数量（默认: 处理所有案例或指定案例列表）')
-    parser.add_argument('--case_ids', type=str, nargs='+', default=None,
-                        help='指定要处理的案例ID列表（例如: --case_ids case_001 case_002）')
-    parser.add_argument('--all', action='store_true',
-                        help='处理所有案例')
-    parser.add_argument('--standalone', action='store_true',
-                        help='独立保存，不合并到现有文件')
-    parser.add_argument('--use_ds_questions', type=str, default=None,
-                        help='使用DeepSeek结果文件中的问题（指定DeepSeek结果文件路径，如108个案例的完整版文件）')
-    parser.add_argument('--use_unified_data', type=str, default=None,
-                        help='使用统一脱敏和问题数据文件（JSON格式，由prepare_unified_masking_questions.py生成）')
-    parser.add_argument('--gpt-model', type=str, default='gpt-4o',
-                        help='指定GPT模型名称，如 gpt-4o, gpt-4.1-2025-04-14, gpt-5-chat-latest, o3-2025-04-16 等')
-    parser.add_argument('--qwen-model', type=str, default='qwen-max',
-                        help='指定Qwen模型名称，如 qwen-turbo, qwen-plus, qwen-max (默认: qwen-max)')
-    parser.add_argument('--no-thinking', action='store_true',
-                        help='DeepSeek不使用thinking模式（仅对deepseek模型有效）')
-    args = parser.parse_args()
-    
-    model = args.model
-    num_cases = args.num_cases
-    case_ids_arg = args.case_ids
-    process_all = args.all
+    Args:
+        all_results: 该模型的结果行
+        model: 模型（如 'deepseek'、'gpt4o'）
+        args: 命令行参数
+        existing_df: 合并模式下读取的现有结果（会被修改，多个模型时传入副本）
+        unified_data: 统一脱敏和问题数据
+        selected_cases: 本次处理的案例
+        target_case_ids: 本次处理的案例ID列表（用于按顺序打印案例详情）
+    """
     standalone = args.standalone
-    gpt_model = args.gpt_model
-    qwen_model = args.qwen_model
-    use_thinking = not args.no_thinking  # 如果指定了--no-thinking，则use_thinking=False
-    
-    print('=' * 80, flush=True)
-    print(f'统一案例处理脚本 - 步骤3使用 {model.upper()} 模型', flush=True)
-    print('=' * 80, flush=True)
-    if args.use_unified_data:
-        print(f'步骤1/4: 脱敏处理 → 使用统一数据（跳过）', flush=True)
-        print(f'步骤2/4: 生成问题 → 使用统一数据（跳过）', flush=True)
-    elif args.use_ds_questions:
-        print(f'步骤1/4: 脱敏处理 → DeepSeek API（使用DeepSeek API重新脱敏）', flush=True)
-        print(f'步骤2/4: 生成问题 → 使用DeepSeek结果文件中的问题', flush=True)
-    else:
-        print(f'步骤1/4: 脱敏处理 → DeepSeek API', flush=True)
-        print(f'步骤2/4: 生成问题 → DeepSeek API', flush=True)
-    print(f'步骤3/4: 生成AI回答 → {model.upper()} API', flush=True)
-    print(f'步骤4/4: 评估 → DeepSeek API', flush=True)
-    print('=' * 80, flush=True)
-    print(flush=True)
-    
-    with open('data/cases/cases.json', 'r', encoding='utf-8') as f:
-        cases = json.load(f)
-    
-    # 确定要处理的案例ID列表
-    if case_ids_arg:
-        # 使用命令行指定的案例ID
-        target_case_ids = case_ids_arg
-    elif process_all:
-        # 处理所有案例
-        target_case_ids = list(cases.keys())
-    elif num_cases:
-        # 处理前N个案例
-        target_case_ids = list(cases.keys())[:num_cases]
-    else:
-        # 默认：处理所有案例
-        target_case_ids = list(cases.keys())
-    
-    # 验证这些案例是否存在
-    selected_cases = {}
-    for case_id in target_case_ids:
-        if case_id in cases:
-            selected_cases[case_id] = cases[case_id]
-        else:
-            print(f"⚠️ 警告: 案例 {case_id} 不在 cases.json 中", flush=True)
-    
-    if not selected_cases:
-        print("错误：没有找到需要处理的案例", flush=True)
-        return
-    
-    print(f"将处理以下 {len(selected_cases)} 个案例:", flush=True)
-    for i, (case_id, case) in enumerate(selected_cases.items(), 1):
-        print(f"  {i}. {case_id}: {case['title']}", flush=True)
-    print(flush=True)
-    
-    # 加载统一脱敏和问题数据（如果指定，优先级最高）
-    unified_data = None
-    if args.use_unified_data:
-        unified_file = args.use_unified_data
-        if os.path.exists(unified_file):
-            print(f"加载统一脱敏和问题数据: {unified_file}", flush=True)
-            try:
-                with open(unified_file, 'r', encoding='utf-8') as f:
-                    unified_data = json.load(f)
-                print(f"✓ 成功加载 {len(unified_data)} 个案例的统一数据", flush=True)
-            except Exception as e:
-                print(f"✗ 加载统一数据失败: {str(e)}", flush=True)
-                unified_data = None
-        else:
-            print(f"⚠️ 统一数据文件不存在: {unified_file}，将使用默认流程", flush=True)
-    
-    # 加载DeepSeek的108个案例结果文件（如果指定，且未使用统一数据）
-    # 直接从DeepSeek结果文件中提取问题和脱敏数据
-    existing_questions_data = None
-    unified_data_from_ds = None  # 从DeepSeek文件提取的统一数据
-    if not unified_data and args.use_ds_questions:
-        ds_file = args.use_ds_questions
-        if os.path.exists(ds_file):
-            print(f"从DeepSeek结果文件加载问题和脱敏数据: {ds_file}", flush=True)
-            try:
-                ds_df = pd.read_excel(ds_file, engine='openpyxl')
-                print(f"  读取到 {len(ds_df)} 行数据", flush=True)
-                
-                # 如果有"使用的模型"列，只提取DeepSeek处理的结果；否则假设所有数据都是DeepSeek的
-                if '使用的模型' in ds_df.columns:
-                    ds_df_filtered = ds_df[ds_df['使用的模型'] == 'DeepSeek']
-                    if len(ds_df_filtered) > 0:
-                        ds_df = ds_df_filtered
-                        print(f"  筛选DeepSeek数据后: {len(ds_df)} 行", flush=True)
-                    else:
-                        print(f"  ⚠️ 未找到DeepSeek数据，使用全部数据", flush=True)
-                
-                # 提取统一数据（包含问题和脱敏内容）
-                unified_data_from_ds = {}
-                # 先打印所有列名，便于调试
-                print(f"  DeepSeek文件包含的列: {list(ds_df.columns)[:20]}...", flush=True)
-                
-                for case_id in selected_cases.keys():
-                    case_data = ds_df[ds_df['案例ID'] == case_id]
-                    if len(case_data) > 0:
-                        # 按问题编号排序，确保顺序一致
-                        case_data = case_data.sort_values('问题编号')
-                        questions = case_data['问题'].tolist()
-                        if len(questions) >= 5:
-                            questions = questions[:5]  # 只取前5个问题
-                            first_row = case_data.iloc[0]
-                            
-                            # 提取脱敏数据（如果存在）
-                            masked_title = first_row.get('案例标题（脱敏）', '')
-                            
-                            # 尝试从可能的列名中提取脱敏内容
-                            # 注意：DeepSeek结果文件中可能不存储完整的脱敏内容
-                            # 如果找不到，我们需要从原始案例重新脱敏，但使用相同的问题
-                            possible_content_cols = ['案例内容（脱敏）', '脱敏内容', '案例文本（脱敏）', '案例内容', 'case_text_masked', '详细评价']
-                            possible_judge_cols = ['法官判决（脱敏）', '判决（脱敏）', '法官决定（脱敏）', '法官判决', 'judge_decision_masked']
-                            
-                            masked_content = None
-                            masked_judge = None
-                            
-                            # 尝试提取脱敏内容
-                            for col in possible_content_cols:
-                                if col in first_row.index:
-                                    value = first_row[col]
-                                    if pd.notna(value) and str(value).strip() and len(str(value).strip()) > 50:  # 确保内容足够长
-                                        masked_content = str(value).strip()
-                                        print(f"  ✓ 从列 '{col}' 提取到脱敏内容（{len(masked_content)}字符）", flush=True)
-                                        break
-                            
-                            # 尝试提取脱敏判决
-                            for col in possible_judge_cols:
-                                if col in first_row.index:
-                                    value = first_row[col]
-                                    if pd.notna(value) and str(value).strip():
-                                        masked_judge = str(value).strip()
-                                        print(f"  ✓ 从列 '{col}' 提取到脱敏判决（{len(masked_judge)}字符）", flush=True)
-                                        break
-                            
-                            # 如果还是找不到，尝试从原始案例数据中获取（但需要重新脱敏）
-                            # 由于DeepSeek文件可能不存储脱敏内容，我们标记为None，让后续逻辑处理
-                            unified_data_from_ds[case_id] = {
-                                'questions': questions,
-                                'masked_title': masked_title,
-                                'masked_content': masked_content,  # 可能为None，需要重新脱敏
-                                'masked_judge': masked_judge,  # 可能为None，需要重新脱敏
-                            }
-                            
-                            if masked_content and masked_judge:
-                                print(f"  ✓ 案例 {case_id}: 找到脱敏数据，将直接使用（不重新脱敏）", flush=True)
-                            else:
-                                print(f"  ⚠️ 案例 {case_id}: DeepSeek文件中未找到脱敏数据，将使用DeepSeek API重新脱敏", flush=True)
-                            print(f"  ✓ 案例 {case_id}: 找到 {len(questions)} 个问题", flush=True)
-                        else:
-                            print(f"  ⚠️ 案例 {case_id}: 问题数量不足（{len(questions)}个），将重新生成", flush=True)
-                    else:
-                        print(f"  ⚠️ 案例 {case_id}: 未找到数据，将重新生成", flush=True)
-                
-                if unified_data_from_ds:
-                    print(f"✓ 成功从DeepSeek文件加载 {len(unified_data_from_ds)} 个案例的问题数据", flush=True)
-                    # 将统一数据赋值给unified_data，这样process_single_case会使用它
-                    unified_data = unified_data_from_ds
-                else:
-                    print("⚠️ 未找到匹配的问题数据，将重新生成", flush=True)
-                    unified_data_from_ds = None
-            except Exception as e:
-                print(f"✗ 读取DeepSeek结果文件失败: {str(e)}", flush=True)
-                import traceback
-                print(traceback.format_exc(), flush=True)
-        else:
-            print(f"⚠️ DeepSeek结果文件不存在: {ds_file}，将重新生成问题", flush=True)
-    
-    # 查找现有的结果文件（仅在非独立模式下）
-    existing_df = None
-    if not standalone:
-        latest_result_file = find_latest_existing_file()
-        if latest_result_file and os.path.exists(latest_result_file):
-            print(f"找到现有结果文件: {latest_result_file}")
-            existing_df = pd.read_excel(latest_result_file)
-            print(f"现有文件包含 {len(existing_df)} 条记录，涉及 {existing_df['案例ID'].nunique()} 个案例")
-        else:
-            print("未找到现有结果文件，将创建新文件。")
-    else:
-        print("独立模式：结果将单独保存，不合并到现有文件。", flush=True)
-    
-    all_results = []
-    total_cases = len(selected_cases)
-    
-    print(f"使用 {MAX_CONCURRENT_WORKERS} 个并发线程处理 {total_cases} 个案例", flush=True)
-    print(flush=True)
-    
-    completed_count = 0
-    batch_start_time = time.time()
-    
-    with SafeThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_WORKERS, total_cases)) as executor:
-        future_to_case = {
-            executor.submit(process_single_case, case_id, case, i+1, total_cases, model=model, 
-                           existing_questions_data=existing_questions_data, unified_data=unified_data,
-                           gpt_model=gpt_model, qwen_model=qwen_model, use_thinking=use_thinking): (i, case_id)
-            for i, (case_id, case) in enumerate(selected_cases.items())
-        }
-        
-        for future in concurrent.futures.as_completed(future_to_case):
-            index, case_id = future_to_case[future]
-            try:
-                results = future.result()
-                if results:
-                    all_results.extend(results)
-                    completed_count += 1
-                    progress = (completed_count / total_cases) * 100
-                    elapsed = time.time() - batch_start_time
-                    avg_time = elapsed / completed_count if completed_count > 0 else 0
-                    remaining = (total_cases - completed_count) * avg_time
-                    print(f"[总体进度] {completed_count}/{total_cases} 个案例已完成 ({progress:.1f}%)", flush=True)
-                    print(f"[总体进度] 已用时间: {elapsed:.1f}秒，预计剩余: {remaining:.1f}秒", flush=True)
-                    print(flush=True)
-            except Exception as e:
-                completed_count += 1
-                print(f"✗ 案例{index+1} ({case_id}) 处理异常: {str(e)}", flush=True)
-                print(f"[总体进度] {completed_count}/{total_cases} 个案例已完成", flush=True)
-                print(flush=True)
-    
-    if not all_results:
-        print("错误：没有生成任何结果", flush=True)
-        return
+    qwen_model = args.qwen_model
+    use_thinking = not args.no_thinking
     
+
     new_result_df = pd.DataFrame(all_results)
     
     # 累加到现有结果
@@ -746,24 +1059,8 @@ def main():
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
     # 确定模型显示名称（用于tab名称）
-    if model == 'qwen':
-        model_display_name = f'Qwen-{qwen_model.split("-")[-1].title()}'
-        sheet_name = f'Qwen-{qwen_model.split("-")[-1].title()}'
-    elif model == 'deepseek':
-        # DeepSeek根据是否使用thinking模式显示不同名称
-        if use_thinking:
-            model_display_name = 'DeepSeek'
-            sheet_name = 'DeepSeek'
-        else:
-            model_display_name = 'DeepSeek-NoThinking'
-            sheet_name = 'DeepSeek-NoThinking'
-    else:
-        model_display_name = {
-            'gpt4o': 'GPT-4o',
-            'gemini': 'Gemini 2.5 Flash',
-            'claude': 'Claude Opus 4'
-        }.get(model, model.upper())
-        sheet_name = model_display_name
+    model_display_name = get_model_display_name(model, qwen_model, use_thinking)
+    sheet_name = model_display_name
     
     # 使用统一文件名（如果使用统一数据或DeepSeek文件，使用统一文件名；否则使用原有逻辑）
     if unified_data:
@@ -903,112 +1200,36 @@ def main():
     print('保存结果...', flush=True)
     print('=' * 80, flush=True)
     
-    # 如果使用统一数据或standalone模式且使用统一数据/DeepSeek问题，保存到多tab Excel文件
-    if unified_data or (standalone and (unified_data or args.use_ds_questions)):
-        # 检查文件是否已存在，读取所有现有的tab
-        existing_sheets = {}
-        if os.path.exists(output_file):
-            print(f"文件已存在，读取现有文件: {output_file}", flush=True)
-            try:
-                excel_file = pd.ExcelFile(output_file)
-                for sheet in excel_file.sheet_names:
-                    existing_sheets[sheet] = pd.read_excel(output_file, sheet_name=sheet)
-                print(f"  已读取 {len(existing_sheets)} 个现有tab: {list(existing_sheets.keys())}", flush=True)
-            except Exception as e:
-                print(f"  ⚠️ 读取现有文件失败: {str(e)}，将创建新文件", flush=True)
-                existing_sheets = {}
-        
-        # 使用ExcelWriter保存多个tab（使用mode='w'重新写入所有sheet，确保所有tab都被保留）
-        # 注意：多个进程并行写入时，需要文件锁机制
-        print(f"保存到tab: {sheet_name}", flush=True)
-        print(f"当前模型记录数: {len(final_df)} (新增: {len(new_result_df)})", flush=True)
-        
-        # 使用文件锁避免并发写入冲突（如果支持fcntl）
-        if HAS_FCNTL:
-            lock_file = output_file + '.lock'
-            max_retries = 10
-            retry_delay = 2  # 秒
-            
-            for attempt in range(max_retries):
-                try:
-                    # 尝试获取文件锁
-                    with open(lock_file, 'w') as lock:
-                        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-                        
-                        # 重新读取现有文件（可能在等待锁期间被其他进程更新）
-                        existing_sheets_updated = {}
-                        if os.path.exists(output_file):
-                            try:
-                                excel_file = pd.ExcelFile(output_file)
-                                for sheet in excel_file.sheet_names:
-                                    existing_sheets_updated[sheet] = pd.read_excel(output_file, sheet_name=sheet)
-                            except Exception as e:
-                                print(f"  ⚠️ 重新读取文件失败: {str(e)}", flush=True)
-                                existing_sheets_updated = existing_sheets
-                        
-                        # 写入文件
-                        with pd.ExcelWriter(output_file, engine='openpyxl', mode='w') as writer:
-                            # 先写入所有现有的tab（除了当前模型的tab）
-                            for sheet, df_sheet in existing_sheets_updated.items():
-                                if sheet != sheet_name:
-                                    df_sheet.to_excel(writer, sheet_name=sheet, index=False)
-                                    print(f"  保留tab: {sheet} ({len(df_sheet)} 条记录)", flush=True)
-                            
-                            # 写入当前模型的数据
-                            final_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                            print(f"  ✓ 已保存tab: {sheet_name} ({len(final_df)} 条记录)", flush=True)
-                        
-                        # 释放锁（文件关闭时自动释放）
-                        break
-                        
-                except BlockingIOError:
-                    # 文件被锁定，等待后重试
-                    if attempt < max_retries - 1:
-                        print(f"  ⚠️ 文件被锁定，等待 {retry_delay} 秒后重试 ({attempt + 1}/{max_retries})...", flush=True)
-                        time.sleep(retry_delay)
-                    else:
-                        print(f"  ✗ 无法获取文件锁，已达到最大重试次数", flush=True)
-                        raise
-                except Exception as e:
-                    print(f"  ✗ 保存文件时出错: {str(e)}", flush=True)
-                    raise
-        else:
-            # 不支持文件锁，直接写入（不推荐并行运行）
-            print(f"  ⚠️ 警告: 系统不支持文件锁，建议按顺序运行模型", flush=True)
-            with pd.ExcelWriter(output_file, engine='openpyxl', mode='w') as writer:
-                # 先写入所有现有的tab（除了当前模型的tab）
-                for sheet, df_sheet in existing_sheets.items():
-                    if sheet != sheet_name:
-                        df_sheet.to_excel(writer, sheet_name=sheet, index=False)
-                        print(f"  保留tab: {sheet} ({len(df_sheet)} 条记录)", flush=True)
-                
-                # 写入当前模型的数据
-                final_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                print(f"  ✓ 已保存tab: {sheet_name} ({len(final_df)} 条记录)", flush=True)
-            # 先写入所有现有的tab（除了当前模型的tab，因为会被当前数据替换）
-            for sheet, df_sheet in existing_sheets.items():
-                if sheet != sheet_name:  # 保留其他模型的tab
-                    df_sheet.to_excel(writer, sheet_name=sheet, index=False)
-                    print(f"  保留tab: {sheet} ({len(df_sheet)} 条记录)", flush=True)
-            
-            # 写入当前模型的数据（如果sheet已存在会被替换）
-            final_df.to_excel(writer, sheet_name=sheet_name, index=False)
-            print(f"  ✓ 已保存tab: {sheet_name} ({len(final_df)} 条记录)", flush=True)
-        
-        # 计算最终的tab数量
-        total_tabs = len(existing_sheets) + (0 if sheet_name in existing_sheets else 1)
-        print(f"✓ 所有模型结果已保存到: {output_file}", flush=True)
-        print(f"  文件包含 {total_tabs} 个tab: {list(existing_sheets.keys()) + ([sheet_name] if sheet_name not in existing_sheets else [])}", flush=True)
+    # 结果行写入结果存储（SQLite，按运行和模型替换），Excel从存储导出
+    run = f"{os.path.basename(results_dir)}/{os.path.splitext(os.path.basename(output_file))[0]}"
+    multi_tab = unified_data or (standalone and (unified_data or args.use_ds_questions))
+    if multi_tab and os.path.exists(output_file) and not results_store.has_run(run):
+        # 兼容结果存储之前生成的工作簿：导入一次其中已有的tab
+        print(f"文件已存在，导入现有tab到结果存储: {output_file}", flush=True)
+        try:
+            print(f"  已导入 {results_store.import_workbook(run, output_file)} 条记录", flush=True)
+        except Exception as e:
+            print(f"  ⚠️ 导入现有文件失败: {str(e)}，将只导出结果存储中的数据", flush=True)
+    
+    results_store.save_rows(run, sheet_name, final_df.to_dict('records'))
+    print(f"✓ 已保存到结果存储: {results_store.db_path}（运行: {run}，tab: {sheet_name}，{len(final_df)} 条记录）", flush=True)
+    
+    if args.no_excel:
+        print(f"  未导出Excel（--no-excel），可用 python scripts/export_results.py --run \"{run}\" 导出", flush=True)
+    elif multi_tab:
+        # 每个模型一个tab（包含其他模型/进程已写入存储的tab）
+        sheet_counts = results_store.export_excel(run, output_file)
+        print(f"✓ 所有模型结果已导出到: {output_file}", flush=True)
+        print(f"  文件包含 {len(sheet_counts)} 个tab: {list(sheet_counts.keys())}", flush=True)
         print(f"  结果目录: {results_dir}", flush=True)
     else:
-        # 原有逻辑：单文件单tab
+        # 单文件单tab
         print(f"累加新结果到现有文件...")
         print(f"累加后总记录数: {len(final_df)} (原有: {len(existing_df) if existing_df is not None else 0}, 新增: {len(new_result_df)})")
         
-        final_df.to_excel(output_file, index=False, engine='openpyxl')
+        results_store.export_excel(run, output_file, single_sheet='Sheet1')
         print("✓ 保存完成！", flush=True)
-        if 'results_dir' in locals():
-            print(f"  结果目录: {results_dir}", flush=True)
+        print(f"  结果目录: {results_dir}", flush=True)
     
     print(flush=True)
     
@@ -1056,8 +1277,373 @@ def main():
         if error_count > 0:
             print(flush=True)
             print(f"⚠️ 本次新增检测到错误的问题数: {error_count}/{len(new_result_df)}", flush=True)
+
+
+def main():
+    setup_signal_handlers()
+    
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description='统一案例处理脚本 - 支持选择不同模型')
+    parser.add_argument('--model', type=str, default='deepseek', choices=MODEL_CHOICES,
+                        help='选择模型: deepseek (默认), gpt4o, gemini, claude, 或 qwen')
+    parser.add_argument('--models', type=str, default=None,
+                        help='在一个进程中同时运行多个模型（逗号分隔，如 deepseek,gpt4o,claude,gemini,qwen），脱敏和问题生成只做一次，结果按模型分tab保存；指定时忽略--model')
+    parser.add_argument('--num_cases', type=int, default=None,
+                        help='处理的案例数量（默认: 处理所有案例或指定案例列表）')
+    parser.add_argument('--case_ids', type=str, nargs='+', default=None,
+                        help='指定要处理的案例ID列表（例如: --case_ids case_001 case_002）')
+    parser.add_argument('--all', action='store_true',
+                        help='处理所有案例')
+    parser.add_argument('--standalone', action='store_true',
+                        help='独立保存，不合并到现有文件')
+    parser.add_argument('--use_ds_questions', type=str, default=None,
+                        help='使用DeepSeek结果文件中的问题（指定DeepSeek结果文件路径，如108个案例的完整版文件）')
+    parser.add_argument('--use_unified_data', type=str, default=None,
+                        help='使用统一脱敏和问题数据文件（JSON格式，由prepare_unified_masking_questions.py生成）')
+    parser.add_argument('--gpt-model', type=str, default='gpt-4o',
+                        help='指定GPT模型名称，如 gpt-4o, gpt-4.1-2025-04-14, gpt-5-chat-latest, o3-2025-04-16 等')
+    parser.add_argument('--qwen-model', type=str, default='qwen-max',
+                        help='指定Qwen模型名称，如 qwen-turbo, qwen-plus, qwen-max (默认: qwen-max)')
+    parser.add_argument('--no-thinking', action='store_true',
+                        help='DeepSeek不使用thinking模式（仅对deepseek模型有效）')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='异步模式：在单个事件循环中处理所有案例和问题（需要aiohttp，替代分阶段线程流水线）')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='不使用LLM响应缓存和回答索引（强制重新调用API）')
+    parser.add_argument('--hedge', action='store_true',
+                        help='启用请求对冲：回答/评估调用超过近期p95延迟时发出重复请求，取先完成者（最多占请求数的HEDGE_MAX_RATE）')
+    parser.add_argument('--stream', action='store_true',
+                        help='流式发送回答/评估调用：记录首token延迟，流超过STREAM_STALL_TIMEOUT秒没有新内容时提前中止并重试（DeepSeek和统一模型代理支持）')
+    parser.add_argument('--multi-question', action='store_true',
+                        help='多问题合并回答：案例文本只发送一次，一次调用以JSON回答该案例的所有问题，再拆分为逐题结果（节省输入token）')
+    parser.add_argument('--batch-eval', action='store_true',
+                        help='批处理评估：所有回答生成后，将评估请求写入批处理JSONL文件提交到 /v1/batches 兼容接口并轮询合并结果（成本更低，不占实时速率限制）')
+    parser.add_argument('--no-excel', action='store_true',
+                        help='只保存到结果存储（data/results_store.sqlite3），不导出Excel（之后可用scripts/export_results.py导出）')
+    parser.add_argument('--rescore', type=str, default=None,
+                        help='重新评分：只对已保存结果（结果Excel文件，或结果存储中的运行标识，见scripts/export_results.py --list）中的AI回答重新评估，不重新生成回答，新分数写入带评分量表版本标记的列')
+    parser.add_argument('--judge-provider', type=str, default=None, choices=['deepseek', 'chatgpt', 'qwen', 'claude'],
+                        help='重新评分使用的评估模型提供商（仅对--rescore有效，默认使用config中的API_PROVIDER）')
+    parser.add_argument('--judge-model', type=str, default=None,
+                        help='重新评分使用的评估模型名称（仅对--rescore有效，与--judge-provider一起使用）')
+    parser.add_argument('--score-tag', type=str, default=RUBRIC_VERSION,
+                        help=f'重新评分结果列的标记（如 总分@{RUBRIC_VERSION}，默认为评分量表版本）')
+    parser.add_argument('--resume', action='store_true',
+                        help='续跑：跳过结果日志（data/journal/<模型>.jsonl）中已完成的问题，并用日志中的结果行重建Excel（不指定时新运行会先备份旧日志）')
+    args = parser.parse_args()
+    
+    if args.models:
+        models = [m.strip() for m in args.models.split(',') if m.strip()]
+        invalid_models = [m for m in models if m not in MODEL_CHOICES]
+        if invalid_models or not models:
+            parser.error(f"--models 包含无效的模型: {', '.join(invalid_models)}（可选: {', '.join(MODEL_CHOICES)}）")
+        models = list(dict.fromkeys(models))  # 去重并保持顺序
+    else:
+        models = [args.model]
+    if args.use_async and len(models) > 1:
+        parser.error('--async 不支持同时运行多个模型，请去掉--async（多模型使用分阶段流水线）')
+    if args.rescore and (args.use_async or args.batch_eval or args.resume):
+        parser.error('--rescore 不支持 --async、--batch-eval 或 --resume')
+    
+    model = models[0]
+    num_cases = args.num_cases
+    case_ids_arg = args.case_ids
+    process_all = args.all
+    standalone = args.standalone
+    gpt_model = args.gpt_model
+    qwen_model = args.qwen_model
+    use_thinking = not args.no_thinking  # 如果指定了--no-thinking，则use_thinking=False
+    if args.no_cache:
+        response_cache.enabled = False
+        answer_index.enabled = False
+    if args.hedge:
+        set_hedging_enabled(True)
+    if args.stream:
+        set_streaming_enabled(True)
+    
+    print('=' * 80, flush=True)
+    if args.rescore:
+        print(f'统一案例处理脚本 - 重新评分: {args.rescore}', flush=True)
+        print('=' * 80, flush=True)
+        print(f'只评估已保存的AI回答（不重新生成回答），新分数写入 @{args.score_tag} 列', flush=True)
+    else:
+        print(f'统一案例处理脚本 - 步骤3使用 {", ".join(m.upper() for m in models)} 模型', flush=True)
+        print('=' * 80, flush=True)
+        if args.use_unified_data:
+            print(f'步骤1/4: 脱敏处理 → 使用统一数据（跳过）', flush=True)
+            print(f'步骤2/4: 生成问题 → 使用统一数据（跳过）', flush=True)
+        elif args.use_ds_questions:
+            print(f'步骤1/4: 脱敏处理 → DeepSeek API（使用DeepSeek API重新脱敏）', flush=True)
+            print(f'步骤2/4: 生成问题 → 使用DeepSeek结果文件中的问题', flush=True)
+        else:
+            print(f'步骤1/4: 脱敏处理 → DeepSeek API', flush=True)
+            print(f'步骤2/4: 生成问题 → DeepSeek API', flush=True)
+        print(f'步骤3/4: 生成AI回答 → {", ".join(m.upper() for m in models)} API', flush=True)
+        print(f'步骤4/4: 评估 → DeepSeek API{"（批处理）" if args.batch_eval else ""}', flush=True)
+    print('=' * 80, flush=True)
+    print(flush=True)
+    
+    with open('data/cases/cases.json', 'r', encoding='utf-8') as f:
+        cases = json.load(f)
+    
+    # 确定要处理的案例ID列表
+    if case_ids_arg:
+        # 使用命令行指定的案例ID
+        target_case_ids = case_ids_arg
+    elif process_all:
+        # 处理所有案例
+        target_case_ids = list(cases.keys())
+    elif num_cases:
+        # 处理前N个案例
+        target_case_ids = list(cases.keys())[:num_cases]
+    else:
+        # 默认：处理所有案例
+        target_case_ids = list(cases.keys())
+    
+    # 验证这些案例是否存在
+    selected_cases = {}
+    for case_id in target_case_ids:
+        if case_id in cases:
+            selected_cases[case_id] = cases[case_id]
+        else:
+            print(f"⚠️ 警告: 案例 {case_id} 不在 cases.json 中", flush=True)
+    
+    if not selected_cases:
+        print("错误：没有找到需要处理的案例", flush=True)
+        return
+    
+    print(f"将处理以下 {len(selected_cases)} 个案例:", flush=True)
+    for i, (case_id, case) in enumerate(selected_cases.items(), 1):
+        print(f"  {i}. {case_id}: {case['title']}", flush=True)
+    print(flush=True)
+    
+    # 加载统一脱敏和问题数据（如果指定，优先级最高）
+    unified_data = None
+    if args.use_unified_data:
+        unified_file = args.use_unified_data
+        if os.path.exists(unified_file):
+            print(f"加载统一脱敏和问题数据: {unified_file}", flush=True)
+            try:
+                with open(unified_file, 'r', encoding='utf-8') as f:
+                    unified_data = json.load(f)
+                print(f"✓ 成功加载 {len(unified_data)} 个案例的统一数据", flush=True)
+            except Exception as e:
+                print(f"✗ 加载统一数据失败: {str(e)}", flush=True)
+                unified_data = None
+        else:
+            print(f"⚠️ 统一数据文件不存在: {unified_file}，将使用默认流程", flush=True)
+    
+    # 加载DeepSeek的108个案例结果文件（如果指定，且未使用统一数据）
+    # 直接从DeepSeek结果文件中提取问题和脱敏数据
+    existing_questions_data = None
+    unified_data_from_ds = None  # 从DeepSeek文件提取的统一数据
+    if not unified_data and args.use_ds_questions:
+        ds_file = args.use_ds_questions
+        if os.path.exists(ds_file):
+            print(f"从DeepSeek结果文件加载问题和脱敏数据: {ds_file}", flush=True)
+            try:
+                ds_df = read_excel_cached(ds_file, engine='openpyxl')  # 文件未变化时直接加载缓存
+                print(f"  读取到 {len(ds_df)} 行数据", flush=True)
+                
+                # 如果有"使用的模型"列，只提取DeepSeek处理的结果；否则假设所有数据都是DeepSeek的
+                if '使用的模型' in ds_df.columns:
+                    ds_df_filtered = ds_df[ds_df['使用的模型'] == 'DeepSeek']
+                    if len(ds_df_filtered) > 0:
+                        ds_df = ds_df_filtered
+                        print(f"  筛选DeepSeek数据后: {len(ds_df)} 行", flush=True)
+                    else:
+                        print(f"  ⚠️ 未找到DeepSeek数据，使用全部数据", flush=True)
+                
+                # 提取统一数据（包含问题和脱敏内容）
+                unified_data_from_ds = {}
+                # 先打印所有列名，便于调试
+                print(f"  DeepSeek文件包含的列: {list(ds_df.columns)[:20]}...", flush=True)
+                
+                for case_id in selected_cases.keys():
+                    case_data = ds_df[ds_df['案例ID'] == case_id]
+                    if len(case_data) > 0:
+                        # 按问题编号排序，确保顺序一致
+                        case_data = case_data.sort_values('问题编号')
+                        questions = case_data['问题'].tolist()
+                        if len(questions) >= 5:
+                            questions = questions[:5]  # 只取前5个问题
+                            first_row = case_data.iloc[0]
+                            
+                            # 提取脱敏数据（如果存在）
+                            masked_title = first_row.get('案例标题（脱敏）', '')
+                            
+                            # 尝试从可能的列名中提取脱敏内容
+                            # 注意：DeepSeek结果文件中可能不存储完整的脱敏内容
+                            # 如果找不到，我们需要从原始案例重新脱敏，但使用相同的问题
+                            possible_content_cols = ['案例内容（脱敏）', '脱敏内容', '案例文本（脱敏）', '案例内容', 'case_text_masked', '详细评价']
+                            possible_judge_cols = ['法官判决（脱敏）', '判决（脱敏）', '法官决定（脱敏）', '法官判决', 'judge_decision_masked']
+                            
+                            masked_content = None
+                            masked_judge = None
+                            
+                            # 尝试提取脱敏内容
+                            for col in possible_content_cols:
+                                if col in first_row.index:
+                                    value = first_row[col]
+                                    if pd.notna(value) and str(value).strip() and len(str(value).strip()) > 50:  # 确保内容足够长
+                                        masked_content = str(value).strip()
+                                        print(f"  ✓ 从列 '{col}' 提取到脱敏内容（{len(masked_content)}字符）", flush=True)
+                                        break
+                            
+                            # 尝试提取脱敏判决
+                            for col in possible_judge_cols:
+                                if col in first_row.index:
+                                    value = first_row[col]
+                                    if pd.notna(value) and str(value).strip():
+                                        masked_judge = str(value).strip()
+                                        print(f"  ✓ 从列 '{col}' 提取到脱敏判决（{len(masked_judge)}字符）", flush=True)
+                                        break
+                            
+                            # 如果还是找不到，尝试从原始案例数据中获取（但需要重新脱敏）
+                            # 由于DeepSeek文件可能不存储脱敏内容，我们标记为None，让后续逻辑处理
+                            unified_data_from_ds[case_id] = {
+                                'questions': questions,
+                                'masked_title': masked_title,
+                                'masked_content': masked_content,  # 可能为None，需要重新脱敏
+                                'masked_judge': masked_judge,  # 可能为None，需要重新脱敏
+                            }
+                            
+                            if masked_content and masked_judge:
+                                print(f"  ✓ 案例 {case_id}: 找到脱敏数据，将直接使用（不重新脱敏）", flush=True)
+                            else:
+                                print(f"  ⚠️ 案例 {case_id}: DeepSeek文件中未找到脱敏数据，将使用DeepSeek API重新脱敏", flush=True)
+                            print(f"  ✓ 案例 {case_id}: 找到 {len(questions)} 个问题", flush=True)
+                        else:
+                            print(f"  ⚠️ 案例 {case_id}: 问题数量不足（{len(questions)}个），将重新生成", flush=True)
+                    else:
+                        print(f"  ⚠️ 案例 {case_id}: 未找到数据，将重新生成", flush=True)
+                
+                if unified_data_from_ds:
+                    print(f"✓ 成功从DeepSeek文件加载 {len(unified_data_from_ds)} 个案例的问题数据", flush=True)
+                    # 将统一数据赋值给unified_data，这样process_single_case会使用它
+                    unified_data = unified_data_from_ds
+                else:
+                    print("⚠️ 未找到匹配的问题数据，将重新生成", flush=True)
+                    unified_data_from_ds = None
+            except Exception as e:
+                print(f"✗ 读取DeepSeek结果文件失败: {str(e)}", flush=True)
+                import traceback
+                print(traceback.format_exc(), flush=True)
+        else:
+            print(f"⚠️ DeepSeek结果文件不存在: {ds_file}，将重新生成问题", flush=True)
+    
+    # 重新评分模式：只评估已保存的AI回答，不重新生成回答
+    if args.rescore:
+        run, output_file, rows_by_model = load_rescore_rows(args.rescore)
+        if not rows_by_model:
+            print(f"错误：未找到要重新评分的结果: {args.rescore}（使用 python scripts/export_results.py --list 查看结果存储中的运行）", flush=True)
+            return
+        evaluator = None
+        if args.judge_provider:
+            evaluator = AnswerEvaluator(api=UnifiedAIAPI(provider=args.judge_provider, model=args.judge_model))
+        counts = run_rescore_pipeline(rows_by_model, selected_cases, unified_data, evaluator, args.score_tag)
+        for sheet_name, rows in rows_by_model.items():
+            results_store.save_rows(run, sheet_name, rows)
+        print(flush=True)
+        print(f"✓ 重新评分 {counts['rescored']} 个回答（失败 {counts['failed']} 个，跳过 {counts['skipped']} 行），"
+              f"已保存到结果存储（运行: {run}）", flush=True)
+        if args.no_excel:
+            print(f"  未导出Excel（--no-excel），可用 python scripts/export_results.py --run \"{run}\" 导出", flush=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+            results_store.export_excel(run, output_file)
+            print(f"✓ 已导出到: {output_file}", flush=True)
+        response_cache.print_summary()
+        answer_index.print_summary()
+        token_tracker.print_cache_summary()
+        print_concurrency_summary()
+        return
+    
+    # 查找现有的结果文件（仅在非独立模式下）
+    existing_df = None
+    if not standalone:
+        latest_result_file = find_latest_existing_file()
+        if latest_result_file and os.path.exists(latest_result_file):
+            print(f"找到现有结果文件: {latest_result_file}")
+            existing_df = read_excel_cached(latest_result_file)
+            print(f"现有文件包含 {len(existing_df)} 条记录，涉及 {existing_df['案例ID'].nunique()} 个案例")
+        else:
+            print("未找到现有结果文件，将创建新文件。")
+    else:
+        print("独立模式：结果将单独保存，不合并到现有文件。", flush=True)
+    
+    all_results = []
+    
+    # 结果日志：每个问题完成后立即追加（每个模型一个日志），中断后用--resume续跑
+    display_names = {m: get_model_display_name(m, qwen_model, use_thinking) for m in models}
+    journals = {m: ResultJournal.for_model(display_names[m]) for m in models}
+    journaled = {}
+    cases_to_process = selected_cases
+    if args.resume:
+        for m in models:
+            journaled[m] = {case_id: rows for case_id, rows in journals[m].completed_by_case().items() if case_id in selected_cases}
+            print(f"续跑：结果日志 {journals[m].path} 中已完成 {sum(len(rows) for rows in journaled[m].values())} 个问题", flush=True)
+        cases_to_process = {}
+        for case_id, case in selected_cases.items():
+            if all(journaled_case_complete(case_id, journaled[m].get(case_id), unified_data) for m in models):
+                for m in models:
+                    all_results.extend(dict(row) for _, row in sorted(journaled[m][case_id].items()))
+            else:
+                cases_to_process[case_id] = case
+        print(f"续跑：跳过 {len(selected_cases) - len(cases_to_process)} 个已完成的案例", flush=True)
+    else:
+        for m in models:
+            backup = journals[m].rotate()
+            if backup:
+                print(f"新运行：旧结果日志已备份到 {backup}（使用--resume可在其基础上续跑）", flush=True)
+    
+    total_cases = len(cases_to_process)
+    
+    if not cases_to_process:
+        print("所有案例均已在结果日志中完成，直接重建结果文件", flush=True)
+    elif args.use_async:
+        print(f"异步模式：在单个事件循环中处理 {total_cases} 个案例（最大在途请求数: {ASYNC_MAX_IN_FLIGHT}）", flush=True)
+        print(flush=True)
+        all_results.extend(asyncio.run(run_cases_async(
+            cases_to_process, model=model, unified_data=unified_data,
+            gpt_model=gpt_model, qwen_model=qwen_model, use_thinking=use_thinking, batch_eval=args.batch_eval,
+            multi_question=args.multi_question, journal=journals[model], journaled=journaled.get(model))))
+    else:
+        print(f"分阶段流水线处理 {total_cases} 个案例（工作线程: 脱敏 {PIPELINE_MASK_WORKERS}, 问题生成 {PIPELINE_QUESTION_WORKERS}, "
+              f"回答 每个提供商 {PIPELINE_ANSWER_WORKERS}, 评估 {PIPELINE_EVALUATE_WORKERS}）", flush=True)
+        print(flush=True)
+        all_results.extend(run_cases_pipeline(
+            cases_to_process, models=models, existing_questions_data=existing_questions_data, unified_data=unified_data,
+            gpt_model=gpt_model, qwen_model=qwen_model, use_thinking=use_thinking, batch_eval=args.batch_eval,
+            multi_question=args.multi_question, journals=journals, journaled=journaled))
+    
+    if not all_results:
+        print("错误：没有生成任何结果", flush=True)
+        return
+    
+    # 等待评估的行（包括续跑时日志中已回答、尚未评估的行）评估后重新写入对应模型的日志
+    pending_evaluation = [result for result in all_results if '_评估输入' in result]
+    if pending_evaluation:
+        run_batch_evaluation(all_results)
+        journal_by_display_name = {display_names[m]: journals[m] for m in models}
+        for result in pending_evaluation:
+            journal_by_display_name[result['使用的模型']].append(result)
+    
+    # 按模型保存结果（多模型时依次写入同一文件的不同tab，不再有多个进程争用文件锁）
+    for m in models:
+        model_results = [result for result in all_results if result.get('使用的模型') == display_names[m]]
+        if not model_results:
+            print(f"⚠️ {display_names[m]}: 没有生成任何结果", flush=True)
+            continue
+        save_model_results(model_results, m, args, existing_df=existing_df.copy() if existing_df is not None else None,
+                           unified_data=unified_data, selected_cases=selected_cases, target_case_ids=target_case_ids)
     
     print(flush=True)
+    response_cache.print_summary()
+    answer_index.print_summary()
+    token_tracker.print_cache_summary()
+    print_concurrency_summary()
+    print_hedge_summary()
     print('=' * 80, flush=True)
     print('✓ 处理完成！', flush=True)
     print('=' * 80, flush=True)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入耗时检查脚本
+用 `python -X importtime` 在独立进程中导入常用模块，检查：
+- 累计导入耗时不超过预算
+- 导入时没有任何输出（如"[统一API] 使用提供商"）
+- 导入时没有创建全局单例（ai_api、token_tracker、case_manager等应在首次使用时才初始化）
+
+任一检查失败时退出码为1，可用于提交前或CI中防止导入路径重新变慢。
+
+使用方法:
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget-ms 500 --top 15
+    python scripts/check_import_time.py --modules utils.evaluator process_cases
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 默认检查的模块（脚本和process_cases.py启动时都会导入）
+DEFAULT_MODULES = ['config', 'utils.ai_api', 'utils.evaluator', 'utils.case_manager', 'utils.token_tracker', 'process_cases']
+
+# 应延迟初始化的全局单例（模块名, 属性名）
+LAZY_SINGLETONS = [
+    ('utils.ai_api', 'ai_api'),
+    ('utils.deepseek_api', 'deepseek_api'),
+    ('utils.unified_model_api', 'unified_model_api'),
+    ('utils.qwen_api', 'qwen_api'),
+    ('utils.token_tracker', 'token_tracker'),
+    ('utils.case_manager', 'case_manager'),
+    ('utils.excel_export', 'excel_exporter'),
+    ('utils.results_store', 'results_store'),
+    ('utils.answer_index', 'answer_index'),
+]
+
+# 子进程中执行的检查代码：导入模块后列出已被初始化的单例
+CHECK_CODE = """
+import sys
+import {module}
+for name, attr in {singletons!r}:
+    module = sys.modules.get(name)
+    instance = getattr(module, attr, None) if module else None
+    if instance is not None and getattr(instance, 'is_initialized', True):
+        sys.stderr.write('__INITIALIZED__ %s.%s\\n' % (name, attr))
+"""
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        [(模块名, 自身耗时us, 累计耗时us, 嵌套深度)]
+    """
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def check_module(module: str, budget_ms: float, top: int) -> Optional[bool]:
+    """
+    检查单个模块的导入
+
+    Returns:
+        True通过，False未通过，None表示缺少第三方依赖无法检查
+    """
+    code = CHECK_CODE.format(module=module, singletons=LAZY_SINGLETONS)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=PROJECT_ROOT,
+                          capture_output=True, text=True, env=env)
+
+    if proc.returncode != 0:
+        missing = re.search(r"ModuleNotFoundError: No module named '([^']+)'", proc.stderr)
+        if missing:
+            print(f"[跳过] {module}: 缺少依赖 {missing.group(1)}")
+            return None
+        print(f"[失败] {module}: 导入出错\n{proc.stderr.strip().splitlines()[-1]}")
+        return False
+
+    entries = parse_importtime(proc.stderr)
+    totals: Dict[str, int] = {name: cumulative for name, _, cumulative, depth in entries if depth == 0}
+    total_ms = totals.get(module, max(totals.values(), default=0)) / 1000
+    initialized = [line.split(' ', 1)[1] for line in proc.stderr.splitlines() if line.startswith('__INITIALIZED__')]
+
+    passed = True
+    problems = []
+    if total_ms > budget_ms:
+        passed = False
+        problems.append(f"导入耗时 {total_ms:.0f}ms 超过预算 {budget_ms:.0f}ms")
+    if proc.stdout.strip():
+        passed = False
+        problems.append(f"导入时有输出: {proc.stdout.strip().splitlines()[0][:80]}")
+    if initialized:
+        passed = False
+        problems.append(f"导入时创建了全局实例: {', '.join(initialized)}")
+
+    print(f"[{'通过' if passed else '失败'}] {module}: {total_ms:.0f}ms")
+    for problem in problems:
+        print(f"    - {problem}")
+    if top > 0:
+        slowest = sorted(entries, key=lambda e: e[1], reverse=True)[:top]
+        for name, self_us, cumulative_us, _ in slowest:
+            print(f"    {self_us / 1000:8.1f}ms 自身 | {cumulative_us / 1000:8.1f}ms 累计 | {name}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查常用模块的导入耗时和导入副作用')
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES, help='要检查的模块')
+    parser.add_argument('--budget-ms', type=float, default=1000, help='每个模块的累计导入耗时预算（毫秒）')
+    parser.add_argument('--top', type=int, default=5, help='列出自身耗时最长的前N个模块（0表示不列出）')
+    args = parser.parse_args()
+
+    results = [check_module(module, args.budget_ms, args.top) for module in args.modules]
+    failed = sum(1 for r in results if r is False)
+    skipped = sum(1 for r in results if r is None)
+    print(f"\n检查 {len(results)} 个模块：失败 {failed}，跳过 {skipped}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
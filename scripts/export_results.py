@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果导出脚本
+从结果存储（data/results_store.sqlite3）按需导出Excel，按保存时的tab导出（多模型运行时每个模型一个tab）。
+
+使用方法:
+    python scripts/export_results.py --list                      # 列出所有运行
+    python scripts/export_results.py                             # 导出最近更新的运行（到原结果目录）
+    python scripts/export_results.py --run "results_20260112_unified_e8fd22b9/20个案例_统一评估结果_20260112"
+    python scripts/export_results.py --run ... --output out.xlsx --sheets DeepSeek GPT-4o
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATA_DIR
+from utils.results_store import ResultsStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从结果存储导出Excel')
+    parser.add_argument('--db', type=str, default=None, help='结果存储路径（默认从config读取）')
+    parser.add_argument('--list', action='store_true', help='列出所有运行')
+    parser.add_argument('--run', type=str, default=None, help='要导出的运行（默认最近更新的运行）')
+    parser.add_argument('--output', type=str, default=None, help='输出文件路径（默认 data/<运行>.xlsx，即原结果文件位置）')
+    parser.add_argument('--sheets', nargs='+', default=None, help='只导出指定的tab（如模型名称）')
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    runs = store.list_runs()
+    if not runs:
+        print("结果存储中没有数据")
+        return
+
+    if args.list:
+        for run in runs:
+            updated = datetime.fromtimestamp(run['updated_at']).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{run['run']}  |  {run['rows']} 条  |  {', '.join(run['sheets'])}  |  更新于 {updated}")
+        return
+
+    run = args.run or runs[0]['run']
+    if not store.has_run(run):
+        print(f"未找到运行: {run}（使用 --list 查看所有运行）")
+        sys.exit(1)
+
+    output_file = args.output or os.path.join(DATA_DIR, run + '.xlsx')
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+
+    counts = store.export_excel(run, output_file, sheets=args.sheets)
+    if not counts:
+        print(f"运行 {run} 中没有指定的tab")
+        sys.exit(1)
+
+    print(f"✓ 已导出 {run} 到: {output_file}")
+    for sheet, count in counts.items():
+        print(f"  {sheet}: {count} 条记录")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+"""
+本地模拟LLM服务（OpenAI/DeepSeek兼容的 /v1/chat/completions）
+用于在不消耗真实API额度的情况下对流水线做压测和回归测试：
+- 按请求内容生成确定性的模板回答（脱敏、问题生成、案例分析、多问题合并回答、评分、续写）
+- 可配置延迟分布、429比例、5xx比例、finish_reason=length截断比例和reasoning_content
+- 支持流式（SSE）响应
+- 模拟提供商的前缀缓存（usage中返回prompt_cache_hit_tokens/prompt_cache_miss_tokens）
+- 可模拟不返回usage的提供商（--omit-usage），用于测试本地token估算
+- 支持OpenAI风格的批处理接口（/v1/files、/v1/batches），用于测试--batch-eval
+
+使用方法:
+    # 启动模拟服务（默认端口8000）
+    python scripts/mock_llm_server.py --port 8000 --latency-median 2 --rate-429 0.05 --truncate-rate 0.1
+
+    # 让流水线指向模拟服务
+    export DEEPSEEK_API_URL=http://127.0.0.1:8000/v1/chat/completions
+    export OPENAI_API_URL=http://127.0.0.1:8000/v1/chat/completions
+    export QWEN_API_URL=http://127.0.0.1:8000/v1/chat/completions
+    export DEEPSEEK_API_KEY=mock OPENAI_API_KEY=mock QWEN_API_KEY=mock
+    python process_cases.py --num_cases 5
+
+    # 批处理评估（批处理接口地址默认从DEEPSEEK_API_URL推导）
+    python process_cases.py --num_cases 5 --batch-eval
+
+    # 查看请求统计
+    curl http://127.0.0.1:8000/stats
+"""
+import re
+import json
+import time
+import math
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+PREFIX_BLOCK_CHARS = 64  # 前缀缓存的粒度（字符）
+PREFIX_CACHE_MAX_ENTRIES = 200000
+
+SCORE_DIMENSIONS = ['规范依据相关性', '涵摄链条对齐度', '价值衡量与同理心对齐度', '关键事实与争点覆盖度', '裁判结论与救济配置一致性']
+
+
+class MockSettings:
+    """模拟服务的行为配置"""
+
+    def __init__(self, args):
+        self.latency_median = args.latency_median
+        self.latency_sigma = args.latency_sigma
+        self.stream_chunk_delay = args.stream_chunk_delay
+        self.rate_429 = args.rate_429
+        self.retry_after = args.retry_after
+        self.error_rate = args.error_rate
+        self.truncate_rate = args.truncate_rate
+        self.reasoning_for_all = args.reasoning
+        self.answer_chars = args.answer_chars
+        self.batch_delay = args.batch_delay
+        self.omit_usage = args.omit_usage
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        # 批处理接口的内存存储
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict] = {}
+        self.store_lock = threading.Lock()
+        # 前缀缓存：已见过的prompt前缀哈希（按PREFIX_BLOCK_CHARS对齐）
+        self.prefix_cache = set()
+        self.prefix_lock = threading.Lock()
+
+    def random(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def sample_latency(self) -> float:
+        """按对数正态分布采样延迟（中位数为latency_median）"""
+        if self.latency_median <= 0:
+            return 0.0
+        with self.rng_lock:
+            return self.latency_median * math.exp(self.rng.gauss(0, self.latency_sigma))
+
+    def count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+
+def _request_seed(messages: List[Dict]) -> random.Random:
+    """以消息内容为种子的随机数生成器（相同请求得到相同回答）"""
+    digest = hashlib.sha256(json.dumps(messages, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算token数（中文约1.5字符/token）"""
+    return max(1, int(len(text) / 1.5))
+
+
+def _mask_text(text: str) -> str:
+    """模拟脱敏：替换年份、日期、案号和长数字"""
+    text = re.sub(r'（\d{4}）[^号\s]{0,20}号', '（某年）某号', text)
+    text = re.sub(r'\d{4}年', '某年', text)
+    text = re.sub(r'\d{1,2}月', '某月', text)
+    text = re.sub(r'\d{1,2}日', '某日', text)
+    text = re.sub(r'\d{11,18}', 'XXX', text)
+    return text
+
+
+def _last_prompt(messages: List[Dict]) -> str:
+    """最后一条消息的文本内容"""
+    prompt = messages[-1].get('content', '') if messages else ''
+    return prompt if isinstance(prompt, str) else json.dumps(prompt, ensure_ascii=False)
+
+
+def _is_continuation(messages: List[Dict]) -> bool:
+    """是否为截断后的续写请求"""
+    prompt = _last_prompt(messages)
+    return '从中断处' in prompt and '继续' in prompt
+
+
+def build_reply(messages: List[Dict], settings: MockSettings) -> Tuple[str, str]:
+    """
+    根据请求内容生成模板回答
+
+    Returns:
+        (回答内容, 推理内容)
+    """
+    rng = _request_seed(messages)
+    prompt = _last_prompt(messages)
+
+    if _is_continuation(messages):
+        content = '（续写）综上所述，应依法支持受害方的合理诉求，并采取相应的人身安全保护措施。'
+    elif '脱敏' in prompt and ('原始文本：' in prompt or '原始标题：' in prompt):
+        marker = '原始标题：' if '原始标题：' in prompt else '原始文本：'
+        original = prompt.split(marker, 1)[-1].rsplit('脱敏后的', 1)[0].strip()
+        content = _mask_text(original)
+    elif '法律争议问题' in prompt:
+        match = re.search(r'输出(\d+)个', prompt)
+        num = int(match.group(1)) if match else 5
+        topics = ['是否构成家庭暴力', '暴力行为的危险性与持续性', '证据的证明力评价', '受害者责任归因是否妥当', '公序良俗与关系语境的衡量']
+        content = '\n'.join(f"本案中{topics[i % len(topics)]}应如何认定（争点{i + 1}）？" for i in range(num))
+    elif '问题列表：' in prompt and '"answers"' in prompt:
+        # 多问题合并回答：按问题列表逐题生成分析，以JSON返回
+        question_block = prompt.split('问题列表：', 1)[-1].split('\n\n', 1)[0]
+        num = len(re.findall(r'^\d+\. ', question_block, re.MULTILINE)) or 1
+        answers = [{'id': i + 1, 'answer': f"针对问题{i + 1}：" + '根据《中华人民共和国反家庭暴力法》及相关司法解释，' * rng.randint(2, 4)}
+                   for i in range(num)]
+        content = json.dumps({'answers': answers}, ensure_ascii=False)
+    elif '评分量表' in prompt:
+        parts = []
+        for dim in SCORE_DIMENSIONS:
+            parts.append(f"【{dim}】得分：{rng.randint(1, 4)}分\n理由：模拟评分，AI回答在该维度表现{rng.choice(['较好', '一般', '有待提高'])}。")
+        flag = rng.random()
+        if flag < 0.1:
+            parts.append("【错误标记】（如有，请按严重程度分类）：\n- 明显错误：模拟的明显错误")
+        elif flag < 0.3:
+            parts.append("【错误标记】（如有，请按严重程度分类）：\n- 微小错误：模拟的表述不够精确")
+        else:
+            parts.append("【错误标记】（如有，请按严重程度分类）：\n无")
+        content = '\n\n'.join(parts)
+    else:
+        sections = ['1. 案件事实梳理', '2. 法律适用分析', '3. 判决建议', '4. 法律依据']
+        body = []
+        for section in sections:
+            body.append(f"{section}\n" + '根据《中华人民共和国反家庭暴力法》及相关司法解释，' * rng.randint(2, 4))
+        content = '\n\n'.join(body)
+        if len(content) < settings.answer_chars:
+            content += '\n' + '本案应结合具体事实综合判断。' * ((settings.answer_chars - len(content)) // 13 + 1)
+
+    reasoning = '模拟推理：先梳理案件事实，再寻找适用的法律规范，最后进行涵摄与价值衡量。' * rng.randint(1, 3)
+    return content, reasoning
+
+
+def match_prefix_cache(prompt: str, settings: MockSettings) -> int:
+    """
+    模拟前缀缓存：返回与之前请求共享的最长前缀字符数（按块对齐），并记录本次请求的所有前缀
+
+    Args:
+        prompt: 拼接后的完整输入文本
+        settings: 模拟服务配置
+
+    Returns:
+        命中缓存的前缀字符数
+    """
+    hashes = []
+    digest = hashlib.sha256()
+    for i in range(0, len(prompt) // PREFIX_BLOCK_CHARS * PREFIX_BLOCK_CHARS, PREFIX_BLOCK_CHARS):
+        digest.update(prompt[i:i + PREFIX_BLOCK_CHARS].encode('utf-8'))
+        hashes.append(digest.copy().hexdigest()[:16])
+
+    with settings.prefix_lock:
+        hit_blocks = 0
+        for h in hashes:
+            if h not in settings.prefix_cache:
+                break
+            hit_blocks += 1
+        if len(settings.prefix_cache) > PREFIX_CACHE_MAX_ENTRIES:
+            settings.prefix_cache.clear()
+        settings.prefix_cache.update(hashes)
+    return hit_blocks * PREFIX_BLOCK_CHARS
+
+
+def build_completion(body: Dict, settings: MockSettings) -> Tuple[Dict, str, str]:
+    """
+    根据请求体生成完整的chat.completion响应（不含延迟和错误注入）
+
+    Returns:
+        (响应字典, 回答内容, 推理内容)
+    """
+    messages = body.get('messages', [])
+    if body.get('system'):
+        messages = [{'role': 'system', 'content': body['system']}] + messages
+    model = body.get('model', 'mock-model')
+    max_tokens = int(body.get('max_tokens') or 2000)
+
+    # 推理内容总是生成，是否返回由模型名和--reasoning决定
+    content, reasoning = build_reply(messages, settings)
+    if 'reasoner' not in model and not settings.reasoning_for_all:
+        reasoning = ''
+
+    # 截断：超过max_tokens，或按比例随机截断（续写请求不随机截断，避免续写轮数耗尽）
+    finish_reason = 'stop'
+    max_chars = int(max_tokens * 1.5)
+    if len(content) > max_chars:
+        content, finish_reason = content[:max_chars], 'length'
+    elif not _is_continuation(messages) and settings.random() < settings.truncate_rate:
+        content, finish_reason = content[:max(1, len(content) // 2)], 'length'
+    if finish_reason == 'length':
+        settings.count('truncated')
+
+    prompt_text = ''.join(str(m.get('content', '')) for m in messages)
+    prompt_tokens = _estimate_tokens(prompt_text)
+    cache_hit_tokens = min(prompt_tokens, int(match_prefix_cache(prompt_text, settings) / 1.5))
+    completion_tokens = _estimate_tokens(content + reasoning)
+    usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+             'total_tokens': prompt_tokens + completion_tokens,
+             'prompt_cache_hit_tokens': cache_hit_tokens, 'prompt_cache_miss_tokens': prompt_tokens - cache_hit_tokens}
+    if reasoning:
+        usage['reasoning_tokens'] = _estimate_tokens(reasoning)
+
+    message = {'role': 'assistant', 'content': content}
+    if reasoning:
+        message['reasoning_content'] = reasoning
+    completion = {
+        'id': f'mock-{hashlib.md5(content.encode("utf-8")).hexdigest()[:12]}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+        'usage': usage
+    }
+    if settings.omit_usage:
+        # 模拟不返回usage的提供商（客户端应使用本地估算）
+        del completion['usage']
+    return completion, content, reasoning
+
+
+def _parse_multipart(content_type: str, data: bytes) -> Dict[str, bytes]:
+    """解析multipart/form-data请求体，返回 {字段名: 内容}"""
+    message = BytesParser(policy=HTTP).parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode('latin-1') + data)
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = part.get_payload(decode=True) or b''
+    return fields
+
+
+def run_batch(batch_id: str, settings: MockSettings):
+    """在后台执行批处理任务：等待batch_delay后逐行生成回答并写入输出文件"""
+    with settings.store_lock:
+        batch = settings.batches[batch_id]
+        batch['status'] = 'in_progress'
+        input_data = settings.files.get(batch['input_file_id'], b'')
+    time.sleep(settings.batch_delay)
+
+    output_lines, error_lines = [], []
+    for raw in input_data.decode('utf-8').splitlines():
+        if not raw.strip():
+            continue
+        line = json.loads(raw)
+        settings.count('batch_requests')
+        if settings.random() < settings.error_rate:
+            error_lines.append({'id': f'mock-req-{len(error_lines)}', 'custom_id': line.get('custom_id'),
+                                'response': {'status_code': 500, 'body': {'error': {'message': 'internal error (mock)'}}},
+                                'error': None})
+            continue
+        completion, _, _ = build_completion(line.get('body') or {}, settings)
+        output_lines.append({'id': f'mock-req-{len(output_lines)}', 'custom_id': line.get('custom_id'),
+                             'response': {'status_code': 200, 'body': completion}, 'error': None})
+
+    with settings.store_lock:
+        for key, lines in (('output_file_id', output_lines), ('error_file_id', error_lines)):
+            if lines:
+                file_id = f'file-mock-{len(settings.files)}'
+                settings.files[file_id] = '\n'.join(json.dumps(l, ensure_ascii=False) for l in lines).encode('utf-8')
+                batch[key] = file_id
+        batch['request_counts'] = {'total': len(output_lines) + len(error_lines),
+                                   'completed': len(output_lines), 'failed': len(error_lines)}
+        batch['status'] = 'completed'
+        batch['completed_at'] = int(time.time())
+    settings.count('batches_completed')
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """模拟服务请求处理器"""
+
+    protocol_version = 'HTTP/1.1'
+    settings: MockSettings = None
+
+    def log_message(self, format, *args):
+        pass  # 压测时请求量很大，不逐条打印
+
+    def _send_json(self, status: int, body: Dict, headers: Dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_bytes(self, status: int, data: bytes, content_type: str = 'application/jsonl'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path.startswith('/v1/batches/'):
+            with self.settings.store_lock:
+                batch = self.settings.batches.get(path.rsplit('/', 1)[-1])
+                batch = dict(batch) if batch else None
+            if batch:
+                self._send_json(200, batch)
+            else:
+                self._send_json(404, {'error': {'message': 'batch not found'}})
+        elif path.startswith('/v1/files/') and path.endswith('/content'):
+            with self.settings.store_lock:
+                data = self.settings.files.get(path.split('/')[-2])
+            if data is None:
+                self._send_json(404, {'error': {'message': 'file not found'}})
+            else:
+                self._send_bytes(200, data)
+        elif self.path.rstrip('/') == '/stats':
+            with self.settings.stats_lock:
+                self._send_json(200, dict(self.settings.stats))
+        elif self.path.rstrip('/') == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length)
+        path = self.path.rstrip('/')
+
+        if path == '/v1/files':
+            self.handle_file_upload(data)
+            return
+
+        try:
+            body = json.loads(data or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': {'message': 'invalid json'}})
+            return
+
+        if path == '/v1/batches':
+            self.handle_create_batch(body)
+        elif path.endswith('/chat/completions'):
+            self.handle_chat_completion(body)
+        else:
+            self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+
+    def handle_file_upload(self, data: bytes):
+        fields = _parse_multipart(self.headers.get('Content-Type', ''), data)
+        if 'file' not in fields:
+            self._send_json(400, {'error': {'message': 'missing file'}})
+            return
+        with self.settings.store_lock:
+            file_id = f'file-mock-{len(self.settings.files)}'
+            self.settings.files[file_id] = fields['file']
+        self.settings.count('files_uploaded')
+        self._send_json(200, {'id': file_id, 'object': 'file', 'bytes': len(fields['file']),
+                              'purpose': (fields.get('purpose') or b'batch').decode('utf-8')})
+
+    def handle_create_batch(self, body: Dict):
+        input_file_id = body.get('input_file_id')
+        with self.settings.store_lock:
+            if input_file_id not in self.settings.files:
+                self._send_json(400, {'error': {'message': f'unknown input_file_id {input_file_id}'}})
+                return
+            batch_id = f'batch-mock-{len(self.settings.batches)}'
+            batch = {'id': batch_id, 'object': 'batch', 'endpoint': body.get('endpoint'),
+                     'input_file_id': input_file_id, 'completion_window': body.get('completion_window'),
+                     'status': 'validating', 'created_at': int(time.time()), 'metadata': body.get('metadata'),
+                     'request_counts': {'total': 0, 'completed': 0, 'failed': 0}}
+            self.settings.batches[batch_id] = batch
+            response = dict(batch)
+        self.settings.count('batches_created')
+        threading.Thread(target=run_batch, args=(batch_id, self.settings), daemon=True).start()
+        self._send_json(200, response)
+
+    def handle_chat_completion(self, body: Dict):
+        settings = self.settings
+        settings.count('requests')
+
+        # 模拟限流和服务端错误
+        if settings.random() < settings.rate_429:
+            settings.count('429')
+            self._send_json(429, {'error': {'message': 'rate limit exceeded (mock)'}},
+                            headers={'Retry-After': str(settings.retry_after)})
+            return
+        if settings.random() < settings.error_rate:
+            settings.count('500')
+            time.sleep(settings.sample_latency())
+            self._send_json(500, {'error': {'message': 'internal error (mock)'}})
+            return
+
+        completion, content, reasoning = build_completion(body, settings)
+
+        if body.get('stream'):
+            self.stream_reply(completion['model'], content, reasoning, completion['choices'][0]['finish_reason'], completion.get('usage'))
+            return
+
+        time.sleep(settings.sample_latency())
+        settings.count('completed')
+        self._send_json(200, completion)
+
+    def stream_reply(self, model: str, content: str, reasoning: str, finish_reason: str, usage: Optional[Dict]):
+        """以SSE流式返回（首个数据块前等待采样的延迟，之后按固定间隔输出）"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def send(chunk: Dict):
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            time.sleep(self.settings.sample_latency())
+            for field, text in (('reasoning_content', reasoning), ('content', content)):
+                for i in range(0, len(text), 20):
+                    send({'model': model, 'object': 'chat.completion.chunk',
+                          'choices': [{'index': 0, 'delta': {field: text[i:i + 20]}, 'finish_reason': None}]})
+                    if self.settings.stream_chunk_delay > 0:
+                        time.sleep(self.settings.stream_chunk_delay)
+            send({'model': model, 'object': 'chat.completion.chunk',
+                  'choices': [{'index': 0, 'delta': {}, 'finish_reason': finish_reason}]})
+            if usage:
+                send({'model': model, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.settings.count('completed')
+        except (BrokenPipeError, ConnectionResetError):
+            self.settings.count('client_disconnected')  # 客户端中止（如对冲请求被取消）
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟LLM服务（OpenAI/DeepSeek兼容）')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    parser.add_argument('--latency-median', type=float, default=1.0, help='响应延迟中位数（秒），0表示无延迟')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='延迟对数正态分布的sigma（越大长尾越明显）')
+    parser.add_argument('--stream-chunk-delay', type=float, default=0.02, help='流式响应每个数据块的间隔（秒）')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='返回429的比例（0-1）')
+    parser.add_argument('--retry-after', type=int, default=1, help='429响应的Retry-After秒数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回500的比例（0-1）')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='以finish_reason=length截断回答的比例（0-1）')
+    parser.add_argument('--reasoning', action='store_true', help='所有模型都返回reasoning_content（默认仅*-reasoner模型返回）')
+    parser.add_argument('--answer-chars', type=int, default=1200, help='案例分析回答的大致字符数')
+    parser.add_argument('--batch-delay', type=float, default=2.0, help='批处理任务提交后多少秒完成')
+    parser.add_argument('--omit-usage', action='store_true', help='响应中不返回usage（模拟不返回token用量的提供商）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子（影响延迟和错误注入，回答内容只由请求决定）')
+    args = parser.parse_args()
+
+    settings = MockSettings(args)
+    MockLLMHandler.settings = settings
+
+    server = ThreadingHTTPServer((args.host, args.port), MockLLMHandler)
+    server.daemon_threads = True
+    print(f"模拟LLM服务已启动: http://{args.host}:{args.port}/v1/chat/completions", flush=True)
+    print(f"  延迟中位数: {args.latency_median}秒, 429比例: {args.rate_429}, 500比例: {args.error_rate}, "
+          f"截断比例: {args.truncate_rate}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n模拟LLM服务已停止", flush=True)
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
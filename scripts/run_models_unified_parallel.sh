@@ -1,6 +1,8 @@
 #!/bin/bash
 # 并行运行多个模型（除了gpt-5），使用DeepSeek的108个案例结果文件中的问题
 # 所有模型的结果会保存到同一个Excel文件的不同tab中
+# 也可以在单个进程中运行所有模型（只加载一次数据，脱敏和问题生成只做一次，不争用文件锁）：
+#   python3 process_cases.py --models deepseek,gpt4o,claude,gemini,qwen --use_ds_questions "$DS_FILE" --case_ids $CASE_IDS --standalone
 
 # 20个案例列表（去掉4个敏感案例后的16个 + 4个新案例）
 # 敏感案例（已排除）：case_20260103_155150_0, 1, 2, 3
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+调用遥测汇总脚本
+读取 utils/telemetry 写入的JSONL事件，按（阶段, 模型）汇总调用次数、延迟分位数、首token延迟、
+token数、截断和失败次数，用于找出占用吞吐量的阶段和模型（替代从日志中正则解析[Token使用]行）。
+
+使用方法:
+    python scripts/telemetry_summary.py                  # 汇总最近一次运行
+    python scripts/telemetry_summary.py --all            # 汇总文件中的所有运行
+    python scripts/telemetry_summary.py --run-id 20250101_120000_12345
+    python scripts/telemetry_summary.py --group-by provider stage
+"""
+import os
+import sys
+import json
+import argparse
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import TELEMETRY_PATH
+
+
+def load_events(path: str) -> List[Dict]:
+    """读取JSONL事件文件（跳过损坏的行）"""
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """计算百分位数，无样本时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summarize(events: List[Dict], group_by: List[str]) -> List[Dict]:
+    """
+    按指定字段分组汇总事件
+
+    Returns:
+        每组一行的汇总字典列表，按总耗时降序排列
+    """
+    groups = defaultdict(list)
+    for event in events:
+        groups[tuple(event.get(field) or '-' for field in group_by)].append(event)
+
+    rows = []
+    for key, group in groups.items():
+        live = [e for e in group if not e.get('cached')]  # 缓存命中不占用提供商吞吐
+        latencies = [e['latency'] for e in live if e.get('status') == 'ok']
+        ttfts = [e['ttft'] for e in live if e.get('ttft') is not None]
+        row = dict(zip(group_by, key))
+        row.update({
+            'calls': len(group),
+            'cached': len(group) - len(live),
+            'errors': sum(1 for e in group if e.get('status') in ('error', 'empty')),
+            'truncated': sum(1 for e in group if e.get('finish_reason') in ('length', 'max_tokens')),
+            'busy_seconds': sum(e.get('latency', 0) for e in live),
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'ttft_p50': percentile(ttfts, 0.5),
+            'input_tokens': sum(e.get('input_tokens', 0) for e in live),
+            'output_tokens': sum(e.get('output_tokens', 0) for e in live),
+            'reasoning_tokens': sum(e.get('reasoning_tokens', 0) for e in live),
+            'estimated': sum(1 for e in live if e.get('usage_estimated')),
+        })
+        rows.append(row)
+    rows.sort(key=lambda r: r['busy_seconds'], reverse=True)
+    return rows
+
+
+def _fmt_seconds(value: Optional[float]) -> str:
+    return f"{value:.2f}s" if value is not None else '-'
+
+
+def print_summary(rows: List[Dict], group_by: List[str]):
+    """打印汇总表"""
+    total_busy = sum(r['busy_seconds'] for r in rows) or 1.0
+    header = group_by + ['调用', '缓存', '失败', '截断', '耗时占比', 'p50', 'p95', 'TTFT p50', '输入tokens', '输出tokens', '推理tokens']
+    table = [header]
+    for r in rows:
+        table.append([str(r[field]) for field in group_by] + [
+            str(r['calls']), str(r['cached']), str(r['errors']), str(r['truncated']),
+            f"{r['busy_seconds'] / total_busy * 100:.1f}%",
+            _fmt_seconds(r['p50']), _fmt_seconds(r['p95']), _fmt_seconds(r['ttft_p50']),
+            f"{r['input_tokens']:,}", f"{r['output_tokens']:,}" + ('*' if r['estimated'] else ''),
+            f"{r['reasoning_tokens']:,}",
+        ])
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+    for i, row in enumerate(table):
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if i == 0:
+            print('  '.join('-' * width for width in widths))
+    if any(r['estimated'] for r in rows):
+        print("\n* 含本地估算的token数（提供商未返回usage）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='汇总LLM调用遥测事件')
+    parser.add_argument('--path', type=str, default=TELEMETRY_PATH, help='事件文件路径')
+    parser.add_argument('--run-id', type=str, default=None, help='只汇总指定运行')
+    parser.add_argument('--all', action='store_true', help='汇总所有运行（默认只汇总最近一次运行）')
+    parser.add_argument('--group-by', nargs='+', default=['stage', 'model'], help='分组字段（如 stage model provider priority）')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"未找到遥测文件: {args.path}")
+        sys.exit(1)
+
+    events = load_events(args.path)
+    if args.run_id:
+        events = [e for e in events if e.get('run_id') == args.run_id]
+    elif not args.all and events:
+        latest_run = events[-1].get('run_id')
+        events = [e for e in events if e.get('run_id') == latest_run]
+        print(f"运行: {latest_run}")
+
+    if not events:
+        print("没有匹配的事件")
+        return
+
+    print(f"事件数: {len(events)}\n")
+    print_summary(summarize(events, args.group_by), args.group_by)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,8 @@ from config import API_PROVIDER
 from utils.deepseek_api import DeepSeekAPI
 from utils.unified_model_api import UnifiedModelAPI
 from utils.qwen_api import QwenAPI
+from utils.async_api import AsyncAPIClient
+from utils.lazy import LazyInstance
 
 
 class UnifiedAIAPI:
@@ -52,6 +54,8 @@ class UnifiedAIAPI:
             self.api = DeepSeekAPI()
             self.api_name = 'DeepSeek'
             print(f"[统一API] 使用提供商: {self.api_name}")
+        
+        self.async_api = AsyncAPIClient(self.api)
     
     def analyze_case(self, case_text: str, question: str = None, use_thinking: bool = True) -> Dict[str, str]:
         """
@@ -76,6 +80,20 @@ class UnifiedAIAPI:
             else:
                 return {'answer': result, 'thinking': ''}
     
+    async def analyze_case_async(self, case_text: str, question: str = None, use_thinking: bool = True) -> Dict[str, str]:
+        """
+        分析法律案例（异步版本，用于--async模式）
+        
+        Args:
+            case_text: 案例文本
+            question: 可选的问题，如果提供则针对问题进行分析
+            use_thinking: 是否使用thinking模式（仅DeepSeek支持）
+            
+        Returns:
+            包含'answer'和'thinking'的字典，如果未启用thinking则'thinking'为空字符串
+        """
+        return await self.async_api.analyze_case(case_text, question, use_thinking=use_thinking)
+    
     def generate_questions(self, case_text: str, num_questions: int = 10) -> List[str]:
         """
         基于案例生成测试问题
@@ -89,6 +107,19 @@ class UnifiedAIAPI:
         """
         return self.api.generate_questions(case_text, num_questions)
     
+    async def generate_questions_async(self, case_text: str, num_questions: int = 10) -> List[str]:
+        """
+        基于案例生成测试问题（异步版本，用于--async模式）
+        
+        Args:
+            case_text: 案例文本
+            num_questions: 要生成的问题数量
+            
+        Returns:
+            问题列表
+        """
+        return await self.async_api.generate_questions(case_text, num_questions)
+    
     def generate_questions_with_judge_answers(self, case_text: str, judge_decision: str, num_questions: int = 5) -> List[Dict]:
         """
         基于案例和法官判决生成问题，并提取法官判决中的回答
@@ -121,6 +152,6 @@ class UnifiedAIAPI:
         return self.api_name
 
 
-# 创建全局实例（根据配置自动选择）
-ai_api = UnifiedAIAPI()
+# 创建全局实例（根据配置自动选择，首次使用时才初始化）
+ai_api = LazyInstance(UnifiedAIAPI)
 
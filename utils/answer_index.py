@@ -0,0 +1,187 @@
+"""
+回答索引模块
+与运行无关的已完成回答和评估索引（SQLite），以内容哈希为键：
+- 回答键：（脱敏案例文本, 问题, 模型标识, 生成参数：thinking模式、是否多问题合并回答、temperature、max_tokens），任何新运行、结果目录或 --case_ids 子集遇到相同的工作单元都直接复用回答
+- 评估键：（回答, 问题, 脱敏判决, 脱敏案例文本, 评估模型, 评分量表版本），回答和评估标准都没变时复用评分
+- 不设TTL和大小上限：回答和评估是实验结果而不是临时缓存（响应缓存按请求体缓存原始响应，会过期淘汰）
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+from config import ANSWER_INDEX_ENABLED, ANSWER_INDEX_PATH
+from utils.lazy import LazyInstance
+
+
+def _content_key(**fields) -> str:
+    """字段内容的SHA-256哈希"""
+    raw = json.dumps(fields, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class AnswerIndex:
+    """已完成回答和评估的索引（SQLite存储）"""
+
+    def __init__(self, db_path: str = None, enabled: bool = None):
+        """
+        初始化回答索引（数据库在首次使用时才打开）
+
+        Args:
+            db_path: SQLite数据库路径，默认从config读取
+            enabled: 是否启用索引，默认从config读取
+        """
+        self.db_path = db_path or ANSWER_INDEX_PATH
+        self.enabled = ANSWER_INDEX_ENABLED if enabled is None else enabled
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # 当前进程统计
+        self.stats = {'answer_hits': 0, 'answer_misses': 0, 'evaluation_hits': 0, 'evaluation_misses': 0}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """获取数据库连接（首次调用时创建表）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    answer TEXT NOT NULL,
+                    thinking TEXT,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS evaluations (
+                    key TEXT PRIMARY KEY,
+                    judge TEXT,
+                    rubric_version TEXT,
+                    evaluation TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_answer_key(masked_content: str, question: str, model_id: str, params: Dict = None) -> str:
+        """
+        计算回答的内容键
+
+        Args:
+            masked_content: 脱敏后的案例文本
+            question: 问题文本
+            model_id: 回答模型标识（实际调用的模型名称）
+            params: 影响回答内容的生成参数（如thinking模式、是否多问题合并回答、temperature和max_tokens）
+        """
+        return _content_key(case_text=masked_content, question=question, model=model_id, params=params or {})
+
+    @staticmethod
+    def make_evaluation_key(ai_answer: str, question: str, judge_decision: str, case_text: str, judge_id: str,
+                            rubric_version: str) -> str:
+        """
+        计算评估的内容键
+
+        Args:
+            ai_answer: 被评估的AI回答
+            question: 问题文本
+            judge_decision: 脱敏后的法官判决（参考答案）
+            case_text: 脱敏后的案例文本
+            judge_id: 评估模型标识
+            rubric_version: 评分量表版本
+        """
+        return _content_key(answer=ai_answer, question=question, judge_decision=judge_decision, case_text=case_text,
+                            judge=judge_id, rubric_version=rubric_version)
+
+    def _get(self, table: str, columns: str, key: str, stat: str) -> Optional[tuple]:
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                row = self._get_conn().execute(f'SELECT {columns} FROM {table} WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            # 索引故障不影响主流程，按未命中处理
+            print(f"[回答索引] 读取失败: {str(e)}", flush=True)
+            row = None
+        with self._lock:
+            self.stats[f'{stat}_hits' if row is not None else f'{stat}_misses'] += 1
+        return row
+
+    def _set(self, sql: str, params: tuple):
+        if not self.enabled:
+            return
+        try:
+            with self._lock:
+                conn = self._get_conn()
+                conn.execute(sql, params)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"[回答索引] 写入失败: {str(e)}", flush=True)
+
+    def get_answer(self, key: str) -> Optional[Dict[str, str]]:
+        """
+        读取已完成的回答
+
+        Returns:
+            {'answer': 回答, 'thinking': thinking内容}，未命中返回None
+        """
+        row = self._get('answers', 'answer, thinking', key, 'answer')
+        return {'answer': row[0], 'thinking': row[1] or ''} if row is not None else None
+
+    def set_answer(self, key: str, answer: str, thinking: str = '', model: str = ''):
+        """
+        记录已完成的回答（空回答不记录）
+
+        Args:
+            key: 回答键
+            answer: 回答文本
+            thinking: thinking内容
+            model: 模型标识（仅用于查看）
+        """
+        if not answer or not answer.strip():
+            return
+        self._set('INSERT OR REPLACE INTO answers (key, model, answer, thinking, created_at) VALUES (?, ?, ?, ?, ?)',
+                  (key, model, answer, thinking or '', time.time()))
+
+    def get_evaluation(self, key: str) -> Optional[Dict]:
+        """
+        读取已完成的评估
+
+        Returns:
+            评估结果字典（与 AnswerEvaluator.evaluate_answer 返回格式相同），未命中返回None
+        """
+        row = self._get('evaluations', 'evaluation', key, 'evaluation')
+        return json.loads(row[0]) if row is not None else None
+
+    def set_evaluation(self, key: str, evaluation: Dict, judge: str = '', rubric_version: str = ''):
+        """
+        记录已完成的评估
+
+        Args:
+            key: 评估键
+            evaluation: 评估结果字典
+            judge: 评估模型标识（仅用于查看）
+            rubric_version: 评分量表版本（仅用于查看）
+        """
+        self._set('INSERT OR REPLACE INTO evaluations (key, judge, rubric_version, evaluation, created_at) VALUES (?, ?, ?, ?, ?)',
+                  (key, judge, rubric_version, json.dumps(evaluation, ensure_ascii=False, default=str), time.time()))
+
+    def print_summary(self):
+        """打印索引命中统计摘要"""
+        if not self.enabled:
+            return
+        stats = self.stats
+        print(f"[回答索引] 复用回答: {stats['answer_hits']}, 新生成: {stats['answer_misses']}, "
+              f"复用评估: {stats['evaluation_hits']}, 新评估: {stats['evaluation_misses']}", flush=True)
+
+
+# 全局实例（首次使用时才创建）
+answer_index = LazyInstance(AnswerIndex)
@@ -0,0 +1,244 @@
+"""
+异步API封装模块
+基于asyncio的LLM客户端，复用同步客户端（DeepSeekAPI/UnifiedModelAPI/QwenAPI）的
+请求构建、速率限制和token统计，在单个事件循环中支持大量并发请求
+"""
+import inspect
+import asyncio
+from typing import Dict, List, Optional
+from config import TRUNCATION_STRATEGY, CONTINUATION_MAX_ROUNDS, THROTTLE_MAX_RETRIES
+from utils.http_client import HAS_AIOHTTP, get_async_session
+from utils.circuit_breaker import get_circuit_breaker
+from utils.hedging import hedged_request_async
+from utils.continuation import is_truncated, get_partial_content, merge_continuation
+from utils.response_cache import response_cache
+from utils.token_estimator import fit_max_tokens, estimate_usage
+from utils.rate_limiter import new_waiter_id
+from utils.telemetry import instrument_request, mark_cached, telemetry_context, STAGE_QUESTIONS
+from utils.prompts import ANALYZE_CASE_TEMPERATURE, ANALYZE_CASE_MAX_TOKENS, build_analyze_case_messages, build_generate_questions_messages, build_continuation_messages, parse_questions
+
+if HAS_AIOHTTP:
+    import aiohttp
+
+
+class AsyncAPIClient:
+    """异步API客户端（包装一个同步客户端实例）"""
+
+    def __init__(self, api):
+        """
+        初始化异步客户端
+
+        Args:
+            api: 同步客户端实例（DeepSeekAPI、UnifiedModelAPI或QwenAPI）
+        """
+        self.api = api
+        self.api_name = getattr(api, 'model', None) or type(api).__name__.replace('API', '')
+        self.supports_thinking = 'use_thinking' in inspect.signature(api._make_request).parameters
+
+    async def _rate_limit_check(self):
+        """检查并控制请求速率（等待期间让出事件循环）"""
+        waiter_id = new_waiter_id()
+        while True:
+            wait_time = self.api.rate_limiter.try_acquire(waiter_id=waiter_id)
+            if wait_time <= 0:
+                return
+            await asyncio.sleep(wait_time)
+
+    @instrument_request
+    async def _make_request(self, messages: List[Dict], temperature: float = 0.7, max_tokens: int = 2000, auto_retry_on_truncate: bool = True, use_thinking: bool = False) -> Optional[Dict]:
+        """
+        异步发送API请求（重试、429处理和截断补救策略与同步客户端一致）
+
+        Args:
+            messages: 消息列表，格式为 [{"role": "user", "content": "..."}]
+            temperature: 温度参数，控制随机性
+            max_tokens: 最大token数
+            auto_retry_on_truncate: 如果响应被截断，是否自动增加max_tokens重试
+            use_thinking: 是否使用thinking模式（仅DeepSeek支持）
+
+        Returns:
+            API响应字典，失败返回None
+        """
+        if not HAS_AIOHTTP:
+            # 未安装aiohttp时退化为在线程中执行同步请求
+            kwargs = {'use_thinking': use_thinking} if self.supports_thinking else {}
+            return await asyncio.to_thread(self.api._make_request, messages, temperature, max_tokens, auto_retry_on_truncate, **kwargs)
+
+        if not self.api.api_key:
+            raise ValueError(f"{self.api_name} API密钥未配置，请在.env文件中设置对应的API密钥")
+
+        use_thinking = use_thinking and self.supports_thinking
+        
+        # 发送前按模型的上下文窗口和输出上限调整max_tokens（输入超过上下文窗口时直接失败）
+        model = self.api._build_payload(messages, temperature, max_tokens, use_thinking=use_thinking)['model']
+        max_tokens = fit_max_tokens(messages, max_tokens, model)
+        
+        # 响应缓存（与同步客户端共用同一缓存键）
+        cache_key = response_cache.make_key(self.api.provider, self.api._build_payload(messages, temperature, max_tokens, use_thinking=use_thinking), use_thinking)
+        cached = await asyncio.to_thread(response_cache.get, cache_key)
+        if cached is not None:
+            mark_cached()
+            return cached
+        
+        current_max_tokens = max_tokens
+        session = get_async_session()
+        timeout = aiohttp.ClientTimeout(total=180)  # 与同步客户端一致，适应长文本分析
+
+        for retry_round in range(2):  # 最多重试2轮（原始请求 + 1次补救）
+            await self._rate_limit_check()
+
+            headers = self.api._build_headers()
+            payload = self.api._build_payload(messages, temperature, current_max_tokens, use_thinking=use_thinking)
+
+            breaker = get_circuit_breaker(self.api.provider, payload.get('model', ''))
+
+            truncated = False
+            for attempt in range(self.api.max_retries):
+                try:
+                    for throttle_count in range(THROTTLE_MAX_RETRIES + 1):
+                        with breaker.guard():
+                            async with self.api.concurrency.async_slot() as slot:
+                                async with session.post(self.api.api_url, headers=headers, json=payload, timeout=timeout) as response:
+                                    # 处理429错误（速率限制）：由并发控制器降低并发并统一退避
+                                    if response.status == 429:
+                                        slot.throttled(response.headers.get('Retry-After'))
+                                    else:
+                                        response.raise_for_status()
+                                        result = await response.json(content_type=None)
+
+                        if response.status != 429:
+                            break
+                        print(f"[速率限制] 触发限制，降低并发后重试（第{throttle_count + 1}次）...", flush=True)
+                        await self._rate_limit_check()
+                    else:
+                        response.raise_for_status()  # 多次限流后仍为429，按请求失败处理
+
+                    # 检查响应是否完整（finish_reason）
+                    if 'choices' in result and len(result['choices']) > 0:
+                        finish_reason = result['choices'][0].get('finish_reason', '')
+                        if finish_reason in ('length', 'max_tokens'):
+                            truncated = True
+                            if auto_retry_on_truncate and retry_round == 0:
+                                if TRUNCATION_STRATEGY == 'continue' and get_partial_content(result):
+                                    # 续写：保留已生成的内容，让模型从中断处继续
+                                    # 提供商未返回usage时按本地估算记录
+                                    self.api._record_usage(result.get('usage') or estimate_usage(messages, result, model), use_thinking=use_thinking)
+                                    result = await self._continue_truncated(messages, result, temperature, current_max_tokens, use_thinking)
+                                    await asyncio.to_thread(response_cache.set, cache_key, result, self.api.provider, payload.get('model', ''))
+                                    return result
+                                # 加倍max_tokens重试（最多16000，且不超过模型的输出上限）
+                                next_max_tokens = fit_max_tokens(messages, min(current_max_tokens * 2, 16000), model)
+                                if next_max_tokens > current_max_tokens:
+                                    current_max_tokens = next_max_tokens
+                                    print(f"[自动补救] 响应被截断，增加max_tokens到{current_max_tokens}并重新生成...", flush=True)
+                                    break
+                                # 已达到模型的输出上限，重新生成仍会在同一位置截断
+                                print(f"[警告] 响应被截断，max_tokens已达模型输出上限（{current_max_tokens}），不再重新生成", flush=True)
+                                auto_retry_on_truncate = False
+                            else:
+                                print(f"[警告] 响应因token限制被截断（max_tokens={current_max_tokens}）", flush=True)
+                        elif finish_reason == 'content_filter':
+                            print("[警告] 响应被内容过滤器截断", flush=True)
+                        elif finish_reason not in ['stop', '']:
+                            print(f"[警告] 响应完成原因: {finish_reason}", flush=True)
+
+                    # 如果响应完整、已经重试过或不需要补救，返回结果
+                    if not truncated or retry_round > 0 or not auto_retry_on_truncate:
+                        # 提供商未返回usage时按本地估算记录
+                        self.api._record_usage(result.get('usage') or estimate_usage(messages, result, model), use_thinking=use_thinking)
+                        await asyncio.to_thread(response_cache.set, cache_key, result, self.api.provider, payload.get('model', ''))
+                        return result
+
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt < self.api.max_retries - 1:
+                        wait_time = self.api.retry_delay * (attempt + 1)
+                        print(f"[API重试] 请求失败，{wait_time}秒后重试... (尝试 {attempt + 1}/{self.api.max_retries})", flush=True)
+                        await asyncio.sleep(wait_time)
+                    else:
+                        print(f"API请求最终失败: {str(e)}", flush=True)
+                        raise
+
+            # 如果是因为截断而重试，进入下一轮
+            if truncated and retry_round == 0:
+                continue
+            else:
+                break
+
+        return None
+
+    async def _continue_truncated(self, messages: List[Dict], result: Dict, temperature: float, max_tokens: int, use_thinking: bool) -> Dict:
+        """对被截断的响应进行续写（与utils.continuation.continue_truncated一致的异步版本）"""
+        for round_num in range(1, CONTINUATION_MAX_ROUNDS + 1):
+            partial = get_partial_content(result)
+            print(f"[自动补救] 响应被截断（已生成{len(partial)}字符），第{round_num}次续写...", flush=True)
+            continuation = await self._make_request(build_continuation_messages(messages, partial), temperature=temperature,
+                                                    max_tokens=max_tokens, auto_retry_on_truncate=False, use_thinking=use_thinking)
+            if not continuation or not continuation.get('choices'):
+                break
+            result = merge_continuation(result, continuation)
+            if not is_truncated(result):
+                break
+
+        if is_truncated(result):
+            print(f"[警告] 续写{CONTINUATION_MAX_ROUNDS}次后响应仍被截断", flush=True)
+        return result
+
+    async def analyze_case(self, case_text: str, question: str = None, use_thinking: bool = True) -> Dict[str, str]:
+        """
+        异步分析法律案例
+
+        Args:
+            case_text: 案例文本
+            question: 可选的问题，如果提供则针对问题进行分析
+            use_thinking: 是否使用thinking模式（仅DeepSeek支持）
+
+        Returns:
+            包含'answer'和'thinking'的字典，如果未启用thinking则'thinking'为空字符串
+        """
+        use_thinking = use_thinking and self.supports_thinking
+        messages = build_analyze_case_messages(case_text, question)
+
+        # 与DeepSeek同步客户端一致：content为空时最多重试3次
+        max_retries = 3
+        thinking = ''
+        for retry_count in range(max_retries + 1):
+            response = await hedged_request_async(self, messages, temperature=ANALYZE_CASE_TEMPERATURE, max_tokens=ANALYZE_CASE_MAX_TOKENS, use_thinking=use_thinking)
+            if not response or 'choices' not in response or len(response['choices']) == 0:
+                if retry_count == 0:
+                    raise Exception("API响应格式错误或为空")
+                print(f"[{self.api_name} API] 重试{retry_count}：API响应格式错误", flush=True)
+            else:
+                choice = response['choices'][0]
+                message = choice.get('message', {})
+                answer = message.get('content', '') or ''
+                if use_thinking:
+                    thinking = message.get('reasoning_content', '') or choice.get('reasoning_content', '') or thinking
+                if answer.strip():
+                    return {'answer': answer, 'thinking': thinking}
+                print(f"[{self.api_name} API] ⚠️ content为空（第{retry_count + 1}次请求）", flush=True)
+
+            if retry_count < max_retries:
+                await asyncio.sleep(2)
+
+        raise Exception(f"API返回content为空，重试{max_retries}次后仍失败")
+
+    async def generate_questions(self, case_text: str, num_questions: int = 10) -> List[str]:
+        """
+        异步基于案例生成测试问题
+
+        Args:
+            case_text: 案例文本
+            num_questions: 要生成的问题数量
+
+        Returns:
+            问题列表
+        """
+        messages = build_generate_questions_messages(case_text, num_questions)
+        with telemetry_context(stage=STAGE_QUESTIONS):
+            response = await self._make_request(messages, temperature=0.7, max_tokens=2000)
+
+        if response and 'choices' in response and len(response['choices']) > 0:
+            content = response['choices'][0]['message']['content']
+            return parse_questions(content, num_questions)
+        else:
+            raise Exception("API响应格式错误或为空")
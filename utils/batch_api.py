@@ -0,0 +1,291 @@
+"""
+批处理API模块
+将一批聊天请求写成OpenAI风格的批处理JSONL文件（每行包含custom_id、method、url、body），
+上传到 /v1/files，提交到 /v1/batches 并轮询，完成后下载输出文件并按custom_id返回结果
+- 适用于不要求实时返回的评估阶段：批处理接口通常价格减半，且不占用实时接口的速率限制
+- 任何兼容 /v1/files + /v1/batches 的服务都可使用（包括scripts/mock_llm_server.py）
+"""
+import os
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import requests
+from config import BATCH_API_BASE_URL, BATCH_POLL_INTERVAL, BATCH_MAX_WAIT, BATCH_COMPLETION_WINDOW, BATCH_DIR
+from utils.http_client import get_session
+
+CHAT_COMPLETIONS_PATH = '/v1/chat/completions'
+
+# 批处理任务的终止状态
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+class BatchError(Exception):
+    """批处理任务提交或执行失败"""
+
+
+def derive_base_url(api_url: str) -> str:
+    """
+    从聊天接口地址推导批处理接口的基础地址
+
+    Args:
+        api_url: 聊天接口地址，如 https://api.example.com/v1/chat/completions
+
+    Returns:
+        不含 /v1 的基础地址，如 https://api.example.com
+    """
+    base = api_url.rstrip('/')
+    for suffix in ('/chat/completions', '/v1'):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    return base
+
+
+def build_request_line(custom_id: str, payload: Dict) -> Dict:
+    """
+    构建批处理文件中的一行请求
+
+    Args:
+        custom_id: 请求标识（用于把结果合并回对应的结果行，批内必须唯一）
+        payload: 聊天接口请求体（由客户端的_build_payload构建）
+
+    Returns:
+        批处理请求字典
+    """
+    return {
+        'custom_id': custom_id,
+        'method': 'POST',
+        'url': CHAT_COMPLETIONS_PATH,
+        'body': payload
+    }
+
+
+def write_batch_file(lines: List[Dict], path: str = None) -> str:
+    """
+    将批处理请求写入JSONL文件
+
+    Args:
+        lines: build_request_line构建的请求列表
+        path: 输出路径，默认写入BATCH_DIR下带时间戳的文件
+
+    Returns:
+        文件路径
+    """
+    if path is None:
+        os.makedirs(BATCH_DIR, exist_ok=True)
+        path = os.path.join(BATCH_DIR, f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False) + '\n')
+    return path
+
+
+def parse_output_lines(text: str) -> Dict[str, Dict]:
+    """
+    解析批处理输出文件
+
+    Args:
+        text: 输出文件内容（JSONL，每行包含custom_id、response、error）
+
+    Returns:
+        {custom_id: 聊天接口响应体}，失败的请求值为 {'error': ...}
+    """
+    results = {}
+    for raw in text.splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            line = json.loads(raw)
+        except json.JSONDecodeError:
+            continue
+        custom_id = line.get('custom_id')
+        if not custom_id:
+            continue
+        response = line.get('response') or {}
+        if line.get('error') or response.get('status_code', 200) != 200:
+            results[custom_id] = {'error': line.get('error') or response.get('body') or {'message': '批处理请求失败'}}
+        else:
+            results[custom_id] = response.get('body') or {}
+    return results
+
+
+class BatchAPIClient:
+    """批处理接口客户端（/v1/files + /v1/batches）"""
+
+    def __init__(self, api_key: str, base_url: str, provider: str = 'batch', poll_interval: float = None, max_wait: float = None):
+        """
+        初始化批处理客户端
+
+        Args:
+            api_key: API密钥
+            base_url: 服务基础地址（不含 /v1），如 https://api.openai.com
+            provider: 提供商名称（用于共享连接池）
+            poll_interval: 轮询间隔（秒），默认从config读取
+            max_wait: 最长等待时间（秒），默认从config读取
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.poll_interval = BATCH_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.max_wait = BATCH_MAX_WAIT if max_wait is None else max_wait
+        self.session = get_session(provider)
+
+    @classmethod
+    def for_api(cls, api) -> 'BatchAPIClient':
+        """
+        根据同步客户端（DeepSeekAPI/UnifiedModelAPI/QwenAPI）创建批处理客户端（复用其密钥和地址）
+
+        Args:
+            api: 同步客户端实例
+
+        Returns:
+            BatchAPIClient实例
+        """
+        base_url = BATCH_API_BASE_URL or derive_base_url(api.api_url)
+        return cls(api.api_key, base_url, provider=api.provider)
+
+    def _headers(self) -> Dict:
+        return {'Authorization': f'Bearer {self.api_key}'}
+
+    def upload_file(self, path: str) -> str:
+        """上传批处理输入文件，返回file_id"""
+        with open(path, 'rb') as f:
+            response = self.session.post(
+                f'{self.base_url}/v1/files',
+                headers=self._headers(),
+                data={'purpose': 'batch'},
+                files={'file': (os.path.basename(path), f, 'application/jsonl')},
+                timeout=300
+            )
+        response.raise_for_status()
+        return response.json()['id']
+
+    def create_batch(self, input_file_id: str, metadata: Dict = None) -> Dict:
+        """创建批处理任务，返回任务对象"""
+        body = {
+            'input_file_id': input_file_id,
+            'endpoint': CHAT_COMPLETIONS_PATH,
+            'completion_window': BATCH_COMPLETION_WINDOW
+        }
+        if metadata:
+            body['metadata'] = metadata
+        response = self.session.post(f'{self.base_url}/v1/batches', headers=self._headers(), json=body, timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def get_batch(self, batch_id: str) -> Dict:
+        """查询批处理任务状态"""
+        response = self.session.get(f'{self.base_url}/v1/batches/{batch_id}', headers=self._headers(), timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def download_file(self, file_id: str) -> str:
+        """下载文件内容"""
+        response = self.session.get(f'{self.base_url}/v1/files/{file_id}/content', headers=self._headers(), timeout=300)
+        response.raise_for_status()
+        response.encoding = 'utf-8'
+        return response.text
+
+    def wait_for_batch(self, batch_id: str) -> Dict:
+        """
+        轮询批处理任务直到进入终止状态
+
+        Args:
+            batch_id: 任务ID
+
+        Returns:
+            最终的任务对象
+
+        Raises:
+            BatchError: 超过最长等待时间
+        """
+        start_time = time.time()
+        last_status = None
+        while True:
+            try:
+                batch = self.get_batch(batch_id)
+            except requests.exceptions.RequestException as e:
+                # 轮询失败不影响已提交的任务，下一轮再查
+                print(f"[批处理] 查询任务状态失败: {str(e)}", flush=True)
+                batch = {'status': last_status}
+
+            status = batch.get('status')
+            if status != last_status and status:
+                counts = batch.get('request_counts') or {}
+                print(f"[批处理] 任务 {batch_id} 状态: {status}（完成 {counts.get('completed', 0)}/{counts.get('total', 0)}，"
+                      f"失败 {counts.get('failed', 0)}）", flush=True)
+                last_status = status
+            if status in TERMINAL_STATUSES:
+                return batch
+
+            if self.max_wait > 0 and time.time() - start_time > self.max_wait:
+                raise BatchError(f"批处理任务 {batch_id} 超过最长等待时间（{self.max_wait:.0f}秒），最后状态: {status}")
+            time.sleep(self.poll_interval)
+
+    def run(self, lines: List[Dict], path: str = None, metadata: Dict = None) -> Dict[str, Dict]:
+        """
+        写入、上传、提交并等待一批请求，返回按custom_id索引的结果
+
+        Args:
+            lines: build_request_line构建的请求列表
+            path: 批处理输入文件路径（可选）
+            metadata: 任务元数据（可选）
+
+        Returns:
+            {custom_id: 聊天接口响应体或 {'error': ...}}，未返回结果的请求不在字典中
+
+        Raises:
+            BatchError: 任务失败、过期或取消
+            ValueError: custom_id重复（结果无法合并回对应的结果行）
+        """
+        if not lines:
+            return {}
+        custom_ids = [line['custom_id'] for line in lines]
+        if len(set(custom_ids)) != len(custom_ids):
+            duplicates = sorted({custom_id for custom_id in custom_ids if custom_ids.count(custom_id) > 1})
+            raise ValueError(f"批处理请求的custom_id重复: {', '.join(duplicates[:5])}")
+
+        path = write_batch_file(lines, path)
+        print(f"[批处理] 已写入 {len(lines)} 个请求: {path}", flush=True)
+
+        input_file_id = self.upload_file(path)
+        batch = self.create_batch(input_file_id, metadata=metadata)
+        batch_id = batch['id']
+        print(f"[批处理] 已提交任务 {batch_id}（输入文件 {input_file_id}）", flush=True)
+
+        batch = self.wait_for_batch(batch_id)
+        results = {}
+        # 过期或取消的任务可能已有部分结果，仍然合并回来
+        for file_key in ('output_file_id', 'error_file_id'):
+            file_id = batch.get(file_key)
+            if file_id:
+                for custom_id, body in parse_output_lines(self.download_file(file_id)).items():
+                    results.setdefault(custom_id, body)
+
+        if batch.get('status') != 'completed' and not results:
+            errors = (batch.get('errors') or {}).get('data') or []
+            detail = '; '.join(e.get('message', '') for e in errors) if errors else ''
+            raise BatchError(f"批处理任务 {batch_id} 状态为 {batch.get('status')}{('：' + detail) if detail else ''}")
+
+        print(f"[批处理] 任务 {batch_id} 返回 {len(results)}/{len(lines)} 个结果", flush=True)
+        return results
+
+
+def get_response_text(response: Optional[Dict]) -> Dict[str, str]:
+    """
+    从聊天接口响应中提取回答和推理内容
+
+    Args:
+        response: 聊天接口响应体
+
+    Returns:
+        包含'answer'和'thinking'的字典
+    """
+    if not response or not response.get('choices'):
+        return {'answer': '', 'thinking': ''}
+    choice = response['choices'][0]
+    message = choice.get('message') or {}
+    return {
+        'answer': message.get('content') or '',
+        'thinking': message.get('reasoning_content') or choice.get('reasoning_content') or ''
+    }
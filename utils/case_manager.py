@@ -7,6 +7,7 @@ import os
 from datetime import datetime
 from typing import Dict, List, Optional
 from config import CASES_DIR
+from utils.lazy import LazyInstance
 
 
 class CaseManager:
@@ -152,7 +153,7 @@ class CaseManager:
         return results
 
 
-# 创建全局实例
-case_manager = CaseManager()
+# 创建全局实例（首次使用时才加载案例库）
+case_manager = LazyInstance(CaseManager)
 
 
@@ -0,0 +1,163 @@
+"""
+熔断器模块
+按（提供商, 模型）的熔断器：连续失败达到阈值后打开，打开期间请求立即失败（不再等待超时和重试）；
+冷却时间过后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开并延长冷却时间
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from config import (CIRCUIT_BREAKER_ENABLED, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT,
+                    CIRCUIT_MAX_RESET_TIMEOUT)
+from utils.concurrency import classify_error
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+STATE_NAMES = {STATE_CLOSED: '正常', STATE_OPEN: '熔断', STATE_HALF_OPEN: '半开探测'}
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，请求被直接拒绝"""
+    pass
+
+
+class CircuitBreaker:
+    """单个（提供商, 模型）的熔断器（线程安全）"""
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None,
+                 max_reset_timeout: float = None):
+        """
+        初始化熔断器
+
+        Args:
+            name: 熔断器名称（如 'deepseek/deepseek-reasoner'）
+            failure_threshold: 连续失败多少次后打开，默认从config读取
+            reset_timeout: 打开后多少秒进入半开状态，默认从config读取
+            max_reset_timeout: 连续探测失败时冷却时间的上限，默认从config读取
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or CIRCUIT_FAILURE_THRESHOLD
+        self.base_reset_timeout = reset_timeout or CIRCUIT_RESET_TIMEOUT
+        self.max_reset_timeout = max_reset_timeout or CIRCUIT_MAX_RESET_TIMEOUT
+        self.reset_timeout = self.base_reset_timeout
+
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.stats = {'failures': 0, 'rejected': 0, 'opened': 0}
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """请求前检查：打开状态直接拒绝；冷却结束后只放行一个探测请求"""
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return
+            if self.state == STATE_OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = STATE_HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == STATE_HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                print(f"[熔断器] {self.name} 进入半开状态，发送探测请求", flush=True)
+                return
+            self.stats['rejected'] += 1
+            remaining = max(0.0, self.reset_timeout - (time.time() - self.opened_at))
+            raise CircuitOpenError(f"{self.name} 服务暂不可用（熔断中，{remaining:.0f}秒后重新探测）")
+
+    def record_success(self):
+        """记录一次成功请求"""
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                print(f"[熔断器] {self.name} 探测成功，恢复正常", flush=True)
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """记录一次失败请求（达到阈值或半开探测失败时打开熔断器）"""
+        with self._lock:
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            if self.state == STATE_HALF_OPEN:
+                # 探测失败：重新打开并延长冷却时间
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == STATE_CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        """打开熔断器（调用方持有锁）"""
+        self.state = STATE_OPEN
+        self.opened_at = time.time()
+        self.probe_in_flight = False
+        self.stats['opened'] += 1
+        print(f"[熔断器] {self.name} 连续失败{self.consecutive_failures}次，熔断{self.reset_timeout:.0f}秒", flush=True)
+
+    @contextmanager
+    def guard(self):
+        """包裹一次请求：打开时直接抛出CircuitOpenError，并根据请求结果更新状态"""
+        if not CIRCUIT_BREAKER_ENABLED:
+            yield
+            return
+        self.before_request()
+        try:
+            yield
+        except BaseException as e:
+            if classify_error(e) == 'error':
+                self.record_failure()
+            else:
+                with self._lock:
+                    self.probe_in_flight = False  # 被取消或4xx的探测不算结果，允许下一次探测
+            raise
+        self.record_success()
+
+    def get_status(self) -> Dict:
+        """获取熔断器状态"""
+        with self._lock:
+            status = self.stats.copy()
+            status['state'] = self.state
+            status['consecutive_failures'] = self.consecutive_failures
+            status['retry_in'] = max(0.0, self.reset_timeout - (time.time() - self.opened_at)) if self.state == STATE_OPEN else 0.0
+            return status
+
+
+# 熔断器注册表：按（提供商, 模型）共享
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str, model: str) -> CircuitBreaker:
+    """获取（提供商, 模型）对应的共享熔断器"""
+    name = f'{provider}/{model}'
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name)
+            _breakers[name] = breaker
+        return breaker
+
+
+def get_all_circuit_status() -> Dict[str, Dict]:
+    """获取所有熔断器的状态"""
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {name: breaker.get_status() for name, breaker in breakers}
+
+
+def format_circuit_status() -> str:
+    """
+    格式化非正常状态的熔断器（用于进度显示）
+
+    Returns:
+        如 'deepseek/deepseek-reasoner: 熔断（23秒后探测）'，全部正常时返回空字符串
+    """
+    parts = []
+    for name, status in get_all_circuit_status().items():
+        if status['state'] == STATE_OPEN:
+            parts.append(f"{name}: {STATE_NAMES[STATE_OPEN]}（{status['retry_in']:.0f}秒后探测）")
+        elif status['state'] == STATE_HALF_OPEN:
+            parts.append(f"{name}: {STATE_NAMES[STATE_HALF_OPEN]}")
+    return '；'.join(parts)
@@ -0,0 +1,348 @@
+"""
+自适应并发控制模块
+按提供商的AIMD（加性增、乘性减）并发控制器：
+- 请求成功且延迟正常时逐步增加允许的在途请求数
+- 遇到429/5xx/超时时将并发数减半，并让所有线程共同等待一次退避（避免各线程各自sleep后同时重试）
+- 同时支持线程（阻塞等待）和asyncio（协程挂起等待，名额释放时才被唤醒，不轮询）两种调用方式
+- 有交互式请求在等待名额时，释放的名额优先分配给交互式请求，批量请求继续排队
+"""
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Optional
+import requests
+from config import (ADAPTIVE_CONCURRENCY_ENABLED, ADAPTIVE_CONCURRENCY_INITIAL, ADAPTIVE_CONCURRENCY_MIN,
+                    ADAPTIVE_CONCURRENCY_MAX, ADAPTIVE_BACKOFF_MAX)
+from utils.priority import is_interactive
+
+
+class RequestCancelled(Exception):
+    """请求被调用方主动取消（如对冲请求中落后的一方），不计入失败统计"""
+    pass
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    根据请求异常判断请求结果（并发控制和熔断器共用）
+
+    Returns:
+        'ignored'（主动取消或4xx等请求本身的问题）或 'error'（5xx/超时/连接错误等服务端异常）
+    """
+    if isinstance(error, (RequestCancelled, asyncio.CancelledError)):
+        return 'ignored'
+    status = None
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+    elif hasattr(error, 'status'):
+        status = getattr(error, 'status')  # aiohttp.ClientResponseError
+    if isinstance(status, int) and status < 500:
+        return 'ignored'  # 4xx错误是请求本身的问题，不代表服务端过载
+    return 'error'
+
+
+class RequestSlot:
+    """一次请求占用的并发名额（记录请求结果，供控制器调整并发数）"""
+
+    def __init__(self):
+        self.outcome = 'ok'  # 'ok'、'throttled'（429）、'error'（5xx/超时/连接错误）、'ignored'（其他客户端错误）
+        self.retry_after: Optional[float] = None
+
+    def throttled(self, retry_after: Optional[str] = None):
+        """标记本次请求被限流（429）"""
+        self.outcome = 'throttled'
+        try:
+            self.retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            self.retry_after = None
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD自适应并发控制器（线程安全）"""
+
+    def __init__(self, name: str, initial: int = None, min_limit: int = None, max_limit: int = None,
+                 backoff_max: float = None):
+        """
+        初始化控制器
+
+        Args:
+            name: 控制器名称（用于日志显示）
+            initial: 初始并发数，默认从config读取
+            min_limit: 最小并发数，默认从config读取
+            max_limit: 最大并发数，默认从config读取
+            backoff_max: 单次退避的最长等待秒数，默认从config读取
+        """
+        self.name = name
+        self.min_limit = min_limit or ADAPTIVE_CONCURRENCY_MIN
+        self.max_limit = max_limit or ADAPTIVE_CONCURRENCY_MAX
+        self.limit = float(min(max(initial or ADAPTIVE_CONCURRENCY_INITIAL, self.min_limit), self.max_limit))
+        self.backoff_max = backoff_max or ADAPTIVE_BACKOFF_MAX
+        self.enabled = ADAPTIVE_CONCURRENCY_ENABLED
+
+        self.in_flight = 0
+        self.interactive_waiting = 0  # 正在等待名额的交互式请求数
+        self.pause_until = 0.0  # 退避期间所有请求都等待到该时间点
+        self.last_decrease = 0.0
+        self.consecutive_throttles = 0
+        self.latencies = deque(maxlen=200)  # 最近成功请求的延迟（秒）
+
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'decreases': 0}
+        self._cond = threading.Condition()
+        self._async_waiters = deque()  # 等待名额的协程（事件循环, future），释放名额时按空闲名额数唤醒
+        self._async_woken = 0  # 已唤醒、尚未重新尝试占用名额的协程数
+
+    def _wait_time(self, now: float, interactive: bool = False) -> float:
+        """当前需要等待的秒数（调用方持有锁），0表示可以立即发出请求"""
+        if now < self.pause_until:
+            return self.pause_until - now
+        if self.in_flight >= int(self.limit):
+            return -1.0  # 名额已满，等待其他请求释放
+        if not interactive and self.interactive_waiting > 0:
+            return -1.0  # 名额优先留给正在等待的交互式请求
+        return 0.0
+
+    def try_acquire(self, priority: str = None) -> float:
+        """
+        尝试占用一个并发名额（不等待）
+
+        Args:
+            priority: 请求优先级，不提供则使用当前上下文的优先级
+
+        Returns:
+            0表示已占用；正数表示退避中需等待的秒数；-1表示名额已满
+        """
+        if not self.enabled:
+            return 0.0
+        with self._cond:
+            wait_time = self._wait_time(time.time(), is_interactive(priority))
+            if wait_time == 0:
+                self.in_flight += 1
+            return wait_time
+
+    def acquire(self, priority: str = None):
+        """
+        占用一个并发名额，退避中或名额已满时阻塞等待
+
+        Args:
+            priority: 请求优先级，不提供则使用当前上下文的优先级
+        """
+        if not self.enabled:
+            return
+        interactive = is_interactive(priority)
+        waiting = False
+        with self._cond:
+            try:
+                while True:
+                    wait_time = self._wait_time(time.time(), interactive)
+                    if wait_time == 0:
+                        self.in_flight += 1
+                        return
+                    if interactive and not waiting:
+                        self.interactive_waiting += 1
+                        waiting = True
+                    self._cond.wait(timeout=wait_time if wait_time > 0 else None)
+            finally:
+                if waiting:
+                    self.interactive_waiting -= 1
+                    self._cond.notify_all()  # 让排队的批量请求重新检查名额
+                    self._wake_async_waiters()
+
+    def release(self, latency: float, slot: RequestSlot):
+        """
+        释放并发名额并根据请求结果调整并发数
+
+        Args:
+            latency: 本次请求耗时（秒）
+            slot: 请求结果
+        """
+        if not self.enabled:
+            return
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.stats['requests'] += 1
+            now = time.time()
+
+            if slot.outcome == 'ok':
+                self.consecutive_throttles = 0
+                # 延迟明显高于近期中位数时只保持不增，避免在服务端排队时继续加压
+                if not self.latencies or latency <= 2 * self._percentile(0.5):
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.latencies.append(latency)
+            elif slot.outcome in ('throttled', 'error'):
+                self.stats['throttled' if slot.outcome == 'throttled' else 'errors'] += 1
+                self._decrease(now)
+                if slot.outcome == 'throttled':
+                    self._start_backoff(now, slot.retry_after)
+
+            self._cond.notify_all()
+            self._wake_async_waiters()
+
+    def _wake_async_waiters(self):
+        """按空闲名额数唤醒等待中的协程（调用方持有锁；名额留给等待中的交互式线程时不唤醒）"""
+        if self.interactive_waiting > 0:
+            return
+        available = int(self.limit) - self.in_flight - self._async_woken
+        while available > 0 and self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_resolve_future, future)
+            except RuntimeError:
+                continue  # 事件循环已关闭
+            self._async_woken += 1
+            available -= 1
+
+    async def _async_acquire(self):
+        """占用一个并发名额（asyncio方式）：退避中睡到退避结束，名额已满时挂起直到release唤醒"""
+        loop = asyncio.get_running_loop()
+        while True:
+            wait_time = self.try_acquire()
+            if wait_time == 0:
+                return
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+                continue
+            waiter = (loop, loop.create_future())
+            with self._cond:
+                self._async_waiters.append(waiter)
+                self._wake_async_waiters()  # 登记前名额可能刚被释放，避免错过唤醒
+            try:
+                await waiter[1]
+            except asyncio.CancelledError:
+                with self._cond:
+                    try:
+                        self._async_waiters.remove(waiter)
+                    except ValueError:
+                        # 已被唤醒：把名额让给下一个等待的协程
+                        self._async_woken -= 1
+                        self._wake_async_waiters()
+                raise
+            with self._cond:
+                self._async_woken -= 1
+
+    def _decrease(self, now: float):
+        """乘性减少并发数（同一批失败只减一次：距上次减少不足一个典型请求耗时则跳过）"""
+        window = self._percentile(0.5) if self.latencies else 1.0
+        if now - self.last_decrease < window:
+            return
+        self.limit = max(self.min_limit, self.limit / 2)
+        self.last_decrease = now
+        self.stats['decreases'] += 1
+        print(f"[并发控制] {self.name} 并发数降至 {int(self.limit)}", flush=True)
+
+    def _start_backoff(self, now: float, retry_after: Optional[float]):
+        """开始一次共享退避：连续限流时指数增长，服务端给出Retry-After时不超过它，并加随机抖动"""
+        if now < self.pause_until:
+            return  # 同一批请求在退避期间陆续返回的429不再叠加退避
+        self.consecutive_throttles += 1
+        backoff = min(self.backoff_max, 2 ** (self.consecutive_throttles - 1))
+        if retry_after is not None:
+            backoff = min(backoff, retry_after)
+        backoff *= random.uniform(0.8, 1.2)
+        self.pause_until = max(self.pause_until, now + backoff)
+
+    def _percentile(self, p: float) -> float:
+        """最近成功请求延迟的百分位数（调用方持有锁）"""
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def get_latency_percentile(self, p: float) -> Optional[float]:
+        """
+        获取最近成功请求延迟的百分位数
+
+        Args:
+            p: 百分位（0-1之间，如0.95）
+
+        Returns:
+            延迟秒数，样本不足时返回None
+        """
+        with self._cond:
+            if not self.latencies:
+                return None
+            return self._percentile(p)
+
+    @contextmanager
+    def slot(self):
+        """占用一个并发名额执行请求（线程方式）"""
+        self.acquire()
+        slot = RequestSlot()
+        start_time = time.time()
+        try:
+            yield slot
+        except BaseException as e:
+            slot.outcome = classify_error(e)
+            raise
+        finally:
+            self.release(time.time() - start_time, slot)
+        if not self.enabled and slot.outcome == 'throttled':
+            time.sleep(slot.retry_after or 60)  # 未启用自适应控制时保持原行为：按Retry-After等待
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """占用一个并发名额执行请求（asyncio方式，等待期间让出事件循环）"""
+        if self.enabled:
+            await self._async_acquire()
+        slot = RequestSlot()
+        start_time = time.time()
+        try:
+            yield slot
+        except BaseException as e:
+            slot.outcome = classify_error(e)
+            raise
+        finally:
+            self.release(time.time() - start_time, slot)
+        if not self.enabled and slot.outcome == 'throttled':
+            await asyncio.sleep(slot.retry_after or 60)
+
+    def get_stats(self) -> Dict:
+        """获取控制器状态（当前并发上限、在途请求数和累计统计）"""
+        with self._cond:
+            stats = self.stats.copy()
+            stats['limit'] = int(self.limit)
+            stats['in_flight'] = self.in_flight
+            stats['interactive_waiting'] = self.interactive_waiting
+            return stats
+
+
+def _resolve_future(future: asyncio.Future):
+    """在future所属的事件循环中唤醒等待者（等待者已取消时忽略）"""
+    if not future.done():
+        future.set_result(None)
+
+
+# 控制器注册表：同一提供商在进程内共享一个控制器
+_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(provider: str) -> AdaptiveConcurrencyLimiter:
+    """
+    获取提供商对应的共享并发控制器
+
+    Args:
+        provider: 提供商名称（如 'deepseek'、'openai'、'qwen'）
+
+    Returns:
+        共享的AdaptiveConcurrencyLimiter实例
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = AdaptiveConcurrencyLimiter(provider)
+            _limiters[provider] = limiter
+        return limiter
+
+
+def get_all_concurrency_stats() -> Dict[str, Dict]:
+    """获取所有提供商的并发控制状态（用于进度显示）"""
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    return {name: limiter.get_stats() for name, limiter in limiters}
+
+
+def print_concurrency_summary():
+    """打印各提供商的并发控制统计"""
+    for name, stats in get_all_concurrency_stats().items():
+        print(f"[并发控制] {name}: 当前并发上限 {stats['limit']}, 请求数 {stats['requests']}, "
+              f"429次数 {stats['throttled']}, 错误次数 {stats['errors']}, 降低并发 {stats['decreases']} 次", flush=True)
@@ -0,0 +1,98 @@
+"""
+截断续写模块
+响应因max_tokens被截断时，把已生成的内容作为前缀让模型从中断处继续，
+再将多段输出拼接为一个完整响应（已付费的输出token不再丢弃重算）
+"""
+from typing import Dict, List, Optional
+from config import CONTINUATION_MAX_ROUNDS
+from utils.prompts import build_continuation_messages
+
+TRUNCATED_FINISH_REASONS = ('length', 'max_tokens')
+
+
+def is_truncated(result: Optional[Dict]) -> bool:
+    """判断响应是否因token限制被截断"""
+    if not result or not result.get('choices'):
+        return False
+    return result['choices'][0].get('finish_reason', '') in TRUNCATED_FINISH_REASONS
+
+
+def get_partial_content(result: Optional[Dict]) -> str:
+    """获取响应中已生成的回答内容（不含reasoning）"""
+    if not result or not result.get('choices'):
+        return ''
+    return (result['choices'][0].get('message') or {}).get('content') or ''
+
+
+def _strip_overlap(previous: str, continuation: str, min_overlap: int = 10, max_overlap: int = 200) -> str:
+    """去掉续写开头与已有内容结尾重复的部分（模型有时会重复最后一句；过短的重合视为巧合，不处理）"""
+    for size in range(min(max_overlap, len(previous), len(continuation)), min_overlap - 1, -1):
+        if previous.endswith(continuation[:size]):
+            return continuation[size:]
+    return continuation
+
+
+def merge_continuation(result: Dict, continuation: Dict) -> Dict:
+    """
+    将续写响应拼接到原响应上
+
+    Args:
+        result: 被截断的响应（会被原地修改）
+        continuation: 续写请求的响应
+
+    Returns:
+        拼接后的响应：content/reasoning_content拼接，finish_reason取续写结果，usage为各段之和
+    """
+    message = result['choices'][0].setdefault('message', {})
+    cont_choice = continuation['choices'][0]
+    cont_message = cont_choice.get('message') or {}
+
+    previous = message.get('content') or ''
+    message['content'] = previous + _strip_overlap(previous, cont_message.get('content') or '')
+    if cont_message.get('reasoning_content'):
+        message['reasoning_content'] = '\n'.join(
+            part for part in (message.get('reasoning_content'), cont_message['reasoning_content']) if part
+        )
+    result['choices'][0]['finish_reason'] = cont_choice.get('finish_reason', '')
+
+    # token统计覆盖所有分段
+    if 'usage' in continuation:
+        usage = dict(result.get('usage') or {})
+        for field, value in continuation['usage'].items():
+            if isinstance(value, (int, float)):
+                usage[field] = usage.get(field, 0) + value
+        result['usage'] = usage
+
+    result['continuations'] = result.get('continuations', 0) + 1
+    return result
+
+
+def continue_truncated(api, messages: List[Dict], result: Dict, temperature: float, max_tokens: int, **kwargs) -> Dict:
+    """
+    对被截断的响应进行续写（同步客户端使用）
+
+    Args:
+        api: 客户端实例（DeepSeekAPI、UnifiedModelAPI或QwenAPI）
+        messages: 原始消息列表
+        result: 被截断的响应（其token使用应已由调用方记录）
+        temperature: 温度参数
+        max_tokens: 每段续写的最大token数
+        **kwargs: 透传给api._make_request的参数（如use_thinking、stream、on_delta）
+
+    Returns:
+        拼接后的完整响应
+    """
+    for round_num in range(1, CONTINUATION_MAX_ROUNDS + 1):
+        partial = get_partial_content(result)
+        print(f"[自动补救] 响应被截断（已生成{len(partial)}字符），第{round_num}次续写...", flush=True)
+        continuation = api._make_request(build_continuation_messages(messages, partial), temperature=temperature,
+                                         max_tokens=max_tokens, auto_retry_on_truncate=False, **kwargs)
+        if not continuation or not continuation.get('choices'):
+            break
+        result = merge_continuation(result, continuation)
+        if not is_truncated(result):
+            break
+
+    if is_truncated(result):
+        print(f"[警告] 续写{CONTINUATION_MAX_ROUNDS}次后响应仍被截断", flush=True)
+    return result
@@ -4,9 +4,14 @@
 支持两种方式：正则表达式脚本脱敏 和 DeepSeek API脱敏
 """
 import re
-from typing import Dict, Optional
+import asyncio
+import contextvars
+import concurrent.futures
+from typing import Dict, List, Optional
 from utils.deepseek_api import DeepSeekAPI
 from utils.ai_api import UnifiedAIAPI
+from utils.async_api import AsyncAPIClient
+from utils.telemetry import telemetry_context, STAGE_MASK
 
 
 class DataMasker:
@@ -235,6 +240,14 @@ class DataMasker:
         return masked_case
 
 
+# 案例中需要脱敏的字段：（原字段, 脱敏后字段, 是否为标题）
+MASK_FIELDS = [
+    ('title', 'title_masked', True),
+    ('case_text', 'case_text_masked', False),
+    ('judge_decision', 'judge_decision_masked', False),
+]
+
+
 class DataMaskerAPI:
     """使用DeepSeek API进行数据脱敏的工具"""
     
@@ -251,6 +264,7 @@ class DataMaskerAPI:
             self.api = UnifiedAIAPI(provider=provider).api
         else:
             self.api = UnifiedAIAPI().api
+        self.async_api = AsyncAPIClient(self.api)
     
     def mask_text_with_api(self, text: str, is_title: bool = False) -> Optional[str]:
         """
@@ -266,6 +280,51 @@ class DataMaskerAPI:
         if not text:
             return text
         
+        messages = self._build_mask_messages(text, is_title)
+        
+        try:
+            with telemetry_context(stage=STAGE_MASK):
+                response = self.api._make_request(messages, temperature=0.3, max_tokens=4000)
+            return self._extract_masked_text(response)
+        except Exception as e:
+            print(f"API脱敏失败: {str(e)}")
+            return None
+    
+    async def mask_text_with_api_async(self, text: str, is_title: bool = False) -> Optional[str]:
+        """
+        使用API对文本进行脱敏处理（异步版本，用于--async模式）
+        
+        Args:
+            text: 原始文本
+            is_title: 是否为案例标题，如果是标题则使用更简洁的prompt
+            
+        Returns:
+            脱敏后的文本，失败返回None
+        """
+        if not text:
+            return text
+        
+        messages = self._build_mask_messages(text, is_title)
+        
+        try:
+            with telemetry_context(stage=STAGE_MASK):
+                response = await self.async_api._make_request(messages, temperature=0.3, max_tokens=4000)
+            return self._extract_masked_text(response)
+        except Exception as e:
+            print(f"API脱敏失败: {str(e)}")
+            return None
+    
+    def _build_mask_messages(self, text: str, is_title: bool = False) -> List[Dict]:
+        """
+        构建脱敏请求的消息列表
+        
+        Args:
+            text: 原始文本
+            is_title: 是否为案例标题
+            
+        Returns:
+            消息列表
+        """
         if is_title:
             # 标题脱敏的简化prompt
             prompt = f"""请对以下法律案例标题进行脱敏处理，要求：
@@ -297,29 +356,29 @@ class DataMaskerAPI:
 
 脱敏后的文本："""
         
-        messages = [
+        return [
             {"role": "user", "content": prompt}
         ]
-        
-        try:
-            response = self.api._make_request(messages, temperature=0.3, max_tokens=4000)
-            if response and 'choices' in response and len(response['choices']) > 0:
-                masked_text = response['choices'][0]['message']['content'].strip()
-                # 清理可能的说明文字
-                if '脱敏后的文本' in masked_text:
-                    masked_text = masked_text.split('脱敏后的文本：', 1)[-1].strip()
-                if '原始文本' in masked_text:
-                    masked_text = masked_text.split('原始文本', 1)[0].strip()
-                return masked_text
-            return None
-        except Exception as e:
-            print(f"API脱敏失败: {str(e)}")
-            return None
+    
+    def _extract_masked_text(self, response: Optional[Dict]) -> Optional[str]:
+        """从API响应中提取脱敏后的文本（清理可能的说明文字）"""
+        if response and 'choices' in response and len(response['choices']) > 0:
+            masked_text = response['choices'][0]['message']['content'].strip()
+            # 清理可能的说明文字
+            if '脱敏后的文本' in masked_text:
+                masked_text = masked_text.split('脱敏后的文本：', 1)[-1].strip()
+            if '原始文本' in masked_text:
+                masked_text = masked_text.split('原始文本', 1)[0].strip()
+            return masked_text
+        return None
     
     def mask_case_with_api(self, case: Dict) -> Dict:
         """
         使用DeepSeek API对案例进行脱敏处理
         
+        标题、案例内容和法官判决三个字段的请求并发发出（判决通常是整个流程中最长的请求），
+        脱敏耗时取决于最长的字段而不是三者之和。
+        
         Args:
             case: 案例字典，包含title、case_text和judge_decision
             
@@ -327,29 +386,40 @@ class DataMaskerAPI:
             脱敏后的案例字典，添加title_masked、case_text_masked和judge_decision_masked字段
         """
         masked_case = case.copy()
+        fields = [(field, masked_field, is_title, str(masked_case.get(field, '')))
+                  for field, masked_field, is_title in MASK_FIELDS if field in masked_case]
+        
+        # 每个请求在调用方上下文的副本中运行，遥测字段（案例ID等）和请求优先级随之传递
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(MASK_FIELDS)) as executor:
+            futures = {
+                masked_field: executor.submit(contextvars.copy_context().run, self.mask_text_with_api, text, is_title)
+                for _, masked_field, is_title, text in fields if text
+            }
+            for _, masked_field, _, text in fields:
+                masked_case[masked_field] = futures[masked_field].result() if text else ''
         
-        # 脱敏案例标题（通过DeepSeek API）
-        if 'title' in masked_case:
-            title = str(masked_case.get('title', ''))
-            if title:
-                masked_case['title_masked'] = self.mask_text_with_api(title, is_title=True)
-            else:
-                masked_case['title_masked'] = ''
-        
-        # 脱敏案例内容
-        if 'case_text' in masked_case:
-            case_text = str(masked_case.get('case_text', ''))
-            if case_text:
-                masked_case['case_text_masked'] = self.mask_text_with_api(case_text)
-            else:
-                masked_case['case_text_masked'] = ''
+        return masked_case
+    
+    async def mask_case_with_api_async(self, case: Dict) -> Dict:
+        """
+        使用API对案例进行脱敏处理（异步版本，用于--async模式）
         
-        # 脱敏法官判决
-        if 'judge_decision' in masked_case:
-            judge_decision = str(masked_case.get('judge_decision', ''))
-            if judge_decision:
-                masked_case['judge_decision_masked'] = self.mask_text_with_api(judge_decision)
-            else:
-                masked_case['judge_decision_masked'] = ''
+        Args:
+            case: 案例字典，包含title、case_text和judge_decision
+            
+        Returns:
+            脱敏后的案例字典，添加title_masked、case_text_masked和judge_decision_masked字段
+        """
+        masked_case = case.copy()
+        fields = [(masked_field, is_title, str(masked_case.get(field, '')))
+                  for field, masked_field, is_title in MASK_FIELDS if field in masked_case]
+        
+        # 三个字段的请求并发发出
+        masked_texts = await asyncio.gather(*[
+            self.mask_text_with_api_async(text, is_title=is_title) if text else asyncio.sleep(0, result='')
+            for _, is_title, text in fields
+        ])
+        for (masked_field, _, _), masked_text in zip(fields, masked_texts):
+            masked_case[masked_field] = masked_text
         
         return masked_case
@@ -4,8 +4,19 @@
 """
 from typing import Dict, List, Optional
 from utils.ai_api import ai_api, UnifiedAIAPI
+from utils.async_api import AsyncAPIClient
+from utils.batch_api import BatchAPIClient, BatchError, build_request_line, get_response_text
+from utils.continuation import is_truncated
+from utils.response_cache import response_cache
+from utils.answer_index import answer_index
+from utils.prompts import build_analyze_case_messages
+from utils.telemetry import telemetry_context, STAGE_EVALUATE
+import requests
 import re
 
+# 评分量表版本（修改评分标准、门槛规则或评分prompt时更新，回答索引中旧版本的评估不再复用）
+RUBRIC_VERSION = 'v1.0'
+
 
 class AnswerEvaluator:
     """答案评分器"""
@@ -100,9 +111,144 @@ class AnswerEvaluator:
                 "评价Thinking": "..."  # thinking内容（如果启用）
             }
         """
+        # 相同回答在相同评估模型和评分量表下已评估过时直接复用
+        index_key = self._evaluation_key(ai_answer, judge_decision, question, case_text)
+        evaluation = answer_index.get_evaluation(index_key)
+        if evaluation is not None:
+            return evaluation
+        
         # 使用DeepSeek API进行评分（使用thinking模式）
         evaluation_response = self._call_evaluation_api(ai_answer, judge_decision, question, case_text)
+        evaluation = self._build_evaluation_result(evaluation_response)
+        self._index_evaluation(index_key, evaluation)
+        return evaluation
+    
+    async def evaluate_answer_async(self, ai_answer: str, judge_decision: str, question: str, case_text: str = "") -> Dict:
+        """
+        对AI回答进行评分（异步版本，用于--async模式，返回格式与evaluate_answer相同）
+        
+        Args:
+            ai_answer: AI生成的回答
+            judge_decision: 整个法官判决（作为参考标准）
+            question: 问题文本
+            case_text: 案例文本（可选，用于更全面的评估）
+            
+        Returns:
+            评分结果字典
+        """
+        index_key = self._evaluation_key(ai_answer, judge_decision, question, case_text)
+        evaluation = answer_index.get_evaluation(index_key)
+        if evaluation is not None:
+            return evaluation
+        
+        prompt = self._build_evaluation_prompt(ai_answer, judge_decision, question, case_text)
+        use_thinking = self._use_thinking()
+        with telemetry_context(stage=STAGE_EVALUATE):
+            if hasattr(self.api, 'analyze_case_async'):
+                evaluation_response = await self.api.analyze_case_async(prompt, question=None, use_thinking=use_thinking)
+            else:
+                evaluation_response = await AsyncAPIClient(self.api).analyze_case(prompt, question=None, use_thinking=use_thinking)
+        evaluation = self._build_evaluation_result(evaluation_response)
+        self._index_evaluation(index_key, evaluation)
+        return evaluation
+    
+    def evaluate_answers_batch(self, items: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        通过批处理接口对一整批AI回答评分（用于--batch-eval模式，评估不要求实时返回）
+        
+        回答索引或响应缓存中已有的评估直接复用；其余请求写入批处理JSONL文件提交到 /v1/batches，完成后按custom_id合并。
+        批处理失败、被截断或内容为空的条目不在返回结果中，由调用方回退到evaluate_answer同步评估。
         
+        Args:
+            items: {custom_id: evaluate_answer的参数字典（ai_answer、judge_decision、question、case_text）}
+            
+        Returns:
+            {custom_id: 评分结果字典（格式见evaluate_answer）}
+        """
+        client = getattr(self.api, 'api', self.api)  # UnifiedAIAPI包装的底层客户端
+        use_thinking = self._use_thinking()
+        
+        results = {}
+        pending = {}  # custom_id -> (缓存键, 请求体)
+        index_keys = {}  # custom_id -> 回答索引中的评估键
+        for custom_id, kwargs in items.items():
+            index_keys[custom_id] = self._evaluation_key(kwargs['ai_answer'], kwargs.get('judge_decision', ''),
+                                                         kwargs['question'], kwargs.get('case_text', ''))
+            evaluation = answer_index.get_evaluation(index_keys[custom_id])
+            if evaluation is not None:
+                results[custom_id] = evaluation
+                continue
+            prompt = self._build_evaluation_prompt(kwargs['ai_answer'], kwargs.get('judge_decision', ''),
+                                                   kwargs['question'], kwargs.get('case_text', ''))
+            # 与analyze_case相同的消息和参数，批处理结果与同步评估共用响应缓存
+            messages = build_analyze_case_messages(prompt, None)
+            payload = client._build_payload(messages, 0.3, 3000, use_thinking=use_thinking)
+            cache_key = response_cache.make_key(client.provider, payload, use_thinking)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                results[custom_id] = self._build_evaluation_result(get_response_text(cached))
+                self._index_evaluation(index_keys[custom_id], results[custom_id])
+            else:
+                pending[custom_id] = (cache_key, payload)
+        
+        if not pending:
+            return results
+        
+        print(f"[批处理评估] 共 {len(items)} 个评估，缓存命中 {len(results)} 个，提交批处理 {len(pending)} 个", flush=True)
+        lines = [build_request_line(custom_id, payload) for custom_id, (_, payload) in pending.items()]
+        try:
+            responses = BatchAPIClient.for_api(client).run(lines, metadata={'stage': 'evaluation'})
+        except (BatchError, requests.exceptions.RequestException) as e:
+            print(f"[批处理评估] 批处理失败，{len(pending)} 个评估将回退到同步调用: {str(e)}", flush=True)
+            return results
+        
+        for custom_id, (cache_key, payload) in pending.items():
+            response = responses.get(custom_id)
+            if not response or 'error' in response or is_truncated(response):
+                continue
+            evaluation_response = get_response_text(response)
+            if not evaluation_response['answer'].strip():
+                continue
+            if 'usage' in response:
+                try:
+                    from utils.token_tracker import token_tracker
+                    token_tracker.record_usage(response['usage'], api_type='batch')
+                except Exception:
+                    pass
+            response_cache.set(cache_key, response, client.provider, payload.get('model', ''))
+            results[custom_id] = self._build_evaluation_result(evaluation_response)
+            self._index_evaluation(index_keys[custom_id], results[custom_id])
+        
+        missing = len(items) - len(results)
+        if missing:
+            print(f"[批处理评估] {missing} 个评估未从批处理获得有效结果，将回退到同步调用", flush=True)
+        return results
+    
+    def get_judge_id(self) -> str:
+        """评估模型标识（提供商:模型，使用thinking模式时附加:thinking），回答索引中的评估按评估模型区分"""
+        client = getattr(self.api, 'api', self.api)  # UnifiedAIAPI包装的底层客户端
+        judge_id = f"{getattr(client, 'provider', type(client).__name__)}:{getattr(client, 'model', '') or 'default'}"
+        return judge_id + ':thinking' if self._use_thinking() else judge_id
+    
+    def _evaluation_key(self, ai_answer: str, judge_decision: str, question: str, case_text: str) -> str:
+        """回答索引中的评估键（回答、参考判决、问题、案例、评估模型和评分量表版本）"""
+        return answer_index.make_evaluation_key(ai_answer, question, judge_decision, case_text, self.get_judge_id(), RUBRIC_VERSION)
+    
+    def _index_evaluation(self, index_key: str, evaluation: Dict):
+        """将评估结果记入回答索引（评价文本为空的结果不记录，下次重新评估）"""
+        if (evaluation.get('详细评价') or '').strip():
+            answer_index.set_evaluation(index_key, evaluation, self.get_judge_id(), RUBRIC_VERSION)
+    
+    def _build_evaluation_result(self, evaluation_response) -> Dict:
+        """
+        根据评分API的响应计算各维度得分、错误标记和总分
+        
+        Args:
+            evaluation_response: 评分API返回的结果（包含'answer'和'thinking'的字典或纯文本）
+            
+        Returns:
+            评分结果字典（格式见evaluate_answer）
+        """
         # 提取评价文本和thinking内容
         if isinstance(evaluation_response, dict):
             evaluation_result = evaluation_response.get('answer', '')
@@ -166,33 +312,33 @@ class AnswerEvaluator:
         Returns:
             包含'evaluation'和'thinking'的字典
         """
+        prompt = self._build_evaluation_prompt(ai_answer, judge_decision, question, case_text)
+        
+        # 对于GPT-4o等不支持thinking的API，use_thinking会被忽略
+        with telemetry_context(stage=STAGE_EVALUATE):
+            response = self.api.analyze_case(prompt, question=None, use_thinking=self._use_thinking())
+        return response
+    
+    def _build_evaluation_prompt(self, ai_answer: str, judge_decision: str, question: str, case_text: str) -> str:
+        """
+        构建评分prompt（直接与整个法官判决对比）
+        
+        静态内容在前、变化内容在后：评分标准（所有案例相同）→ 法官判决和案例内容（同一案例的所有问题、所有模型相同）
+        → 要求和输出格式 → 问题和AI回答。这样同一案例的多次评估共享尽可能长的前缀，可以命中提供商的前缀缓存。
+        
+        Args:
+            ai_answer: AI回答
+            judge_decision: 整个法官判决（作为参考标准）
+            question: 问题
+            case_text: 案例文本
+            
+        Returns:
+            评分prompt文本
+        """
         # 构建评分prompt
         criteria_text = self._format_criteria()
         
-        # 如果没有judge_decision，使用基于标准的独立评分
-        if not judge_decision or judge_decision.strip() == '':
-            prompt = f"""请根据《大陆法系演绎推理与价值衡量评分量表（Rubric v1.0）》，对AI回答进行评分。
-
-问题：
-{question}
-
-AI回答：
-{ai_answer}
-
-案例内容（供参考）：
-{case_text[:3000] if case_text else '无'}
-
-评分标准：
-{criteria_text}
-
-要求：
-1. 基于评分标准和案例内容，评估AI回答的质量（注：本案例暂无参考法官判决）
-2. 对每个维度给出0-4分的整数评分（**重要：请根据质量直接给出原始分数，不要考虑错误惩罚，错误惩罚将由系统根据错误标记自动应用**）
-3. 给出详细的评分理由，说明为什么给这个分数，分析AI回答的优点和不足
-4. 检查是否存在错误，并按照严重程度分类为：微小错误、明显错误、重大错误（**重要：错误标记仅用于系统自动扣分，不影响你给出的原始质量分数**）
-5. 在没有参考答案的情况下，重点评估：规范依据的准确性、推理链条的完整性、价值衡量的合理性、事实覆盖的全面性、结论的逻辑自洽性
-
-请严格按照以下格式输出：
+        output_format = """请严格按照以下格式输出：
 【规范依据相关性】得分：X分
 理由：...
 
@@ -211,55 +357,63 @@ AI回答：
 【错误标记】（如有，请按严重程度分类）：
 - 微小错误：...（轻微问题，不影响核心判断，如表述不够精确、细节遗漏等）
 - 明显错误：...（明显问题，影响部分判断，如关键规范缺失、事实误读等）
-- 重大错误：...（严重问题，如受害者责备、编造事实、伦理不可接受等）
-"""
-        else:
-            # 有judge_decision的情况
-            prompt = f"""请根据《大陆法系演绎推理与价值衡量评分量表（Rubric v1.0）》，对AI回答进行评分。
+- 重大错误：...（严重问题，如受害者责备、编造事实、伦理不可接受等）"""
+        
+        # 如果没有judge_decision，使用基于标准的独立评分
+        if not judge_decision or judge_decision.strip() == '':
+            prompt = f"""请根据《大陆法系演绎推理与价值衡量评分量表（Rubric v1.0）》，对文末的AI回答进行评分。
+
+评分标准：
+{criteria_text}
+
+案例内容（供参考）：
+{case_text[:3000] if case_text else '无'}
+
+要求：
+1. 基于评分标准和案例内容，评估AI回答的质量（注：本案例暂无参考法官判决）
+2. 对每个维度给出0-4分的整数评分（**重要：请根据质量直接给出原始分数，不要考虑错误惩罚，错误惩罚将由系统根据错误标记自动应用**）
+3. 给出详细的评分理由，说明为什么给这个分数，分析AI回答的优点和不足
+4. 检查是否存在错误，并按照严重程度分类为：微小错误、明显错误、重大错误（**重要：错误标记仅用于系统自动扣分，不影响你给出的原始质量分数**）
+5. 在没有参考答案的情况下，重点评估：规范依据的准确性、推理链条的完整性、价值衡量的合理性、事实覆盖的全面性、结论的逻辑自洽性
+
+{output_format}
 
 问题：
 {question}
 
 AI回答：
 {ai_answer}
+"""
+        else:
+            # 有judge_decision的情况
+            prompt = f"""请根据《大陆法系演绎推理与价值衡量评分量表（Rubric v1.0）》，对文末的AI回答进行评分。
+
+评分标准：
+{criteria_text}
 
 法官判决（参考标准，整个判决书内容）：
 {judge_decision}
 
 {('案例内容（供参考）：' + chr(10) + case_text[:2000] + chr(10)) if case_text else ''}
-
-评分标准：
-{criteria_text}
-
 要求：
 1. 将AI回答与整个法官判决进行对比，评估AI回答的质量
 2. 对每个维度给出0-4分的整数评分（**重要：请根据质量直接给出原始分数，不要考虑错误惩罚，错误惩罚将由系统根据错误标记自动应用**）
 3. 给出详细的评分理由，说明为什么给这个分数，并说明AI回答与法官判决的对比情况
 4. 检查是否存在错误，并按照严重程度分类为：微小错误、明显错误、重大错误（**重要：错误标记仅用于系统自动扣分，不影响你给出的原始质量分数**）
 
-请严格按照以下格式输出：
-【规范依据相关性】得分：X分
-理由：...
-
-【涵摄链条对齐度】得分：X分
-理由：...
-
-【价值衡量与同理心对齐度】得分：X分
-理由：...
-
-【关键事实与争点覆盖度】得分：X分
-理由：...
+{output_format}
 
-【裁判结论与救济配置一致性】得分：X分
-理由：...
+问题：
+{question}
 
-【错误标记】（如有，请按严重程度分类）：
-- 微小错误：...（轻微问题，不影响核心判断，如表述不够精确、细节遗漏等）
-- 明显错误：...（明显问题，影响部分判断，如关键规范缺失、事实误读等）
-- 重大错误：...（严重问题，如受害者责备、编造事实、伦理不可接受等）
+AI回答：
+{ai_answer}
 """
         
-        # 调用API（评估始终使用thinking模式，因为评估使用的是DeepSeek API）
+        return prompt
+    
+    def _use_thinking(self) -> bool:
+        """评估始终使用thinking模式（当评估API是DeepSeek时）"""
         # 检查API是否是DeepSeek API，如果是则使用thinking模式
         use_thinking = False
         if hasattr(self.api, 'provider'):
@@ -271,10 +425,7 @@ AI回答：
         elif type(self.api).__name__ == 'DeepSeekAPI':
             # 直接是DeepSeekAPI
             use_thinking = True
-        
-        # 对于GPT-4o等不支持thinking的API，use_thinking会被忽略
-        response = self.api.analyze_case(prompt, question=None, use_thinking=use_thinking)
-        return response
+        return use_thinking
     
     def _format_criteria(self) -> str:
         """格式化评分标准为文本"""
@@ -0,0 +1,69 @@
+"""
+Excel读取缓存模块
+--use_ds_questions 等输入的结果工作簿较大（长文本单元格），每次启动都用openpyxl解析要几十秒、占用数百MB内存。
+首次读取后把DataFrame以pickle保存到缓存目录，以（文件路径, 修改时间, 大小, 读取参数）为键：
+- 文件未变化时后续启动直接加载pickle（毫秒级），并行启动的多个模型进程不再各自重复解析
+- 文件被修改或替换后键随之变化，自动重新解析；同一文件的旧缓存在写入新缓存时删除
+"""
+import os
+import glob
+import json
+import hashlib
+from config import EXCEL_CACHE_DIR, EXCEL_CACHE_ENABLED
+
+
+def _cache_prefix(path: str) -> str:
+    """同一文件的所有缓存共用的文件名前缀（按绝对路径）"""
+    return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+
+
+def _cache_path(path: str, read_kwargs: dict, cache_dir: str) -> str:
+    """缓存文件路径：路径前缀 + 修改时间 + 大小 + 读取参数"""
+    stat = os.stat(path)
+    params = hashlib.sha1(json.dumps(read_kwargs, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{_cache_prefix(path)}_{stat.st_mtime_ns}_{stat.st_size}_{params}.pkl")
+
+
+def read_excel_cached(path: str, cache_dir: str = None, **read_kwargs):
+    """
+    读取Excel为DataFrame（文件未变化时使用缓存）
+
+    Args:
+        path: Excel文件路径
+        cache_dir: 缓存目录，默认从config读取
+        **read_kwargs: 传给 pd.read_excel 的参数（参与缓存键）
+
+    Returns:
+        DataFrame（调用方可以修改，不影响缓存）
+    """
+    import pandas as pd
+
+    if not EXCEL_CACHE_ENABLED:
+        return pd.read_excel(path, **read_kwargs)
+
+    cache_dir = cache_dir or EXCEL_CACHE_DIR
+    cache_file = _cache_path(path, read_kwargs, cache_dir)
+    if os.path.exists(cache_file):
+        try:
+            return pd.read_pickle(cache_file)
+        except Exception as e:
+            print(f"[Excel缓存] 读取缓存失败，重新解析: {str(e)}", flush=True)
+
+    df = pd.read_excel(path, **read_kwargs)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 先写临时文件再替换，并行启动的进程不会读到写了一半的缓存
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        df.to_pickle(tmp_file)
+        os.replace(tmp_file, cache_file)
+        # 删除该文件旧版本的缓存（修改时间或大小不同），保留当前版本其他读取参数的缓存
+        current_version = cache_file.rsplit('_', 1)[0] + '_'
+        for stale in glob.glob(os.path.join(cache_dir, _cache_prefix(path) + '_*.pkl')):
+            if not stale.startswith(current_version):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+    except Exception as e:
+        print(f"[Excel缓存] 写入缓存失败: {str(e)}", flush=True)
+    return df
@@ -8,6 +8,7 @@ from datetime import datetime
 from typing import List, Dict
 from config import RESULTS_DIR
 from utils.data_masking import DataMaskerAPI
+from utils.lazy import LazyInstance
 
 
 class ExcelExporter:
@@ -418,6 +419,6 @@ class ExcelExporter:
         return filepath
 
 
-# 创建全局实例
-excel_exporter = ExcelExporter()
+# 创建全局实例（首次使用时才初始化）
+excel_exporter = LazyInstance(ExcelExporter)
 
@@ -0,0 +1,253 @@
+"""
+请求对冲模块
+对长尾请求发起一次重复请求：调用耗时超过该（提供商, 模型）近期延迟的p95后，
+再并行发出一份相同请求，取先完成的结果并取消另一个；对冲比例有上限，避免成倍增加费用
+"""
+import inspect
+import time
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+from collections import deque
+from typing import Dict, List, Optional
+from config import HEDGING_ENABLED, HEDGE_PERCENTILE, HEDGE_MAX_RATE, HEDGE_MIN_SAMPLES
+from utils.concurrency import RequestCancelled
+from utils.streaming import stream_kwargs
+
+
+class HedgeController:
+    """单个（提供商, 模型）的对冲控制器：维护滚动延迟窗口和对冲比例"""
+
+    def __init__(self, name: str, percentile: float = None, max_rate: float = None, min_samples: int = None):
+        """
+        初始化对冲控制器
+
+        Args:
+            name: 控制器名称（用于日志显示）
+            percentile: 触发对冲的延迟百分位，默认从config读取
+            max_rate: 对冲请求占全部请求的最大比例，默认从config读取
+            min_samples: 开始对冲前至少需要的延迟样本数，默认从config读取
+        """
+        self.name = name
+        self.percentile = percentile or HEDGE_PERCENTILE
+        self.max_rate = HEDGE_MAX_RATE if max_rate is None else max_rate
+        self.min_samples = min_samples or HEDGE_MIN_SAMPLES
+
+        self.latencies = deque(maxlen=200)
+        self.stats = {'requests': 0, 'hedges': 0, 'hedge_wins': 0}
+        self._lock = threading.Lock()
+
+    def get_threshold(self) -> Optional[float]:
+        """获取触发对冲的延迟阈值（样本不足时返回None，表示不对冲）"""
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            ordered = sorted(self.latencies)
+            return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    def record(self, latency: float):
+        """记录一次完成请求的延迟"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.stats['requests'] += 1
+
+    def allow_hedge(self) -> bool:
+        """判断是否还有对冲额度（对冲数不超过请求数 × max_rate），有则占用一次"""
+        with self._lock:
+            if self.stats['hedges'] + 1 > self.max_rate * max(self.stats['requests'], 1):
+                return False
+            self.stats['hedges'] += 1
+            return True
+
+    def record_hedge_win(self):
+        """记录一次对冲请求先于原请求完成"""
+        with self._lock:
+            self.stats['hedge_wins'] += 1
+
+
+# 控制器注册表：按（提供商, 模型）共享
+_controllers: Dict[str, HedgeController] = {}
+_controllers_lock = threading.Lock()
+_enabled = HEDGING_ENABLED
+
+
+def set_hedging_enabled(enabled: bool):
+    """启用或关闭请求对冲（如process_cases.py的--hedge参数）"""
+    global _enabled
+    _enabled = enabled
+
+
+def get_hedge_controller(provider: str, model: str) -> HedgeController:
+    """获取（提供商, 模型）对应的共享对冲控制器"""
+    name = f'{provider}/{model}'
+    with _controllers_lock:
+        controller = _controllers.get(name)
+        if controller is None:
+            controller = HedgeController(name)
+            _controllers[name] = controller
+        return controller
+
+
+def _get_controller_for(api, messages: List[Dict], kwargs: Dict) -> HedgeController:
+    """根据请求参数确定对冲控制器（DeepSeek的thinking模式使用不同模型，延迟分布也不同）"""
+    payload = api._build_payload(messages, kwargs.get('temperature', 0.7), kwargs.get('max_tokens', 2000),
+                                 use_thinking=kwargs.get('use_thinking', False))
+    return get_hedge_controller(api.provider, payload.get('model', ''))
+
+
+def hedged_request(api, messages: List[Dict], **kwargs) -> Optional[Dict]:
+    """
+    发送可对冲的请求（同步客户端使用）
+
+    支持流式的客户端（DeepSeekAPI、UnifiedModelAPI）以流式发送，落后的请求会在下一个数据块到达时中止；
+    不支持流式的客户端落后的请求会在后台完成后被丢弃。未对冲的请求在启用流式（--stream）时同样以流式发送
+
+    Args:
+        api: 客户端实例
+        messages: 消息列表
+        **kwargs: 透传给api._make_request的参数
+
+    Returns:
+        先完成的请求结果
+    """
+    if not _enabled:
+        return api._make_request(messages, **stream_kwargs(api), **kwargs)
+
+    controller = _get_controller_for(api, messages, kwargs)
+    threshold = controller.get_threshold()
+    if threshold is None:
+        # 样本不足：正常请求并记录延迟
+        start_time = time.time()
+        result = api._make_request(messages, **stream_kwargs(api), **kwargs)
+        controller.record(time.time() - start_time)
+        return result
+
+    cancellable = 'stream' in inspect.signature(api._make_request).parameters
+
+    def start(cancel_event: threading.Event) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        call_kwargs = dict(kwargs)
+        if cancellable:
+            def on_delta(kind, text):
+                if cancel_event.is_set():
+                    raise RequestCancelled('对冲请求已由另一请求完成，中止')
+            call_kwargs.update(stream=True, on_delta=on_delta)
+
+        def run():
+            start_time = time.time()
+            try:
+                result = api._make_request(messages, **call_kwargs)
+                future.set_result((result, time.time() - start_time))
+            except BaseException as e:
+                future.set_exception(e)
+
+        # 在调用方的上下文中运行（保留请求优先级等上下文变量）
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True).start()
+        return future
+
+    primary_cancel = threading.Event()
+    primary = start(primary_cancel)
+    done, _ = concurrent.futures.wait([primary], timeout=threshold)
+    if done or not controller.allow_hedge():
+        result, latency = primary.result()
+        controller.record(latency)
+        return result
+
+    print(f"[请求对冲] {controller.name} 请求超过p{int(controller.percentile * 100)}延迟（{threshold:.1f}秒），发出对冲请求", flush=True)
+    hedge_cancel = threading.Event()
+    hedge = start(hedge_cancel)
+    pending = {primary: primary_cancel, hedge: hedge_cancel}
+    last_error = None
+    while pending:
+        done, _ = concurrent.futures.wait(list(pending), return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            pending.pop(future)
+            try:
+                result, latency = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            # 取先成功完成的结果，取消另一个请求
+            for cancel_event in pending.values():
+                cancel_event.set()
+            if future is hedge:
+                controller.record_hedge_win()
+            controller.record(latency)
+            return result
+    raise last_error
+
+
+async def hedged_request_async(async_client, messages: List[Dict], **kwargs) -> Optional[Dict]:
+    """
+    发送可对冲的请求（异步客户端使用，落后的请求直接取消）
+
+    Args:
+        async_client: AsyncAPIClient实例
+        messages: 消息列表
+        **kwargs: 透传给async_client._make_request的参数
+
+    Returns:
+        先完成的请求结果
+    """
+    if not _enabled:
+        return await async_client._make_request(messages, **kwargs)
+
+    controller = _get_controller_for(async_client.api, messages, kwargs)
+    threshold = controller.get_threshold()
+
+    async def timed():
+        start_time = time.time()
+        result = await async_client._make_request(messages, **kwargs)
+        return result, time.time() - start_time
+
+    if threshold is None:
+        result, latency = await timed()
+        controller.record(latency)
+        return result
+
+    primary = asyncio.ensure_future(timed())
+    done, _ = await asyncio.wait([primary], timeout=threshold)
+    if done or not controller.allow_hedge():
+        result, latency = await primary
+        controller.record(latency)
+        return result
+
+    print(f"[请求对冲] {controller.name} 请求超过p{int(controller.percentile * 100)}延迟（{threshold:.1f}秒），发出对冲请求", flush=True)
+    hedge = asyncio.ensure_future(timed())
+    pending = {primary, hedge}
+    last_error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    result, latency = task.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if task is hedge:
+                    controller.record_hedge_win()
+                controller.record(latency)
+                return result
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def get_all_hedge_stats() -> Dict[str, Dict]:
+    """获取所有对冲控制器的统计"""
+    with _controllers_lock:
+        controllers = list(_controllers.items())
+    return {name: controller.stats.copy() for name, controller in controllers}
+
+
+def print_hedge_summary():
+    """打印对冲统计（仅在启用且发生过对冲时）"""
+    if not _enabled:
+        return
+    for name, stats in get_all_hedge_stats().items():
+        if stats['hedges']:
+            print(f"[请求对冲] {name}: 请求数 {stats['requests']}, 对冲次数 {stats['hedges']}, "
+                  f"对冲先完成 {stats['hedge_wins']} 次", flush=True)
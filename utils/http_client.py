@@ -0,0 +1,114 @@
+"""
+HTTP连接池模块
+为所有LLM客户端提供进程级共享的requests.Session（keep-alive连接池），
+避免每次调用都重新建立TCP+TLS连接；异步模式下提供按事件循环共享的aiohttp会话
+"""
+import asyncio
+import threading
+from typing import Dict
+import requests
+from requests.adapters import HTTPAdapter
+from config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, ASYNC_MAX_IN_FLIGHT
+
+# aiohttp为可选依赖（仅异步模式需要）
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+
+class HTTPClientRegistry:
+    """进程级HTTP客户端注册表（按提供商共享连接池）"""
+
+    def __init__(self, pool_connections: int = None, pool_maxsize: int = None):
+        """
+        初始化注册表
+
+        Args:
+            pool_connections: 每个Session缓存的主机连接池数量，默认从config读取
+            pool_maxsize: 每个主机连接池的最大连接数，默认从config读取（覆盖同步流水线各阶段的工作线程总数）
+        """
+        self.pool_connections = pool_connections or HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or HTTP_POOL_MAXSIZE
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        """创建带连接池的Session（重试由各客户端自行处理，这里不做自动重试）"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=False,
+            max_retries=0
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def get_session(self, provider: str) -> requests.Session:
+        """
+        获取指定提供商的共享Session（不存在则创建）
+
+        Args:
+            provider: 提供商名称（如 'deepseek'、'openai'、'qwen'）
+
+        Returns:
+            共享的requests.Session实例
+        """
+        session = self._sessions.get(provider)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(provider)
+            if session is None:
+                session = self._create_session()
+                self._sessions[provider] = session
+            return session
+
+    def close_all(self):
+        """关闭所有Session，释放连接"""
+        with self._lock:
+            for session in self._sessions.values():
+                try:
+                    session.close()
+                except Exception:
+                    pass
+            self._sessions.clear()
+
+
+# 全局实例
+http_client_registry = HTTPClientRegistry()
+
+
+def get_session(provider: str) -> requests.Session:
+    """获取指定提供商的共享Session"""
+    return http_client_registry.get_session(provider)
+
+
+# 异步会话：每个事件循环一个aiohttp.ClientSession（连接数上限即最大在途请求数）
+_async_sessions: Dict[asyncio.AbstractEventLoop, 'aiohttp.ClientSession'] = {}
+
+
+def get_async_session() -> 'aiohttp.ClientSession':
+    """获取当前事件循环共享的aiohttp会话（必须在事件循环内调用）"""
+    if not HAS_AIOHTTP:
+        raise ImportError("异步模式需要aiohttp，请运行: pip install aiohttp")
+
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=ASYNC_MAX_IN_FLIGHT, limit_per_host=ASYNC_MAX_IN_FLIGHT)
+        session = aiohttp.ClientSession(connector=connector)
+        _async_sessions[loop] = session
+    return session
+
+
+async def close_async_session():
+    """关闭当前事件循环的aiohttp会话"""
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
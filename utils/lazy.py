@@ -0,0 +1,53 @@
+"""
+延迟初始化模块
+全局实例在首次使用时才创建：导入模块时不再构建API客户端（及其打印、连接池和限流器）、
+读取token统计文件或加载案例库，脚本启动和只用到部分功能的进程不再为用不到的单例付出开销
+"""
+import threading
+from typing import Any, Callable
+
+
+class LazyInstance:
+    """
+    全局实例的延迟代理
+
+    首次访问属性时调用factory创建实例（线程安全，只创建一次），之后的属性读写都转发给该实例，
+    因此 `from utils.ai_api import ai_api` 等现有用法无需修改。
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        """
+        Args:
+            factory: 创建实例的无参函数或类
+        """
+        object.__setattr__(self, '_lazy_factory', factory)
+        object.__setattr__(self, '_lazy_instance', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+
+    def _lazy_get(self) -> Any:
+        """获取（必要时创建）被代理的实例"""
+        instance = object.__getattribute__(self, '_lazy_instance')
+        if instance is None:
+            with object.__getattribute__(self, '_lazy_lock'):
+                instance = object.__getattribute__(self, '_lazy_instance')
+                if instance is None:
+                    instance = object.__getattribute__(self, '_lazy_factory')()
+                    object.__setattr__(self, '_lazy_instance', instance)
+        return instance
+
+    @property
+    def is_initialized(self) -> bool:
+        """实例是否已经创建"""
+        return object.__getattribute__(self, '_lazy_instance') is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_get(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._lazy_get(), name, value)
+
+    def __repr__(self) -> str:
+        if self.is_initialized:
+            return repr(self._lazy_get())
+        factory = object.__getattribute__(self, '_lazy_factory')
+        return f"<LazyInstance {getattr(factory, '__name__', factory)} (未初始化)>"
@@ -0,0 +1,72 @@
+"""
+多问题合并回答模块
+同一案例的所有问题在一次调用中回答：案例文本只发送一次，模型以JSON返回各问题的回答，
+再按问题编号拆分回逐题结果（长判决书的输入token不再随问题数量成倍增加）
+"""
+import inspect
+from typing import Dict, List, Optional
+from utils.prompts import ANALYZE_CASE_TEMPERATURE, ANALYZE_CASE_MAX_TOKENS, build_analyze_questions_messages, parse_question_answers
+from utils.streaming import stream_kwargs
+
+# 每个问题的输出token预算（与单问题analyze_case的max_tokens一致），总量不超过16000
+MAX_TOKENS_PER_QUESTION = ANALYZE_CASE_MAX_TOKENS
+MAX_TOKENS_TOTAL = 16000
+
+
+def _max_tokens_for(num_questions: int) -> int:
+    return min(MAX_TOKENS_PER_QUESTION * num_questions, MAX_TOKENS_TOTAL)
+
+
+def _split_response(response: Optional[Dict], num_questions: int) -> List[Optional[Dict[str, str]]]:
+    """将合并回答的响应拆分为逐题的 {'answer', 'thinking'}（thinking为整次调用的推理内容，各题共用）"""
+    if not response or not response.get('choices'):
+        return [None] * num_questions
+    choice = response['choices'][0]
+    message = choice.get('message') or {}
+    thinking = message.get('reasoning_content') or choice.get('reasoning_content') or ''
+    answers = parse_question_answers(message.get('content') or '', num_questions)
+    parsed = sum(1 for a in answers if a)
+    if parsed < num_questions:
+        print(f"[多问题回答] 仅解析出 {parsed}/{num_questions} 个回答，其余问题将单独回答", flush=True)
+    return [{'answer': answer, 'thinking': thinking} if answer else None for answer in answers]
+
+
+def analyze_questions(api, case_text: str, questions: List[str], use_thinking: bool = True) -> List[Optional[Dict[str, str]]]:
+    """
+    在一次调用中回答同一案例的所有问题（同步客户端使用）
+
+    Args:
+        api: 客户端实例（UnifiedAIAPI、DeepSeekAPI、UnifiedModelAPI或QwenAPI）
+        case_text: 案例文本
+        questions: 问题列表
+        use_thinking: 是否使用thinking模式（仅DeepSeek支持，其他客户端忽略）
+
+    Returns:
+        按问题顺序排列的 {'answer', 'thinking'} 列表，未能解析出回答的问题为None（由调用方单独回答）
+    """
+    client = getattr(api, 'api', api)  # UnifiedAIAPI包装的底层客户端
+    kwargs = {'use_thinking': use_thinking} if 'use_thinking' in inspect.signature(client._make_request).parameters else {}
+    kwargs.update(stream_kwargs(client))
+    messages = build_analyze_questions_messages(case_text, questions)
+    print(f"[多问题回答] 一次调用回答 {len(questions)} 个问题，案例文本长度: {len(case_text)} 字符", flush=True)
+    response = client._make_request(messages, temperature=ANALYZE_CASE_TEMPERATURE, max_tokens=_max_tokens_for(len(questions)), **kwargs)
+    return _split_response(response, len(questions))
+
+
+async def analyze_questions_async(client, case_text: str, questions: List[str], use_thinking: bool = True) -> List[Optional[Dict[str, str]]]:
+    """
+    在一次调用中回答同一案例的所有问题（异步版本，用于--async模式）
+
+    Args:
+        client: AsyncAPIClient实例
+        case_text: 案例文本
+        questions: 问题列表
+        use_thinking: 是否使用thinking模式（仅DeepSeek支持）
+
+    Returns:
+        按问题顺序排列的 {'answer', 'thinking'} 列表，未能解析出回答的问题为None
+    """
+    messages = build_analyze_questions_messages(case_text, questions)
+    response = await client._make_request(messages, temperature=ANALYZE_CASE_TEMPERATURE, max_tokens=_max_tokens_for(len(questions)),
+                                          use_thinking=use_thinking and client.supports_thinking)
+    return _split_response(response, len(questions))
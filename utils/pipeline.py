@@ -0,0 +1,158 @@
+"""
+分阶段流水线模块
+将批量处理拆分为若干阶段（如 脱敏 → 生成问题 → 生成回答 → 评估），每个阶段有独立的有界输入队列和工作线程数：
+- 一个条目完成某阶段后立即进入下一阶段，前面案例的评估与后面案例的回答生成重叠进行，
+  回答模型和评估模型的配额同时被利用，而不是按案例串行地等待
+- 有界队列提供背压：下游阶段积压时上游阶段暂停，不会一次性把所有案例推进内存
+- 各阶段的线程数互不占用，某一阶段变慢不会让其他阶段无线程可用
+- 条目可以用Routed发往指定名称的阶段（如按模型分到各自的回答阶段，每个模型独立的线程预算）
+"""
+import sys
+import time
+import queue
+import threading
+import traceback
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_STOP = object()
+
+
+class Routed:
+    """发往指定阶段的条目（处理函数返回Routed时不走默认的下游阶段）"""
+
+    def __init__(self, stage_name: str, item: Any):
+        self.stage_name = stage_name
+        self.item = item
+
+
+class Stage:
+    """流水线的一个阶段"""
+
+    def __init__(self, name: str, handler: Callable[[Any], Optional[Iterable[Any]]], workers: int, queue_size: int = 0,
+                 next_stage: str = None):
+        """
+        Args:
+            name: 阶段名称（用于日志、统计和Routed路由）
+            handler: 处理函数，接收一个条目，返回交给下游阶段的条目（可迭代对象，None或空表示不再向下传递）
+            workers: 工作线程数
+            queue_size: 输入队列容量（0表示工作线程数的2倍）
+            next_stage: 默认下游阶段的名称（不指定则为列表中的下一个阶段）
+        """
+        self.name = name
+        self.handler = handler
+        self.next_stage = next_stage
+        self.workers = max(1, int(workers))
+        self.queue = queue.Queue(maxsize=queue_size or self.workers * 2)
+        self._stats_lock = threading.Lock()
+        self.stats = {'processed': 0, 'errors': 0, 'busy_seconds': 0.0, 'max_backlog': 0}
+
+    def _record(self, elapsed: float, error: bool):
+        with self._stats_lock:
+            self.stats['processed'] += 1
+            self.stats['busy_seconds'] += elapsed
+            if error:
+                self.stats['errors'] += 1
+            self.stats['max_backlog'] = max(self.stats['max_backlog'], self.queue.qsize())
+
+
+class StagePipeline:
+    """
+    分阶段流水线
+
+    用法：
+        pipeline = StagePipeline([
+            Stage('mask', mask_case, workers=8),
+            Stage('answer', answer_question, workers=50),
+        ])
+        pipeline.run(items)
+    """
+
+    def __init__(self, stages: List[Stage]):
+        """
+        Args:
+            stages: 按顺序排列的阶段列表（最后一个阶段的返回值被丢弃，各阶段之间不能形成环）
+        """
+        self.stages = stages
+        self._by_name = {stage.name: stage for stage in stages}
+        self._pending = 0  # 已进入流水线、尚未处理完的条目数
+        self._condition = threading.Condition()
+
+    def _submit(self, stage: Stage, item: Any):
+        """将条目放入阶段的输入队列（队列满时阻塞，形成背压）"""
+        with self._condition:
+            self._pending += 1
+        stage.queue.put(item)
+
+    def _downstream(self, index: int, output: Any):
+        """确定输出条目的目标阶段，返回（阶段, 条目），最后一个阶段的默认输出返回（None, None）"""
+        if isinstance(output, Routed):
+            return self._by_name[output.stage_name], output.item
+        stage = self.stages[index]
+        if stage.next_stage:
+            return self._by_name[stage.next_stage], output
+        if index == len(self.stages) - 1:
+            return None, None
+        return self.stages[index + 1], output
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                break
+            start_time = time.time()
+            error = False
+            try:
+                outputs = stage.handler(item)
+                # 下游条目在本条目计数减少之前提交，保证待处理计数不会提前归零
+                for output in outputs or ():
+                    target, next_item = self._downstream(index, output)
+                    if target is not None:
+                        self._submit(target, next_item)
+            except Exception as e:
+                error = True
+                print(f"[流水线] 阶段 {stage.name} 处理异常: {str(e)}", flush=True)
+                traceback.print_exc(file=sys.stdout)
+            finally:
+                stage._record(time.time() - start_time, error)
+                with self._condition:
+                    self._pending -= 1
+                    if self._pending == 0:
+                        self._condition.notify_all()
+
+    def run(self, items: Iterable[Any]):
+        """
+        将条目送入第一个阶段，阻塞直到所有条目流经全部阶段
+
+        Args:
+            items: 第一个阶段的输入条目
+        """
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for i in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(index,), name=f"pipeline-{stage.name}-{i}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        for item in items:
+            self._submit(self.stages[0], item)
+
+        with self._condition:
+            while self._pending > 0:
+                self._condition.wait(timeout=1.0)  # 带超时等待，保证主线程能及时响应Ctrl-C
+
+        for stage in self.stages:
+            for _ in range(stage.workers):
+                stage.queue.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """获取各阶段的统计：处理条目数、异常数、累计处理耗时、最大积压"""
+        return {stage.name: dict(stage.stats, workers=stage.workers) for stage in self.stages}
+
+    def print_summary(self):
+        """打印各阶段统计（累计耗时占比高、积压大的阶段即瓶颈）"""
+        for name, stats in self.get_stats().items():
+            print(f"[流水线] {name}: 工作线程 {stats['workers']}, 处理 {stats['processed']} 个, 异常 {stats['errors']} 个, "
+                  f"累计耗时 {stats['busy_seconds']:.1f}秒, 最大积压 {stats['max_backlog']}", flush=True)
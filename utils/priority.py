@@ -0,0 +1,54 @@
+"""
+请求优先级模块
+网页端的交互式请求（用户点击生成回答、评估等）与批量请求（/api/analyze_batch、process_cases.py）共用同一提供商配额。
+交互式请求在速率限制器和并发控制器处排队时优先于排队中的批量请求获得配额，但不突破共享的速率和并发限制：
+- 优先级通过contextvars传递，在同一线程（或asyncio任务）内发出的所有API请求都继承调用方的优先级
+- 未标记的请求默认为批量优先级
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BATCH = 'batch'
+
+_current_priority = contextvars.ContextVar('request_priority', default=PRIORITY_BATCH)
+
+
+def get_request_priority() -> str:
+    """获取当前上下文的请求优先级（'interactive' 或 'batch'）"""
+    return _current_priority.get()
+
+
+def is_interactive(priority: str = None) -> bool:
+    """
+    判断是否为交互式优先级
+
+    Args:
+        priority: 优先级，不提供则使用当前上下文的优先级
+    """
+    return (priority or _current_priority.get()) == PRIORITY_INTERACTIVE
+
+
+@contextmanager
+def request_priority(priority: str):
+    """
+    在with块内以指定优先级发出API请求
+
+    Args:
+        priority: PRIORITY_INTERACTIVE 或 PRIORITY_BATCH
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def interactive(func):
+    """装饰器：函数内发出的API请求按交互式优先级排队（用于Flask路由）"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with request_priority(PRIORITY_INTERACTIVE):
+            return func(*args, **kwargs)
+    return wrapper
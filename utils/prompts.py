@@ -0,0 +1,198 @@
+"""
+Prompt构建模块
+各API客户端（同步/异步）共用的案例分析与问题生成prompt
+"""
+import json
+from typing import Dict, List, Optional
+
+
+ANALYZE_CASE_SYSTEM_PROMPT = "你是一位专业的法律专家，擅长分析法律案例并提供专业的法律意见。"
+GENERATE_QUESTIONS_SYSTEM_PROMPT = "你是一位法律教育专家，擅长基于案例生成法律争议问题，这些问题侧重于法律分析和价值判断。"
+
+# 案例分析（analyze_case）的生成参数，各客户端共用（回答索引键也包含这些参数）
+ANALYZE_CASE_TEMPERATURE = 0.3
+ANALYZE_CASE_MAX_TOKENS = 3000
+
+
+def build_analyze_case_messages(case_text: str, question: str = None) -> List[Dict]:
+    """
+    构建案例分析的消息列表
+
+    Args:
+        case_text: 案例文本
+        question: 可选的问题，如果提供则针对问题进行分析
+
+    Returns:
+        消息列表
+    """
+    if question:
+        prompt = f"""请作为法律专家分析以下案例，并回答相关问题。
+
+案例内容：
+{case_text}
+
+问题：{question}
+
+请提供详细的法律分析，包括：
+1. 案件事实梳理
+2. 法律适用分析
+3. 判决建议
+4. 法律依据
+
+请用中文回答。"""
+    else:
+        prompt = f"""请作为法律专家分析以下案例。
+
+案例内容：
+{case_text}
+
+请提供详细的法律分析，包括：
+1. 案件事实梳理
+2. 法律适用分析
+3. 判决建议
+4. 法律依据
+
+请用中文回答。"""
+
+    return [
+        {"role": "system", "content": ANALYZE_CASE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def build_generate_questions_messages(case_text: str, num_questions: int = 10) -> List[Dict]:
+    """
+    构建问题生成的消息列表
+
+    Args:
+        case_text: 案例文本
+        num_questions: 要生成的问题数量
+
+    Returns:
+        消息列表
+    """
+    prompt = f"""请根据本案文本中的争议焦点、裁判理由与法律法条原理，提炼并输出{num_questions}个可供法律AI回答的法律争议问题（涵盖是否构成家暴、危险性/持续性、证据评价、受害者责任归因、公序良俗/关系语境），偏向法律分析和价值判断，不要事实问题
+
+案例内容：
+{case_text}
+
+请生成{num_questions}个问题，每个问题一行，用中文回答。只输出问题，不要编号或其他说明。"""
+
+    return [
+        {"role": "system", "content": GENERATE_QUESTIONS_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def parse_questions(content: str, num_questions: int) -> List[str]:
+    """
+    从模型输出中解析问题列表
+
+    Args:
+        content: 模型输出文本（每行一个问题）
+        num_questions: 最多保留的问题数量
+
+    Returns:
+        问题列表
+    """
+    # 解析问题列表（按行分割，过滤空行）
+    questions = [q.strip() for q in content.split('\n') if q.strip()]
+    # 移除可能的编号（如 "1. ", "1、"等）
+    questions = [q.split('.', 1)[-1].split('、', 1)[-1].strip() for q in questions]
+    return questions[:num_questions]
+
+
+CONTINUATION_PROMPT = "你的上一条回答因长度限制被截断。请从中断处直接继续输出，不要重复已输出的内容，也不要添加任何说明。"
+
+
+def build_continuation_messages(messages: List[Dict], partial_content: str) -> List[Dict]:
+    """
+    构建续写请求的消息列表（原消息 + 已生成的部分回答 + 续写指令）
+
+    Args:
+        messages: 原始消息列表
+        partial_content: 被截断的已生成内容
+
+    Returns:
+        消息列表
+    """
+    return list(messages) + [
+        {"role": "assistant", "content": partial_content},
+        {"role": "user", "content": CONTINUATION_PROMPT}
+    ]
+
+
+def build_analyze_questions_messages(case_text: str, questions: List[str]) -> List[Dict]:
+    """
+    构建多问题合并分析的消息列表（案例文本只发送一次，要求以JSON一次性回答所有问题）
+
+    Args:
+        case_text: 案例文本
+        questions: 问题列表
+
+    Returns:
+        消息列表
+    """
+    question_lines = '\n'.join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+    prompt = f"""请作为法律专家分析以下案例，并逐一回答后面列出的{len(questions)}个问题。
+
+案例内容：
+{case_text}
+
+问题列表：
+{question_lines}
+
+对每个问题，请提供详细的法律分析，包括：
+1. 案件事实梳理
+2. 法律适用分析
+3. 判决建议
+4. 法律依据
+
+各问题的回答应独立完整，不要引用其他问题的回答。
+请只输出一个JSON对象，不要输出其他内容，格式如下：
+{{"answers": [{{"id": 1, "answer": "问题1的完整回答"}}, {{"id": 2, "answer": "问题2的完整回答"}}]}}
+
+请用中文回答。"""
+
+    return [
+        {"role": "system", "content": ANALYZE_CASE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def parse_question_answers(content: str, num_questions: int) -> List[Optional[str]]:
+    """
+    从多问题合并分析的JSON输出中按问题编号拆分回答
+
+    Args:
+        content: 模型输出文本（可能带```json代码块）
+        num_questions: 问题数量
+
+    Returns:
+        按问题顺序排列的回答列表，解析失败或缺失的问题为None
+    """
+    answers: List[Optional[str]] = [None] * num_questions
+    start, end = content.find('{'), content.rfind('}')
+    if start == -1 or end <= start:
+        return answers
+    try:
+        # strict=False：模型常在字符串中直接输出换行
+        data = json.loads(content[start:end + 1], strict=False)
+    except ValueError:
+        return answers
+
+    items = data.get('answers') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return answers
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            qid, answer = item.get('id', index + 1), item.get('answer')
+        else:
+            qid, answer = index + 1, item
+        try:
+            qid = int(qid)
+        except (TypeError, ValueError):
+            continue
+        if 1 <= qid <= num_questions and isinstance(answer, str) and answer.strip():
+            answers[qid - 1] = answer.strip()
+    return answers
@@ -6,10 +6,20 @@ Qwen（通义千问）API封装模块
 import requests
 import json
 import time
-import threading
-from collections import deque
 from typing import Dict, Optional, List
-from config import QWEN_API_KEY, QWEN_API_URL, QWEN_MAX_RPM, QWEN_MAX_RPS
+from config import QWEN_API_KEY, QWEN_API_URL, QWEN_MAX_RPM, QWEN_MAX_RPS, QWEN_MAX_TPM, TRUNCATION_STRATEGY, THROTTLE_MAX_RETRIES
+from utils.http_client import get_session
+from utils.rate_limiter import get_rate_limiter
+from utils.concurrency import get_concurrency_limiter
+from utils.circuit_breaker import get_circuit_breaker
+from utils.response_cache import response_cache
+from utils.hedging import hedged_request
+from utils.token_tracker import get_cache_tokens
+from utils.token_estimator import fit_max_tokens, estimate_usage
+from utils.telemetry import instrument_request, mark_cached, telemetry_context, STAGE_QUESTIONS, STAGE_EXTRACT
+from utils.continuation import continue_truncated, get_partial_content
+from utils.prompts import ANALYZE_CASE_TEMPERATURE, ANALYZE_CASE_MAX_TOKENS, build_analyze_case_messages, build_generate_questions_messages, parse_questions
+from utils.lazy import LazyInstance
 
 
 class QwenAPI:
@@ -29,47 +39,72 @@ class QwenAPI:
         self.max_retries = 3
         self.retry_delay = 1  # 秒
         
-        # 速率限制控制（支持高并发）
-        self.request_times = deque(maxlen=3000)  # 记录最近请求时间
-        self.min_interval = 0.1  # 最小请求间隔（秒）
-        self.rate_limit_lock = threading.Lock()
+        self.provider = 'qwen'
+        
+        # 复用进程级共享连接池（keep-alive），避免每次请求重新握手
+        self.session = get_session(self.provider)
         
         # 从配置读取速率限制
         self.max_rpm = QWEN_MAX_RPM
         self.max_rps = QWEN_MAX_RPS
+        self.max_tpm = QWEN_MAX_TPM
+        
+        # 速率限制控制（按提供商+API密钥在所有实例和进程间共享）
+        self.rate_limiter = get_rate_limiter(self.provider, self.api_key, self.max_rpm, self.max_rps, self.max_tpm)
+        
+        # 自适应并发控制（按提供商共享，根据429/5xx和延迟调整在途请求数）
+        self.concurrency = get_concurrency_limiter(self.provider)
     
     def _rate_limit_check(self):
-        """检查并控制请求速率（支持高并发）"""
-        with self.rate_limit_lock:
-            now = time.time()
-            
-            # 移除60秒前的记录
-            while self.request_times and now - self.request_times[0] > 60:
-                self.request_times.popleft()
-            
-            # 检查每分钟请求数限制
-            if len(self.request_times) >= self.max_rpm:
-                wait_time = 60 - (now - self.request_times[0])
-                if wait_time > 0:
-                    time.sleep(wait_time)
-                    now = time.time()
-            
-            # 检查每秒请求数限制
-            recent_requests = [t for t in self.request_times if now - t < 1.0]
-            if len(recent_requests) >= self.max_rps:
-                wait_time = 1.0 - (now - recent_requests[0])
-                if wait_time > 0:
-                    time.sleep(wait_time)
-                    now = time.time()
-            
-            # 确保最小间隔
-            if self.request_times:
-                last_time = self.request_times[-1]
-                if now - last_time < self.min_interval:
-                    time.sleep(self.min_interval - (now - last_time))
+        """检查并控制请求速率（令牌桶，等待时不持有锁）"""
+        self.rate_limiter.acquire()
+        
+    def _build_headers(self) -> Dict:
+        """构建请求头"""
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.api_key}'
+        }
+    
+    def _build_payload(self, messages: List[Dict], temperature: float, max_tokens: int, use_thinking: bool = False) -> Dict:
+        """
+        构建请求体
+        
+        Args:
+            messages: 消息列表
+            temperature: 温度参数
+            max_tokens: 最大token数
+            use_thinking: Qwen不支持thinking模式，该参数被忽略（保持与其他客户端一致的签名）
             
-            self.request_times.append(time.time())
+        Returns:
+            请求体字典
+        """
+        return {
+            'model': self.model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }
+    
+    def _record_usage(self, usage: Dict, use_thinking: bool = False):
+        """
+        记录一次调用的token使用情况（打印、TPM限流补记）
         
+        Args:
+            usage: API返回的usage字典
+            use_thinking: 保持与其他客户端一致的签名
+        """
+        input_tokens = usage.get('prompt_tokens', 0)
+        output_tokens = usage.get('completion_tokens', 0)
+        total_tokens = usage.get('total_tokens', 0)
+        self.rate_limiter.record_tokens(total_tokens)
+        cache_hit_tokens, _ = get_cache_tokens(usage)
+        cache_info = f", 缓存命中: {cache_hit_tokens}" if cache_hit_tokens else ''
+        # 提供商未返回usage时为本地估算值
+        estimated_info = '（本地估算）' if usage.get('estimated') else ''
+        print(f"[Token使用] 输入: {input_tokens}, 输出: {output_tokens}, 总计: {total_tokens}{cache_info}{estimated_info}")
+    
+    @instrument_request
     def _make_request(self, messages: List[Dict], temperature: float = 0.7, max_tokens: int = 2000, auto_retry_on_truncate: bool = True) -> Optional[Dict]:
         """
         发送API请求（带重试机制和速率限制）
@@ -86,6 +121,17 @@ class QwenAPI:
         if not self.api_key:
             raise ValueError("Qwen API密钥未配置，请在.env文件中设置QWEN_API_KEY")
         
+        # 发送前按模型的上下文窗口和输出上限调整max_tokens（输入超过上下文窗口时直接失败）
+        model = self._build_payload(messages, temperature, max_tokens)['model']
+        max_tokens = fit_max_tokens(messages, max_tokens, model)
+        
+        # 响应缓存：相同请求（提供商、模型、消息、参数）直接返回已付费的结果
+        cache_key = response_cache.make_key(self.provider, self._build_payload(messages, temperature, max_tokens))
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            mark_cached()
+            return cached
+        
         original_max_tokens = max_tokens
         current_max_tokens = max_tokens
         
@@ -93,38 +139,38 @@ class QwenAPI:
             # 速率限制检查
             self._rate_limit_check()
             
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.api_key}'
-            }
+            headers = self._build_headers()
+            payload = self._build_payload(messages, temperature, current_max_tokens)
             
-            payload = {
-                'model': self.model,
-                'messages': messages,
-                'temperature': temperature,
-                'max_tokens': current_max_tokens
-            }
+            # 熔断器（按提供商+模型）：服务不可用时直接失败，不再等待超时和重试
+            breaker = get_circuit_breaker(self.provider, payload.get('model', ''))
             
             for attempt in range(self.max_retries):
                 try:
-                    response = requests.post(
-                        self.api_url,
-                        headers=headers,
-                        json=payload,
-                        timeout=180  # 增加到180秒，适应长文本分析
-                    )
-                    
-                    # 处理429错误（速率限制）
-                    if response.status_code == 429:
-                        retry_after = int(response.headers.get('Retry-After', 60))
-                        print(f"[速率限制] 触发限制，等待 {retry_after} 秒后重试...")
-                        time.sleep(retry_after)
+                    for throttle_count in range(THROTTLE_MAX_RETRIES + 1):
+                        with breaker.guard(), self.concurrency.slot() as slot:
+                            response = self.session.post(
+                                self.api_url,
+                                headers=headers,
+                                json=payload,
+                                timeout=180  # 增加到180秒，适应长文本分析
+                            )
+                            
+                            # 处理429错误（速率限制）：由并发控制器降低并发并统一退避，不再每个线程各自等待Retry-After
+                            if response.status_code == 429:
+                                slot.throttled(response.headers.get('Retry-After'))
+                                response.close()
+                            else:
+                                response.raise_for_status()
+                                result = response.json()
+                        
+                        if response.status_code != 429:
+                            break
+                        print(f"[速率限制] API返回429错误，降低并发后重试（第{throttle_count + 1}次）...")
                         # 重新检查速率限制
                         self._rate_limit_check()
-                        continue
-                    
-                    response.raise_for_status()
-                    result = response.json()
+                    else:
+                        response.raise_for_status()  # 多次限流后仍为429，按请求失败处理
                     
                     # 检查响应是否完整（finish_reason）
                     truncated = False
@@ -134,10 +180,23 @@ class QwenAPI:
                         if finish_reason == 'length':
                             truncated = True
                             if auto_retry_on_truncate and retry_round == 0:
+                                if TRUNCATION_STRATEGY == 'continue' and get_partial_content(result):
+                                    # 续写：保留已生成的内容，让模型从中断处继续（不丢弃已付费的输出token）
+                                    # 提供商未返回usage时按本地估算记录
+                                    self._record_usage(result.get('usage') or estimate_usage(messages, result, model))
+                                    result = continue_truncated(self, messages, result, temperature, current_max_tokens)
+                                    response_cache.set(cache_key, result, self.provider, payload.get('model', ''))
+                                    return result
                                 # 增加max_tokens并重试
-                                current_max_tokens = min(current_max_tokens * 2, 16000)  # 最多增加到16000
-                                print(f"[自动补救] 响应被截断，增加max_tokens到{current_max_tokens}并重新生成...")
-                                break  # 跳出内层循环，进入下一轮重试
+                                # 加倍max_tokens重试（最多16000，且不超过模型的输出上限）
+                                next_max_tokens = fit_max_tokens(messages, min(current_max_tokens * 2, 16000), model)
+                                if next_max_tokens > current_max_tokens:
+                                    current_max_tokens = next_max_tokens
+                                    print(f"[自动补救] 响应被截断，增加max_tokens到{current_max_tokens}并重新生成...")
+                                    break  # 跳出内层循环，进入下一轮重试
+                                # 已达到模型的输出上限，重新生成仍会在同一位置截断
+                                print(f"[警告] 响应被截断，max_tokens已达模型输出上限（{current_max_tokens}），不再重新生成")
+                                auto_retry_on_truncate = False
                             else:
                                 print(f"[警告] 响应因token限制被截断（max_tokens={current_max_tokens}）")
                         elif finish_reason == 'content_filter':
@@ -145,16 +204,13 @@ class QwenAPI:
                         elif finish_reason not in ['stop', '']:
                             print(f"[警告] 响应完成原因: {finish_reason}")
                     
-                    # 如果响应完整或已经重试过，返回结果
-                    if not truncated or retry_round > 0:
+                    # 如果响应完整、已经重试过或不需要补救，返回结果
+                    if not truncated or retry_round > 0 or not auto_retry_on_truncate:
                         # 记录token使用情况（如果API返回）
-                        if 'usage' in result:
-                            usage = result['usage']
-                            input_tokens = usage.get('prompt_tokens', 0)
-                            output_tokens = usage.get('completion_tokens', 0)
-                            total_tokens = usage.get('total_tokens', 0)
-                            print(f"[Token使用] 输入: {input_tokens}, 输出: {output_tokens}, 总计: {total_tokens}")
+                        # 提供商未返回usage时按本地估算记录
+                        self._record_usage(result.get('usage') or estimate_usage(messages, result, model))
                         
+                        response_cache.set(cache_key, result, self.provider, payload.get('model', ''))
                         return result
                     
                 except requests.exceptions.RequestException as e:
@@ -189,42 +245,10 @@ class QwenAPI:
         if question:
             print(f"[Qwen API] 分析问题: {question[:50]}...")
         
-        if question:
-            prompt = f"""请作为法律专家分析以下案例，并回答相关问题。
-
-案例内容：
-{case_text}
-
-问题：{question}
-
-请提供详细的法律分析，包括：
-1. 案件事实梳理
-2. 法律适用分析
-3. 判决建议
-4. 法律依据
-
-请用中文回答。"""
-        else:
-            prompt = f"""请作为法律专家分析以下案例。
-
-案例内容：
-{case_text}
-
-请提供详细的法律分析，包括：
-1. 案件事实梳理
-2. 法律适用分析
-3. 判决建议
-4. 法律依据
-
-请用中文回答。"""
-        
-        messages = [
-            {"role": "system", "content": "你是一位专业的法律专家，擅长分析法律案例并提供专业的法律意见。"},
-            {"role": "user", "content": prompt}
-        ]
+        messages = build_analyze_case_messages(case_text, question)
         
         print("[Qwen API] 正在调用API，请稍候...")
-        response = self._make_request(messages, temperature=0.3, max_tokens=3000)
+        response = hedged_request(self, messages, temperature=ANALYZE_CASE_TEMPERATURE, max_tokens=ANALYZE_CASE_MAX_TOKENS)
         
         if response and 'choices' in response and len(response['choices']) > 0:
             result = response['choices'][0]['message']['content']
@@ -244,27 +268,14 @@ class QwenAPI:
         Returns:
             问题列表
         """
-        prompt = f"""请根据本案文本中的争议焦点、裁判理由与法律法条原理，提炼并输出{num_questions}个可供法律AI回答的法律争议问题（涵盖是否构成家暴、危险性/持续性、证据评价、受害者责任归因、公序良俗/关系语境），偏向法律分析和价值判断，不要事实问题
-
-案例内容：
-{case_text}
-
-请生成{num_questions}个问题，每个问题一行，用中文回答。只输出问题，不要编号或其他说明。"""
+        messages = build_generate_questions_messages(case_text, num_questions)
         
-        messages = [
-            {"role": "system", "content": "你是一位法律教育专家，擅长基于案例生成法律争议问题，这些问题侧重于法律分析和价值判断。"},
-            {"role": "user", "content": prompt}
-        ]
-        
-        response = self._make_request(messages, temperature=0.7, max_tokens=2000)
+        with telemetry_context(stage=STAGE_QUESTIONS):
+            response = self._make_request(messages, temperature=0.7, max_tokens=2000)
         
         if response and 'choices' in response and len(response['choices']) > 0:
             content = response['choices'][0]['message']['content']
-            # 解析问题列表（按行分割，过滤空行）
-            questions = [q.strip() for q in content.split('\n') if q.strip()]
-            # 移除可能的编号（如 "1. ", "1、"等）
-            questions = [q.split('.', 1)[-1].split('、', 1)[-1].strip() for q in questions]
-            return questions[:num_questions]
+            return parse_questions(content, num_questions)
         else:
             raise Exception("API响应格式错误或为空")
     
@@ -302,7 +313,8 @@ class QwenAPI:
             {"role": "user", "content": prompt}
         ]
         
-        response = self._make_request(messages, temperature=0.7, max_tokens=2000)
+        with telemetry_context(stage=STAGE_QUESTIONS):
+            response = self._make_request(messages, temperature=0.7, max_tokens=2000)
         
         if response and 'choices' in response and len(response['choices']) > 0:
             content = response['choices'][0]['message']['content']
@@ -357,7 +369,8 @@ class QwenAPI:
             {"role": "user", "content": prompt}
         ]
         
-        response = self._make_request(messages, temperature=0.1, max_tokens=1500)  # 降低temperature确保更准确
+        with telemetry_context(stage=STAGE_EXTRACT):
+            response = self._make_request(messages, temperature=0.1, max_tokens=1500)  # 降低temperature确保更准确
         
         if response and 'choices' in response and len(response['choices']) > 0:
             ai_extracted = response['choices'][0]['message']['content'].strip()
@@ -470,6 +483,6 @@ AI判决：
             raise Exception("API响应格式错误或为空")
 
 
-# 创建全局实例
-qwen_api = QwenAPI()
+# 创建全局实例（首次使用时才初始化）
+qwen_api = LazyInstance(QwenAPI)
 
@@ -0,0 +1,240 @@
+"""
+速率限制模块
+基于令牌桶的速率限制器，按（提供商, API密钥）共享：
+- 同一进程内所有API实例共享同一个限制器
+- 同一主机上的多个进程通过状态文件（fcntl文件锁）共享配额
+- 支持RPM（每分钟请求数）、RPS（每秒请求数）和TPM（每分钟token数）
+- 交互式请求配额不足时在共享状态中预约，预约期间批量请求让出补充的令牌（跨进程同样生效），
+  交互式请求获取到配额后立即取消自己的预约
+"""
+import os
+import json
+import time
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from config import RATE_LIMIT_DIR, RATE_LIMIT_SHARED
+from utils.priority import is_interactive
+
+# 文件锁支持（用于跨进程共享配额）
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False  # Windows系统不支持fcntl，退化为进程内限流
+
+# 共享状态中记录交互式请求预约的键（与令牌桶名不冲突），值为 {等待者ID: 预约截止时间}
+INTERACTIVE_RESERVATION_KEY = 'interactive_reservations'
+# 预约在交互式请求计划重试时间之后额外保留的秒数（覆盖sleep的唤醒误差）
+INTERACTIVE_RESERVATION_MARGIN = 0.1
+
+# 等待者ID序号（同一进程内唯一）
+_waiter_seq = itertools.count()
+
+
+def new_waiter_id() -> str:
+    """生成一次请求的等待者ID（跨进程唯一），同一请求的多次 try_acquire 需使用同一ID"""
+    return f"{os.getpid()}-{next(_waiter_seq)}"
+
+
+class TokenBucketRateLimiter:
+    """令牌桶速率限制器（线程安全，可跨进程共享）"""
+
+    def __init__(self, name: str, max_rpm: int = 0, max_rps: int = 0, max_tpm: int = 0,
+                 state_file: Optional[str] = None):
+        """
+        初始化速率限制器
+
+        Args:
+            name: 限制器名称（用于日志显示）
+            max_rpm: 每分钟最大请求数，0表示不限制
+            max_rps: 每秒最大请求数，0表示不限制
+            max_tpm: 每分钟最大token数，0表示不限制
+            state_file: 跨进程共享的状态文件路径，None表示仅进程内共享
+        """
+        self.name = name
+        self.max_rpm = max_rpm
+        self.max_rps = max_rps
+        self.max_tpm = max_tpm
+
+        # 各令牌桶的（容量, 每秒补充速率）
+        self.limits: Dict[str, Tuple[float, float]] = {}
+        if max_rpm > 0:
+            self.limits['rpm'] = (float(max_rpm), max_rpm / 60.0)
+        if max_rps > 0:
+            self.limits['rps'] = (float(max_rps), float(max_rps))
+        if max_tpm > 0:
+            self.limits['tpm'] = (float(max_tpm), max_tpm / 60.0)
+
+        self.state_file = state_file if HAS_FCNTL else None
+        self._lock = threading.Lock()
+        self._state: Dict[str, list] = {}  # 进程内状态：{桶名: [剩余令牌, 上次补充时间]}
+
+    @contextmanager
+    def _locked_state(self):
+        """获取状态（持有线程锁，若启用跨进程共享则同时持有文件锁）"""
+        with self._lock:
+            if not self.state_file:
+                yield self._state
+                return
+
+            with open(self.state_file, 'a+', encoding='utf-8') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    try:
+                        state = json.loads(raw) if raw.strip() else {}
+                    except json.JSONDecodeError:
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _refill(self, state: Dict[str, list], now: float) -> Dict[str, float]:
+        """按经过的时间补充各桶令牌，返回当前令牌数"""
+        levels = {}
+        for bucket, (capacity, rate) in self.limits.items():
+            tokens, last_time = state.get(bucket, [capacity, now])
+            tokens = min(capacity, tokens + max(0.0, now - last_time) * rate)
+            state[bucket] = [tokens, now]
+            levels[bucket] = tokens
+        return levels
+
+    def try_acquire(self, tokens: int = 0, priority: str = None, waiter_id: str = None) -> float:
+        """
+        尝试获取一次请求配额（不等待）
+
+        交互式请求配额不足时预约到其重试时间，预约期间批量请求即使有令牌也需等待，
+        使补充的令牌优先留给交互式请求；获取到配额时取消该请求的预约
+
+        Args:
+            tokens: 预计消耗的token数（用于TPM限制），未知时传0，事后通过record_tokens补记
+            priority: 请求优先级，不提供则使用当前上下文的优先级
+            waiter_id: 等待者ID（new_waiter_id生成，重试时保持不变），不提供则按进程和线程区分
+
+        Returns:
+            0表示已获取配额；否则返回需要等待的秒数（此时未扣减配额）
+        """
+        if not self.limits:
+            return 0.0
+        interactive = is_interactive(priority)
+
+        with self._locked_state() as state:
+            now = time.time()
+            levels = self._refill(state, now)
+
+            wait_time = 0.0
+            for bucket, (capacity, rate) in self.limits.items():
+                if bucket == 'tpm':
+                    need = min(max(tokens, 1), capacity)
+                else:
+                    need = 1.0
+                if levels[bucket] < need:
+                    wait_time = max(wait_time, (need - levels[bucket]) / rate)
+
+            # 只保留未过期的预约（等待者被取消或进程退出后预约到期自动失效）
+            reservations = state.get(INTERACTIVE_RESERVATION_KEY)
+            if not isinstance(reservations, dict):
+                reservations = {}
+            reservations = {waiter: until for waiter, until in reservations.items() if until > now}
+            if not interactive and reservations:
+                wait_time = max(wait_time, max(reservations.values()) - now)
+
+            if interactive:
+                waiter_id = waiter_id or f"{os.getpid()}-t{threading.get_ident()}"
+            if wait_time <= 0:
+                for bucket in self.limits:
+                    cost = tokens if bucket == 'tpm' else 1
+                    state[bucket][0] -= cost
+                if interactive:
+                    reservations.pop(waiter_id, None)
+            elif interactive:
+                reservations[waiter_id] = max(reservations.get(waiter_id, 0.0),
+                                              now + wait_time + INTERACTIVE_RESERVATION_MARGIN)
+
+            if reservations:
+                state[INTERACTIVE_RESERVATION_KEY] = reservations
+            else:
+                state.pop(INTERACTIVE_RESERVATION_KEY, None)
+            return max(wait_time, 0.0)
+
+    def acquire(self, tokens: int = 0, priority: str = None):
+        """
+        获取一次请求配额，配额不足时等待（等待期间不持有锁）
+
+        Args:
+            tokens: 预计消耗的token数（用于TPM限制），未知时传0，事后通过record_tokens补记
+            priority: 请求优先级，不提供则使用当前上下文的优先级
+        """
+        waiter_id = new_waiter_id()
+        while True:
+            wait_time = self.try_acquire(tokens, priority, waiter_id)
+            if wait_time <= 0:
+                return
+
+            # 在锁外等待，避免阻塞其他线程/进程
+            if wait_time > 1.0:
+                print(f"[速率限制] {self.name} 配额不足，等待 {wait_time:.1f} 秒...", flush=True)
+            time.sleep(wait_time)
+
+    def record_tokens(self, tokens: int):
+        """
+        补记一次请求实际消耗的token数（允许透支，透支部分会延后后续请求）
+
+        Args:
+            tokens: 实际消耗的token数
+        """
+        if 'tpm' not in self.limits or tokens <= 0:
+            return
+
+        with self._locked_state() as state:
+            self._refill(state, time.time())
+            state['tpm'][0] -= tokens
+
+
+# 限制器注册表：同一（提供商, API密钥）在进程内只创建一个实例
+_limiters: Dict[Tuple[str, str], TokenBucketRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, api_key: str, max_rpm: int = 0, max_rps: int = 0,
+                     max_tpm: int = 0) -> TokenBucketRateLimiter:
+    """
+    获取（提供商, API密钥）对应的共享速率限制器
+
+    Args:
+        provider: 提供商名称（如 'deepseek'、'openai'、'qwen'）
+        api_key: API密钥（只使用其哈希值，不会写入磁盘）
+        max_rpm: 每分钟最大请求数
+        max_rps: 每秒最大请求数
+        max_tpm: 每分钟最大token数
+
+    Returns:
+        共享的TokenBucketRateLimiter实例（首次创建时的限制参数生效）
+    """
+    key_hash = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:12]
+    registry_key = (provider, key_hash)
+
+    with _limiters_lock:
+        limiter = _limiters.get(registry_key)
+        if limiter is None:
+            state_file = None
+            if RATE_LIMIT_SHARED and HAS_FCNTL:
+                os.makedirs(RATE_LIMIT_DIR, exist_ok=True)
+                state_file = os.path.join(RATE_LIMIT_DIR, f'{provider}_{key_hash}.json')
+            limiter = TokenBucketRateLimiter(
+                name=provider,
+                max_rpm=max_rpm,
+                max_rps=max_rps,
+                max_tpm=max_tpm,
+                state_file=state_file
+            )
+            _limiters[registry_key] = limiter
+        return limiter
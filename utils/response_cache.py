@@ -0,0 +1,234 @@
+"""
+LLM响应缓存模块
+基于SQLite的内容寻址响应缓存：以（提供商, 请求体, thinking模式）的哈希为键，
+重复运行相同数据时直接复用已付费的脱敏、问题生成和评估结果
+- 支持TTL过期和总大小上限（按最近访问时间淘汰）
+- 多线程/多进程安全（SQLite WAL模式）
+- 统计命中/未命中次数
+- 只用于process_cases.py等批量运行，Web应用（app.py）启动时关闭，网页端每次点击都重新调用模型
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+from config import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL_DAYS, RESPONSE_CACHE_MAX_MB
+
+
+class ResponseCache:
+    """LLM响应缓存（SQLite存储）"""
+
+    def __init__(self, db_path: str = None, ttl_days: float = None, max_mb: float = None, enabled: bool = None):
+        """
+        初始化响应缓存（数据库在首次使用时才打开）
+
+        Args:
+            db_path: SQLite数据库路径，默认从config读取
+            ttl_days: 缓存有效天数，0表示永不过期，默认从config读取
+            max_mb: 缓存总大小上限（MB），0表示不限制，默认从config读取
+            enabled: 是否启用缓存，默认从config读取
+        """
+        self.db_path = db_path or RESPONSE_CACHE_PATH
+        self.ttl_seconds = (RESPONSE_CACHE_TTL_DAYS if ttl_days is None else ttl_days) * 86400
+        self.max_bytes = int((RESPONSE_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024)
+        self.enabled = RESPONSE_CACHE_ENABLED if enabled is None else enabled
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # 当前进程统计
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """获取数据库连接（首次调用时创建表）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(provider: str, payload: Dict, use_thinking: bool = False) -> str:
+        """
+        计算请求的缓存键
+
+        Args:
+            provider: 提供商名称（如 'deepseek'、'openai'、'qwen'）
+            payload: 请求体（包含model、messages、temperature、max_tokens）
+            use_thinking: 是否使用thinking模式
+
+        Returns:
+            SHA-256十六进制字符串
+        """
+        key_data = {
+            'provider': provider,
+            'model': payload.get('model'),
+            'messages': payload.get('messages'),
+            'system': payload.get('system'),
+            'temperature': payload.get('temperature'),
+            'max_tokens': payload.get('max_tokens'),
+            'thinking': bool(use_thinking)
+        }
+        raw = json.dumps(key_data, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def is_cacheable(result: Dict) -> bool:
+        """只缓存有实际内容的响应（空回答会触发上层重试，不能被缓存固定下来）"""
+        if not result:
+            return False
+        choices = result.get('choices') or []
+        if choices:
+            content = (choices[0].get('message') or {}).get('content') or ''
+            return bool(content.strip())
+        # Claude原生格式：content为文本块列表
+        blocks = result.get('content') or []
+        return any(isinstance(b, dict) and (b.get('text') or '').strip() for b in blocks)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        读取缓存的响应
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            响应字典，未命中或已过期返回None
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._get_conn()
+                row = conn.execute('SELECT response, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is not None and self.ttl_seconds > 0 and now - row[1] > self.ttl_seconds:
+                    conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    conn.commit()
+                    self.stats['evictions'] += 1
+                    row = None
+
+                if row is None:
+                    self.stats['misses'] += 1
+                    return None
+
+                conn.execute('UPDATE responses SET accessed_at = ?, hit_count = hit_count + 1 WHERE key = ?', (now, key))
+                conn.commit()
+                self.stats['hits'] += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            # 缓存故障不影响主流程，按未命中处理
+            print(f"[响应缓存] 读取失败: {str(e)}", flush=True)
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key: str, result: Dict, provider: str = '', model: str = ''):
+        """
+        写入响应
+
+        Args:
+            key: 缓存键
+            result: API响应字典
+            provider: 提供商名称（仅用于统计）
+            model: 模型名称（仅用于统计）
+        """
+        if not self.enabled or not self.is_cacheable(result):
+            return
+
+        # 流式统计只对当次调用有意义，不写入缓存
+        result = {k: v for k, v in result.items() if k != 'stream_stats'}
+        raw = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._get_conn()
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, provider, model, response, size, created_at, accessed_at, hit_count) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, 0)',
+                    (key, provider, model, raw, len(raw.encode('utf-8')), now, now)
+                )
+                conn.commit()
+                self.stats['writes'] += 1
+                # 每100次写入检查一次过期和大小上限
+                if self.stats['writes'] % 100 == 1:
+                    self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"[响应缓存] 写入失败: {str(e)}", flush=True)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目，并在超过大小上限时按最近访问时间淘汰（调用方持有锁）"""
+        evicted = 0
+        if self.ttl_seconds > 0:
+            evicted += conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl_seconds,)).rowcount
+
+        if self.max_bytes > 0:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                # 淘汰到上限的90%，避免频繁触发
+                target = total - int(self.max_bytes * 0.9)
+                freed = 0
+                stale_keys = []
+                for key, size in conn.execute('SELECT key, size FROM responses ORDER BY accessed_at ASC'):
+                    stale_keys.append((key,))
+                    freed += size
+                    if freed >= target:
+                        break
+                conn.executemany('DELETE FROM responses WHERE key = ?', stale_keys)
+                evicted += len(stale_keys)
+
+        if evicted:
+            conn.commit()
+            self.stats['evictions'] += evicted
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute('DELETE FROM responses')
+            conn.commit()
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计（当前进程命中情况 + 数据库条目数和大小）"""
+        stats = self.stats.copy()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups > 0 else 0.0
+        try:
+            with self._lock:
+                count, size = self._get_conn().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            stats['entries'] = count
+            stats['size_mb'] = size / 1024 / 1024
+        except sqlite3.Error:
+            stats['entries'] = 0
+            stats['size_mb'] = 0.0
+        return stats
+
+    def print_summary(self):
+        """打印缓存统计摘要"""
+        if not self.enabled:
+            return
+        stats = self.get_stats()
+        print(f"[响应缓存] 命中: {stats['hits']}, 未命中: {stats['misses']}, 命中率: {stats['hit_rate'] * 100:.1f}%, "
+              f"条目数: {stats['entries']}, 大小: {stats['size_mb']:.1f}MB", flush=True)
+
+
+# 全局实例
+response_cache = ResponseCache()
@@ -0,0 +1,122 @@
+"""
+结果日志模块
+process_cases.py 每完成一个问题就把结果行追加到JSONL日志（每行写入后fsync），
+以（模型, 案例ID, 问题编号）为键：
+- 进程崩溃、Ctrl-C或提供商故障时，已付费的回答和评估不会随内存中的结果一起丢失
+- --resume 时跳过已完成的键，并用日志中的结果行重建Excel
+- 同一键出现多次时以最后一行为准（失败后重试成功、批处理评估补全评分等）
+"""
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+from config import RESULT_JOURNAL_DIR
+
+JournalKey = Tuple[str, str, int]
+
+
+def result_key(row: Dict) -> JournalKey:
+    """结果行的日志键：（模型, 案例ID, 问题编号）"""
+    return (str(row.get('使用的模型', '')), str(row.get('案例ID', '')), int(row.get('问题编号', 0)))
+
+
+def is_completed(row: Dict) -> bool:
+    """结果行是否已完成（处理失败的行在续跑时重新处理；等待批处理评估的行保留回答，只补评估）"""
+    return not row.get('处理错误')
+
+
+class ResultJournal:
+    """按问题追加的结果日志（JSONL）"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 日志文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._tail_checked = False
+
+    @classmethod
+    def for_model(cls, model_display_name: str, journal_dir: str = None) -> 'ResultJournal':
+        """获取指定模型的日志（每个模型一个文件，多个模型并行运行时互不干扰）"""
+        filename = model_display_name.replace(' ', '_').replace('/', '_') + '.jsonl'
+        return cls(os.path.join(journal_dir or RESULT_JOURNAL_DIR, filename))
+
+    def append(self, row: Dict):
+        """
+        追加一行结果（写入并fsync后才返回）
+
+        Args:
+            row: 结果行（可包含等待批处理评估的'_评估输入'）
+        """
+        line = json.dumps(row, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if not self._tail_checked:
+                line = self._tail_separator() + line
+                self._tail_checked = True
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _tail_separator(self) -> str:
+        """上次中断时若留下写了一半的行，先换行，避免新行与之拼接而一起损坏"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                return '' if f.read(1) == b'\n' else '\n'
+        except OSError:
+            return ''  # 文件不存在或为空
+
+    def extend(self, rows: Iterable[Dict]):
+        """追加多行结果"""
+        for row in rows:
+            self.append(row)
+
+    def load(self) -> Dict[JournalKey, Dict]:
+        """
+        读取日志（同一键以最后一行为准，跳过中断时写了一半的行）
+
+        Returns:
+            {（模型, 案例ID, 问题编号）: 结果行}
+        """
+        rows = {}
+        if not os.path.exists(self.path):
+            return rows
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                rows[result_key(row)] = row
+        return rows
+
+    def completed_by_case(self) -> Dict[str, Dict[int, Dict]]:
+        """
+        按案例分组的已完成结果行
+
+        Returns:
+            {案例ID: {问题编号: 结果行}}
+        """
+        by_case = {}
+        for (_, case_id, q_num), row in self.load().items():
+            if is_completed(row):
+                by_case.setdefault(case_id, {})[q_num] = row
+        return by_case
+
+    def rotate(self) -> str:
+        """
+        将现有日志改名备份（不使用--resume的新运行从空日志开始），返回备份路径（无日志时返回None）
+        """
+        if not os.path.exists(self.path):
+            return None
+        backup = f"{self.path[:-len('.jsonl')]}.{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        os.replace(self.path, backup)
+        return backup
@@ -0,0 +1,249 @@
+"""
+结果存储模块
+评估结果行保存在SQLite中，以（运行, tab, 行序号）为主键，分数等数值列使用REAL/INTEGER类型，Excel只作为导出格式：
+- 每个tab的行按原样保存（同一tab中相同案例和问题的多行，如多个模型或同一案例多次运行的结果都会保留）
+- 保存一个tab的结果只替换该tab的行，不再读取工作簿的所有tab再整体重写
+- 多个进程通过SQLite（WAL模式）并发写入，文件锁只在导出Excel时短暂持有
+- 随时可用 scripts/export_results.py 从存储重新导出Excel
+"""
+import os
+import json
+import math
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+from config import RESULTS_STORE_PATH
+from utils.lazy import LazyInstance
+
+# 文件锁支持（导出Excel时避免多个进程同时写同一文件）
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False  # Windows系统不支持fcntl
+
+# 结果列及其类型（也是导出Excel时的列顺序，未列出的列存入extra并排在最后）
+RESULT_COLUMNS = [
+    ('案例ID', 'TEXT'), ('案例标题', 'TEXT'), ('案例标题（脱敏）', 'TEXT'), ('问题编号', 'INTEGER'), ('问题', 'TEXT'),
+    ('使用的模型', 'TEXT'), ('脱敏API', 'TEXT'), ('问题生成API', 'TEXT'), ('评估API', 'TEXT'),
+    ('AI回答', 'TEXT'), ('AI回答Thinking', 'TEXT'),
+    ('总分', 'REAL'), ('百分制', 'REAL'), ('分档', 'TEXT'),
+    ('规范依据相关性_得分', 'REAL'), ('涵摄链条对齐度_得分', 'REAL'),
+    ('价值衡量与同理心对齐度_得分', 'REAL'), ('关键事实与争点覆盖度_得分', 'REAL'),
+    ('裁判结论与救济配置一致性_得分', 'REAL'),
+    ('错误标记', 'TEXT'), ('微小错误', 'TEXT'), ('明显错误', 'TEXT'), ('重大错误', 'TEXT'),
+    ('详细评价', 'TEXT'), ('评价Thinking', 'TEXT'), ('处理错误', 'TEXT'),
+]
+_COLUMN_TYPES = dict(RESULT_COLUMNS)
+
+
+def _to_db_value(value, column_type: str):
+    """将结果行中的值转换为列类型（空值和NaN存为NULL）"""
+    if value is None or value == '':
+        return None
+    if column_type == 'TEXT':
+        return str(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(number):
+        return None
+    return int(number) if column_type == 'INTEGER' else number
+
+
+def _to_jsonable(value):
+    """extra列中的值转换为可JSON序列化的Python类型（NaN存为None）"""
+    if hasattr(value, 'item'):
+        value = value.item()  # numpy标量
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class ResultsStore:
+    """评估结果存储（SQLite）"""
+
+    def __init__(self, db_path: str = None):
+        """
+        初始化结果存储（数据库在首次使用时才打开）
+
+        Args:
+            db_path: SQLite数据库路径，默认从config读取
+        """
+        self.db_path = db_path or RESULTS_STORE_PATH
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """获取数据库连接（首次调用时创建表）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            columns = ',\n'.join(f'"{name}" {column_type}' for name, column_type in RESULT_COLUMNS)
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS result_rows (
+                    run TEXT NOT NULL,
+                    sheet TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    {columns},
+                    extra TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (run, sheet, seq)
+                )
+            ''')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def save_rows(self, run: str, sheet: str, rows: Iterable[Dict], replace: bool = True) -> int:
+        """
+        保存一个tab在某次运行中的结果行（按传入顺序保存，不按案例和问题去重）
+
+        Args:
+            run: 运行标识（如 'results_20260112_unified_e8fd22b9/20个案例_统一评估结果_20260112_120000'）
+            sheet: 导出Excel时的tab名称（多tab时为模型名称，每行的模型另见'使用的模型'列）
+            rows: 结果行（列名与Excel一致）
+            replace: 是否先删除该tab在本次运行中的已有结果行（相当于替换整个tab），否则追加到末尾
+
+        Returns:
+            写入的行数
+        """
+        names = [name for name, _ in RESULT_COLUMNS]
+        placeholders = ', '.join(['?'] * (len(names) + 5))
+        column_list = ', '.join(f'"{name}"' for name in names)
+        now = time.time()
+        records = []
+        for row in rows:
+            extra = {key: _to_jsonable(value) for key, value in row.items() if key not in _COLUMN_TYPES and not key.startswith('_')}
+            records.append([_to_db_value(row.get(name), _COLUMN_TYPES[name]) for name in names]
+                           + [json.dumps(extra, ensure_ascii=False, default=str) if extra else None, now])
+
+        with self._lock:
+            conn = self._get_conn()
+            with conn:
+                if replace:
+                    conn.execute('DELETE FROM result_rows WHERE run = ? AND sheet = ?', (run, sheet))
+                    start = 0
+                else:
+                    start = conn.execute('SELECT COALESCE(MAX(seq) + 1, 0) FROM result_rows WHERE run = ? AND sheet = ?',
+                                         (run, sheet)).fetchone()[0]
+                conn.executemany(
+                    f'INSERT INTO result_rows (run, sheet, seq, {column_list}, extra, updated_at) VALUES ({placeholders})',
+                    [[run, sheet, start + i] + record for i, record in enumerate(records)])
+        return len(records)
+
+    def load_rows(self, run: str, sheet: str = None) -> Dict[str, List[Dict]]:
+        """
+        读取某次运行的结果行
+
+        Args:
+            run: 运行标识
+            sheet: 只读取指定tab，不指定则读取所有tab
+
+        Returns:
+            {tab名称: [结果行]}，tab按写入顺序、行按保存时的顺序排列
+        """
+        names = [name for name, _ in RESULT_COLUMNS]
+        column_list = ', '.join(f'"{name}"' for name in names)
+        query = f'SELECT sheet, {column_list}, extra FROM result_rows WHERE run = ?'
+        params = [run]
+        if sheet:
+            query += ' AND sheet = ?'
+            params.append(sheet)
+        query += ' ORDER BY rowid'
+
+        with self._lock:
+            fetched = self._get_conn().execute(query, params).fetchall()
+
+        by_sheet: Dict[str, List[Dict]] = {}
+        for record in fetched:
+            row = {name: ('' if value is None and _COLUMN_TYPES[name] == 'TEXT' else value)
+                   for name, value in zip(names, record[1:-1])}
+            if record[-1]:
+                row.update(json.loads(record[-1]))
+            by_sheet.setdefault(record[0], []).append(row)
+        return by_sheet
+
+    def has_run(self, run: str) -> bool:
+        """存储中是否已有该运行的结果"""
+        with self._lock:
+            return self._get_conn().execute('SELECT 1 FROM result_rows WHERE run = ? LIMIT 1', (run,)).fetchone() is not None
+
+    def list_runs(self) -> List[Dict]:
+        """
+        列出所有运行
+
+        Returns:
+            [{'run', 'sheets', 'rows', 'updated_at'}]，按最近更新时间倒序
+        """
+        with self._lock:
+            fetched = self._get_conn().execute('''
+                SELECT run, GROUP_CONCAT(DISTINCT sheet), COUNT(*), MAX(updated_at)
+                FROM result_rows GROUP BY run ORDER BY MAX(updated_at) DESC
+            ''').fetchall()
+        return [{'run': run, 'sheets': sheets.split(','), 'rows': rows, 'updated_at': updated_at}
+                for run, sheets, rows, updated_at in fetched]
+
+    def import_workbook(self, run: str, path: str) -> int:
+        """
+        导入结果存储之前生成的工作簿（每个tab的所有行原样导入），返回导入的行数
+
+        Args:
+            run: 运行标识
+            path: Excel文件路径
+        """
+        import pandas as pd  # 只在导入旧工作簿时需要
+        total = 0
+        for sheet, df in pd.read_excel(path, sheet_name=None).items():
+            total += self.save_rows(run, sheet, df.to_dict('records'))
+        return total
+
+    def export_excel(self, run: str, output_file: str, single_sheet: str = None, sheets: List[str] = None) -> Dict[str, int]:
+        """
+        从存储导出某次运行的Excel（先写临时文件再替换，读者不会看到写了一半的文件）
+
+        Args:
+            run: 运行标识
+            output_file: 输出文件路径
+            single_sheet: 指定时所有结果行写入这一个tab，否则按保存时的tab导出
+            sheets: 只导出指定的tab（默认全部）
+
+        Returns:
+            {tab名称: 行数}
+        """
+        import pandas as pd  # 只在导出时需要
+
+        lock = None
+        if HAS_FCNTL:
+            lock = open(output_file + '.lock', 'w')
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)  # 只在导出期间持有，不再包含读取现有工作簿
+        try:
+            # 在锁内读取，保证最后完成的导出包含所有进程已写入的模型
+            by_sheet = {sheet: rows for sheet, rows in self.load_rows(run).items() if not sheets or sheet in sheets}
+            if single_sheet:
+                by_sheet = {single_sheet: [row for rows in by_sheet.values() for row in rows]}
+            if not by_sheet:
+                return {}
+
+            tmp_file = f"{output_file}.tmp.xlsx"
+            counts = {}
+            with pd.ExcelWriter(tmp_file, engine='openpyxl', mode='w') as writer:
+                for sheet, rows in by_sheet.items():
+                    df = pd.DataFrame(rows)
+                    ordered = [name for name, _ in RESULT_COLUMNS if name in df.columns]
+                    df = df[ordered + [col for col in df.columns if col not in ordered]]
+                    df.to_excel(writer, sheet_name=sheet, index=False)
+                    counts[sheet] = len(df)
+            os.replace(tmp_file, output_file)
+            return counts
+        finally:
+            if lock is not None:
+                lock.close()
+
+
+# 全局实例（首次使用时才创建）
+results_store = LazyInstance(ResultsStore)
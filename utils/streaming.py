@@ -0,0 +1,170 @@
+"""
+流式响应（SSE）处理模块
+解析OpenAI兼容的流式响应（DeepSeek、统一模型代理），增量回调reasoning/answer片段，
+记录首token延迟（TTFT）和生成速度，并在流长时间无新内容时提前中止（如卡住的deepseek-reasoner调用）
+"""
+import json
+import time
+import inspect
+from typing import Callable, Dict, List, Optional
+import requests
+from config import STREAM_ENABLED, STREAM_STALL_TIMEOUT
+
+_enabled = STREAM_ENABLED
+
+
+class StreamStalledError(requests.exceptions.Timeout):
+    """流式响应长时间没有新内容（继承Timeout，可被客户端的重试逻辑捕获）"""
+    pass
+
+
+class StreamAccumulator:
+    """流式响应累加器：拼接增量内容并统计TTFT和生成速度"""
+
+    def __init__(self, on_delta: Optional[Callable[[str, str], None]] = None, stall_timeout: float = None):
+        """
+        初始化累加器
+
+        Args:
+            on_delta: 增量回调，参数为（类型, 内容），类型为 'reasoning' 或 'answer'
+            stall_timeout: 连续多少秒没有新内容视为卡住，默认从config读取
+        """
+        self.on_delta = on_delta
+        self.stall_timeout = STREAM_STALL_TIMEOUT if stall_timeout is None else stall_timeout
+
+        self.content_parts: List[str] = []
+        self.reasoning_parts: List[str] = []
+        self.finish_reason = ''
+        self.usage: Optional[Dict] = None
+        self.model = ''
+        self.chunk_count = 0
+
+        self.start_time = time.time()
+        self.first_token_time: Optional[float] = None
+        self.last_delta_time = self.start_time
+        self.end_time: Optional[float] = None
+
+    def _emit(self, kind: str, text: str):
+        """记录一个增量片段"""
+        now = time.time()
+        if self.first_token_time is None:
+            self.first_token_time = now
+        self.last_delta_time = now
+        self.chunk_count += 1
+        (self.reasoning_parts if kind == 'reasoning' else self.content_parts).append(text)
+        if self.on_delta:
+            self.on_delta(kind, text)
+
+    def feed(self, chunk: Dict):
+        """
+        处理一个流式数据块
+
+        Args:
+            chunk: 解析后的SSE数据（chat.completion.chunk格式）
+        """
+        self.model = chunk.get('model') or self.model
+        if chunk.get('usage'):
+            self.usage = chunk['usage']
+
+        for choice in chunk.get('choices') or []:
+            delta = choice.get('delta') or {}
+            reasoning = delta.get('reasoning_content')
+            if reasoning:
+                self._emit('reasoning', reasoning)
+            content = delta.get('content')
+            if content:
+                self._emit('answer', content)
+            if choice.get('finish_reason'):
+                self.finish_reason = choice['finish_reason']
+
+    def check_stall(self):
+        """检查流是否卡住（超过stall_timeout秒没有新内容）"""
+        if self.stall_timeout > 0 and time.time() - self.last_delta_time > self.stall_timeout:
+            raise StreamStalledError(f"流式响应超过{self.stall_timeout:.0f}秒没有新内容，提前中止")
+
+    def consume(self, response: requests.Response):
+        """
+        读取完整的SSE响应
+
+        Args:
+            response: 以stream=True发出的requests响应
+        """
+        for line in response.iter_lines(decode_unicode=False):
+            if not line:
+                continue
+            line = line.decode('utf-8', errors='replace')
+            if line.startswith(':'):
+                # 服务端keep-alive注释行：连接仍在，但不代表有新内容
+                self.check_stall()
+                continue
+            if not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+            try:
+                self.feed(json.loads(data))
+            except json.JSONDecodeError:
+                continue
+            self.check_stall()
+        self.end_time = time.time()
+
+    def get_stats(self) -> Dict:
+        """
+        获取本次调用的流式统计
+
+        Returns:
+            包含ttft（首token延迟，秒）、duration（总耗时，秒）、tokens_per_sec（生成速度）的字典
+        """
+        end_time = self.end_time or time.time()
+        ttft = (self.first_token_time - self.start_time) if self.first_token_time else None
+        completion_tokens = (self.usage or {}).get('completion_tokens') or self.chunk_count  # 无usage时按数据块数估算
+        gen_time = end_time - (self.first_token_time or self.start_time)
+        return {
+            'ttft': ttft,
+            'duration': end_time - self.start_time,
+            'completion_tokens': completion_tokens,
+            'tokens_per_sec': completion_tokens / gen_time if gen_time > 0 else 0.0
+        }
+
+    def to_response(self) -> Dict:
+        """将流式结果组装为与非流式接口一致的响应字典（附加stream_stats字段）"""
+        message = {'role': 'assistant', 'content': ''.join(self.content_parts)}
+        if self.reasoning_parts:
+            message['reasoning_content'] = ''.join(self.reasoning_parts)
+        result = {
+            'model': self.model,
+            'choices': [{'index': 0, 'message': message, 'finish_reason': self.finish_reason}],
+            'stream_stats': self.get_stats()
+        }
+        if self.usage:
+            result['usage'] = self.usage
+        return result
+
+
+def print_stream_stats(label: str, stats: Dict):
+    """打印流式统计"""
+    ttft = f"{stats['ttft']:.2f}秒" if stats.get('ttft') is not None else '无'
+    print(f"[流式] {label} 首token延迟: {ttft}, 总耗时: {stats['duration']:.1f}秒, "
+          f"生成速度: {stats['tokens_per_sec']:.1f} tokens/秒", flush=True)
+
+
+def set_streaming_enabled(enabled: bool):
+    """启用或关闭回答和评估调用的流式发送（如process_cases.py的--stream参数）"""
+    global _enabled
+    _enabled = enabled
+
+
+def stream_kwargs(api) -> Dict:
+    """
+    获取发送回答/评估请求时附加的流式参数
+
+    Args:
+        api: 客户端实例
+
+    Returns:
+        启用流式且客户端支持流式（DeepSeekAPI、UnifiedModelAPI）时为 {'stream': True}，否则为空字典
+    """
+    if _enabled and 'stream' in inspect.signature(api._make_request).parameters:
+        return {'stream': True}
+    return {}
@@ -0,0 +1,202 @@
+"""
+调用遥测模块
+每次LLM调用（客户端的_make_request）结束时写入一条结构化事件到本地JSONL文件，字段包括：
+提供商、模型、流水线阶段（mask/questions/answer/evaluate/extract）、案例ID、问题序号、尝试次数、
+延迟、首token延迟、输入/输出/推理token数和finish_reason。
+- 阶段、案例ID等由调用方通过telemetry_context设置，经contextvars传递到同一线程/asyncio任务内的所有调用
+- 只记录最外层调用（续写等内部嵌套调用的token已合并到外层结果中），避免重复计数
+- 汇总分析见 scripts/telemetry_summary.py
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional
+from config import TELEMETRY_ENABLED, TELEMETRY_PATH
+from utils.priority import get_request_priority
+from utils.concurrency import RequestCancelled
+from utils.token_tracker import get_cache_tokens
+
+# 流水线阶段
+STAGE_MASK = 'mask'
+STAGE_QUESTIONS = 'questions'
+STAGE_ANSWER = 'answer'
+STAGE_EVALUATE = 'evaluate'
+STAGE_EXTRACT = 'extract'
+
+# 本进程的运行标识（用于区分同一文件中不同运行的事件）
+RUN_ID = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+_context = contextvars.ContextVar('telemetry_context', default={})
+# 当前最外层调用的状态（开始时间、是否命中缓存），None表示不在调用中
+_call_state = contextvars.ContextVar('telemetry_call_state', default=None)
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def telemetry_context(**fields):
+    """
+    在with块内为发出的API调用附加上下文字段（值为None的字段不覆盖外层设置）
+
+    用法：
+        with telemetry_context(stage=STAGE_ANSWER, case_id=case_id, question=q_num, attempt=attempt):
+            api.analyze_case(...)
+    """
+    merged = dict(_context.get())
+    merged.update({key: value for key, value in fields.items() if value is not None})
+    token = _context.set(merged)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def get_telemetry_context() -> Dict:
+    """获取当前上下文字段"""
+    return dict(_context.get())
+
+
+def write_event(event: Dict, path: str = None):
+    """
+    追加一条事件到JSONL文件（写入失败不影响主流程）
+
+    Args:
+        event: 事件字典
+        path: 文件路径，默认从config读取
+    """
+    path = path or TELEMETRY_PATH
+    line = json.dumps(event, ensure_ascii=False) + '\n'
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+    except OSError as e:
+        print(f"[遥测] 写入事件失败: {str(e)}", flush=True)
+
+
+def build_call_event(provider: str, model: str, latency: float, result: Optional[Dict] = None,
+                     cached: bool = False, error: BaseException = None) -> Dict:
+    """
+    根据一次调用的结果构建事件
+
+    Args:
+        provider: 提供商名称
+        model: 模型名称
+        latency: 调用耗时（秒）
+        result: 聊天接口响应（失败时为None）
+        cached: 是否命中响应缓存
+        error: 调用抛出的异常
+
+    Returns:
+        事件字典
+    """
+    usage = (result or {}).get('usage') or {}
+    choices = (result or {}).get('choices') or []
+    stream_stats = (result or {}).get('stream_stats') or {}
+    cache_hit_tokens, _ = get_cache_tokens(usage)
+    context = _context.get()
+
+    if isinstance(error, RequestCancelled):
+        status = 'cancelled'  # 对冲请求中落后的一方
+    elif error is not None:
+        status = 'error'
+    elif not choices:
+        status = 'empty'
+    else:
+        status = 'ok'
+
+    event = {
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'run_id': RUN_ID,
+        'provider': provider,
+        'model': (result or {}).get('model') or model,
+        'stage': context.get('stage', ''),
+        'case_id': context.get('case_id'),
+        'question': context.get('question'),
+        'attempt': context.get('attempt'),
+        'priority': get_request_priority(),
+        'status': status,
+        'cached': cached,
+        'latency': round(latency, 3),
+        'ttft': round(stream_stats['ttft'], 3) if stream_stats.get('ttft') is not None else None,
+        'input_tokens': usage.get('prompt_tokens', 0),
+        'output_tokens': usage.get('completion_tokens', 0),
+        'reasoning_tokens': usage.get('reasoning_tokens', 0),
+        'cache_hit_tokens': cache_hit_tokens,
+        'usage_estimated': bool(usage.get('estimated')),
+        'finish_reason': choices[0].get('finish_reason') if choices else None,
+    }
+    if error is not None:
+        event['error'] = f"{type(error).__name__}: {str(error)[:200]}"
+    return event
+
+
+def _model_for(client, messages: List[Dict], args: tuple, kwargs: Dict) -> str:
+    """根据调用参数确定请求的模型名（DeepSeek按thinking模式区分chat/reasoner）"""
+    api = getattr(client, 'api', client)  # AsyncAPIClient包装的同步客户端
+    use_thinking = kwargs.get('use_thinking', args[3] if len(args) > 3 else False)
+    try:
+        return api._build_payload(messages, 0.0, 1, use_thinking=bool(use_thinking)).get('model', '')
+    except Exception:
+        return getattr(api, 'model', '') or ''
+
+
+def mark_cached():
+    """标记当前调用命中了响应缓存（由客户端在缓存命中分支调用）"""
+    state = _call_state.get()
+    if state is not None:
+        state['cached'] = True
+
+
+def instrument_request(func):
+    """
+    装饰客户端的_make_request（同步或异步），在最外层调用结束时记录遥测事件
+
+    被装饰的方法签名为 _make_request(self, messages, temperature, max_tokens, auto_retry_on_truncate, use_thinking, ...)
+    """
+    def _record(client, messages, args, kwargs, state, result, error):
+        api = getattr(client, 'api', client)
+        event = build_call_event(api.provider, _model_for(client, messages, args, kwargs),
+                                 time.time() - state['start_time'], result, cached=state['cached'], error=error)
+        write_event(event)
+
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(self, messages, *args, **kwargs):
+            if not TELEMETRY_ENABLED or _call_state.get() is not None:
+                return await func(self, messages, *args, **kwargs)
+            state = {'start_time': time.time(), 'cached': False}
+            token = _call_state.set(state)
+            try:
+                result = await func(self, messages, *args, **kwargs)
+            except BaseException as e:
+                _record(self, messages, args, kwargs, state, None, e)
+                raise
+            finally:
+                _call_state.reset(token)
+            _record(self, messages, args, kwargs, state, result, None)
+            return result
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(self, messages, *args, **kwargs):
+        if not TELEMETRY_ENABLED or _call_state.get() is not None:
+            return func(self, messages, *args, **kwargs)
+        state = {'start_time': time.time(), 'cached': False}
+        token = _call_state.set(state)
+        try:
+            result = func(self, messages, *args, **kwargs)
+        except BaseException as e:
+            _record(self, messages, args, kwargs, state, None, e)
+            raise
+        finally:
+            _call_state.reset(token)
+        _record(self, messages, args, kwargs, state, result, None)
+        return result
+    return wrapper
@@ -0,0 +1,216 @@
+"""
+本地token估算模块
+在发送请求前估算消息的token数（中文按字计、其他字符按长度折算，已安装tiktoken时GPT系列使用其词表），用于：
+- 按模型的上下文窗口和输出上限调整max_tokens（避免超过模型输出上限的请求和无效的截断重试）
+- 发送前发现上下文溢出（直接失败，不再等待接口返回400并重试）
+- 提供商未返回usage时估算token使用情况，保证token统计和日志完整
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+from config import TOKEN_ESTIMATE_MARGIN
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖，未安装时使用近似估算
+    tiktoken = None
+
+# 中日韩字符（含全角标点）
+CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+# 各模型族每个中文字符对应的token数（按各家词表对中文法律文本的实测比例取整，偏保守）
+CJK_TOKENS_PER_CHAR = {
+    'deepseek': 0.6,
+    'qwen': 0.6,
+    'gpt': 0.8,
+    'gemini': 0.8,
+    'claude': 1.2,
+}
+DEFAULT_CJK_TOKENS_PER_CHAR = 1.0
+# 非中文字符（英文、数字、空白、半角标点）约4个字符一个token
+OTHER_TOKENS_PER_CHAR = 0.3
+# 每条消息的格式开销（角色标记、分隔符）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 各模型的（上下文窗口, 最大输出token数），按名称包含关系匹配，越具体的名称越靠前
+# 表中没有的模型不调整max_tokens，新增模型时需在这里补充
+MODEL_LIMITS = [
+    ('deepseek-reasoner', (65536, 32768)),
+    ('deepseek-chat', (65536, 8192)),
+    ('deepseek', (65536, 8192)),
+    ('gpt-4o-mini', (128000, 16384)),
+    ('gpt-4o', (128000, 16384)),
+    ('gpt-4.1', (1047576, 32768)),
+    ('gpt-5', (400000, 128000)),
+    ('gpt-4-turbo', (128000, 4096)),
+    ('gpt-3.5', (16385, 4096)),
+    ('claude-opus-4', (200000, 32000)),
+    ('claude-sonnet-4', (200000, 64000)),
+    ('claude-3-7', (200000, 64000)),
+    ('claude-3-5', (200000, 8192)),
+    ('claude-3', (200000, 4096)),
+    ('claude', (200000, 32000)),
+    ('gemini-2.5', (1048576, 65536)),
+    ('gemini-2.0', (1048576, 8192)),
+    ('gemini-1.5', (1048576, 8192)),
+    ('gemini', (1048576, 65536)),
+    ('qwen-max', (32768, 8192)),
+    ('qwen-plus', (131072, 16384)),
+    ('qwen-turbo', (1000000, 16384)),
+    ('qwen', (131072, 8192)),
+    # o系列推理模型名称较短，放在最后，避免误匹配其他模型名称中的片段
+    ('o1-mini', (128000, 65536)),
+    ('o1-preview', (128000, 32768)),
+    ('o4-mini', (200000, 100000)),
+    ('o3', (200000, 100000)),
+    ('o1', (200000, 100000)),
+]
+
+_encodings = {}
+
+
+class ContextOverflowError(ValueError):
+    """请求的输入token数超过模型上下文窗口"""
+
+
+def _model_family(model: str) -> str:
+    model = (model or '').lower()
+    for family in CJK_TOKENS_PER_CHAR:
+        if family in model:
+            return family
+    return ''
+
+
+def _get_encoding(model: str):
+    """获取GPT系列模型的tiktoken词表（未安装或加载失败时返回None）"""
+    if tiktoken is None or _model_family(model) != 'gpt':
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except Exception:
+            try:
+                _encodings[model] = tiktoken.get_encoding('o200k_base')
+            except Exception:
+                _encodings[model] = None
+    return _encodings[model]
+
+
+def estimate_tokens(text: str, model: str = '') -> int:
+    """
+    估算文本的token数
+
+    Args:
+        text: 文本
+        model: 模型名称（用于选择词表或中文折算系数）
+
+    Returns:
+        估算的token数
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk_chars = len(CJK_PATTERN.findall(text))
+    other_chars = len(text) - cjk_chars
+    per_cjk = CJK_TOKENS_PER_CHAR.get(_model_family(model), DEFAULT_CJK_TOKENS_PER_CHAR)
+    return int(cjk_chars * per_cjk + other_chars * OTHER_TOKENS_PER_CHAR) + 1
+
+
+def estimate_messages_tokens(messages: List[Dict], model: str = '') -> int:
+    """
+    估算消息列表的输入token数（含每条消息的格式开销）
+
+    Args:
+        messages: 消息列表
+        model: 模型名称
+
+    Returns:
+        估算的token数
+    """
+    total = 0
+    for message in messages:
+        content = message.get('content') or ''
+        if not isinstance(content, str):
+            content = str(content)
+        total += estimate_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS
+    return total + MESSAGE_OVERHEAD_TOKENS
+
+
+def get_model_limits(model: str) -> Optional[Tuple[int, int]]:
+    """
+    获取模型的上下文窗口和最大输出token数
+
+    Args:
+        model: 模型名称
+
+    Returns:
+        (上下文窗口, 最大输出token数)，未知模型返回None
+    """
+    name = (model or '').lower()
+    for prefix, limits in MODEL_LIMITS:
+        if prefix in name:
+            return limits
+    return None
+
+
+def fit_max_tokens(messages: List[Dict], max_tokens: int, model: str) -> int:
+    """
+    发送前检查上下文窗口并调整max_tokens
+
+    max_tokens不超过模型的最大输出token数，也不超过上下文窗口扣除（按安全系数放大的）输入估算后的剩余空间；
+    未知模型不做调整和溢出检查，原样返回调用方的max_tokens（由接口自行校验）
+
+    Args:
+        messages: 消息列表
+        max_tokens: 调用方请求的max_tokens
+        model: 模型名称
+
+    Returns:
+        调整后的max_tokens
+
+    Raises:
+        ContextOverflowError: 输入估算已超过上下文窗口
+    """
+    limits = get_model_limits(model)
+    if limits is None:
+        return max_tokens
+    context_window, max_output = limits
+    input_tokens = int(estimate_messages_tokens(messages, model) * TOKEN_ESTIMATE_MARGIN)
+    remaining = context_window - input_tokens
+    if remaining <= 0:
+        raise ContextOverflowError(
+            f"输入约 {input_tokens} tokens，超过模型 {model} 的上下文窗口（{context_window} tokens），请缩短输入"
+        )
+    fitted = min(max_tokens, max_output, remaining)
+    if fitted < max_tokens:
+        print(f"[Token预算] max_tokens {max_tokens} 超过模型 {model} 的可用输出空间，调整为 {fitted}"
+              f"（输入约 {input_tokens} tokens）", flush=True)
+    return fitted
+
+
+def estimate_usage(messages: List[Dict], response: Optional[Dict], model: str) -> Dict:
+    """
+    提供商未返回usage时，根据消息和响应内容估算token使用情况
+
+    Args:
+        messages: 请求的消息列表
+        response: 聊天接口响应体
+        model: 模型名称
+
+    Returns:
+        与接口usage格式一致的字典，并带有 'estimated': True 标记
+    """
+    output_text = ''
+    if response and response.get('choices'):
+        choice = response['choices'][0]
+        message = choice.get('message') or {}
+        output_text = (message.get('content') or '') + (message.get('reasoning_content') or choice.get('reasoning_content') or '')
+    prompt_tokens = estimate_messages_tokens(messages, model)
+    completion_tokens = estimate_tokens(output_text, model)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'estimated': True
+    }
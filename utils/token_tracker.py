@@ -7,6 +7,29 @@ import os
 from datetime import datetime
 from typing import Dict, Optional
 from collections import defaultdict
+from utils.lazy import LazyInstance
+
+
+def get_cache_tokens(usage: Dict) -> tuple:
+    """
+    从usage中提取前缀缓存命中/未命中的输入token数
+
+    DeepSeek返回 prompt_cache_hit_tokens/prompt_cache_miss_tokens；
+    OpenAI兼容接口返回 prompt_tokens_details.cached_tokens（未命中 = prompt_tokens - cached_tokens）
+
+    Args:
+        usage: API返回的usage字典
+
+    Returns:
+        (命中token数, 未命中token数)，提供商未返回缓存信息时为 (0, 0)
+    """
+    if 'prompt_cache_hit_tokens' in usage or 'prompt_cache_miss_tokens' in usage:
+        return usage.get('prompt_cache_hit_tokens', 0) or 0, usage.get('prompt_cache_miss_tokens', 0) or 0
+    details = usage.get('prompt_tokens_details') or {}
+    if 'cached_tokens' in details:
+        hit = details.get('cached_tokens') or 0
+        return hit, max(0, (usage.get('prompt_tokens', 0) or 0) - hit)
+    return 0, 0
 
 
 class TokenTracker:
@@ -31,6 +54,8 @@ class TokenTracker:
             'output_tokens': 0,
             'reasoning_tokens': 0,
             'total_tokens': 0,
+            'prompt_cache_hit_tokens': 0,
+            'prompt_cache_miss_tokens': 0,
             'api_calls': 0,
             'start_time': datetime.now().isoformat()
         }
@@ -53,6 +78,8 @@ class TokenTracker:
                 'output_tokens': 0,
                 'reasoning_tokens': 0,
                 'total_tokens': 0,
+                'prompt_cache_hit_tokens': 0,
+                'prompt_cache_miss_tokens': 0,
                 'api_calls': 0
             },
             'sessions': [],
@@ -61,6 +88,8 @@ class TokenTracker:
                 'output_tokens': 0,
                 'reasoning_tokens': 0,
                 'total_tokens': 0,
+                'prompt_cache_hit_tokens': 0,
+                'prompt_cache_miss_tokens': 0,
                 'api_calls': 0
             })
         }
@@ -78,27 +107,16 @@ class TokenTracker:
         total_tokens = usage.get('total_tokens', 0)
         reasoning_tokens = usage.get('reasoning_tokens', 0)
         
-        # 更新会话统计
-        self.session_stats['input_tokens'] += input_tokens
-        self.session_stats['output_tokens'] += output_tokens
-        self.session_stats['reasoning_tokens'] += reasoning_tokens
-        self.session_stats['total_tokens'] += total_tokens
-        self.session_stats['api_calls'] += 1
-        
-        # 更新总统计
-        self.usage_data['total_stats']['input_tokens'] += input_tokens
-        self.usage_data['total_stats']['output_tokens'] += output_tokens
-        self.usage_data['total_stats']['reasoning_tokens'] += reasoning_tokens
-        self.usage_data['total_stats']['total_tokens'] += total_tokens
-        self.usage_data['total_stats']['api_calls'] += 1
-        
-        # 按日期统计
+        cache_hit_tokens, cache_miss_tokens = get_cache_tokens(usage)
+        
+        # 更新会话统计、总统计和按日期统计（历史文件中可能缺少缓存字段，逐项补齐）
         today = datetime.now().strftime('%Y-%m-%d')
-        self.usage_data['by_date'][today]['input_tokens'] += input_tokens
-        self.usage_data['by_date'][today]['output_tokens'] += output_tokens
-        self.usage_data['by_date'][today]['reasoning_tokens'] += reasoning_tokens
-        self.usage_data['by_date'][today]['total_tokens'] += total_tokens
-        self.usage_data['by_date'][today]['api_calls'] += 1
+        for stats in (self.session_stats, self.usage_data['total_stats'], self.usage_data['by_date'].setdefault(today, {})):
+            for key, value in (('input_tokens', input_tokens), ('output_tokens', output_tokens),
+                               ('reasoning_tokens', reasoning_tokens), ('total_tokens', total_tokens),
+                               ('prompt_cache_hit_tokens', cache_hit_tokens), ('prompt_cache_miss_tokens', cache_miss_tokens),
+                               ('api_calls', 1)):
+                stats[key] = stats.get(key, 0) + value
         
         # 记录详细调用
         call_record = {
@@ -107,7 +125,9 @@ class TokenTracker:
             'input_tokens': input_tokens,
             'output_tokens': output_tokens,
             'reasoning_tokens': reasoning_tokens,
-            'total_tokens': total_tokens
+            'total_tokens': total_tokens,
+            'prompt_cache_hit_tokens': cache_hit_tokens,
+            'prompt_cache_miss_tokens': cache_miss_tokens
         }
         self.usage_data['sessions'].append(call_record)
         
@@ -151,6 +171,8 @@ class TokenTracker:
             'output_tokens': 0,
             'reasoning_tokens': 0,
             'total_tokens': 0,
+            'prompt_cache_hit_tokens': 0,
+            'prompt_cache_miss_tokens': 0,
             'api_calls': 0
         })
     
@@ -216,6 +238,8 @@ class TokenTracker:
             print(f"  推理tokens: {session_stats['reasoning_tokens']:,}")
         print(f"  总计tokens: {session_stats['total_tokens']:,}")
         print(f"  API调用次数: {session_stats['api_calls']:,}")
+        if session_stats['prompt_cache_hit_tokens'] > 0:
+            print(f"  前缀缓存命中tokens: {session_stats['prompt_cache_hit_tokens']:,}")
         print()
         
         print('成本统计:')
@@ -237,7 +261,16 @@ class TokenTracker:
             print(f"  总计tokens: {avg_total:.0f}")
             print()
 
+    
+    def print_cache_summary(self):
+        """打印当前会话的前缀缓存命中情况（提供商未返回缓存信息时不打印）"""
+        hit = self.session_stats['prompt_cache_hit_tokens']
+        miss = self.session_stats['prompt_cache_miss_tokens']
+        if hit + miss == 0:
+            return
+        print(f"[前缀缓存] 命中tokens: {hit:,}, 未命中tokens: {miss:,}, 命中率: {hit / (hit + miss) * 100:.1f}%", flush=True)
+
 
-# 全局实例
-token_tracker = TokenTracker()
+# 全局实例（首次记录或查询时才读取统计文件）
+token_tracker = LazyInstance(TokenTracker)
 